@@ -0,0 +1,15 @@
+ALGORITHMS = {
+    "lossless": [
+        ("rle", "RLE"),
+        ("huffman", "Huffman"),
+        ("golomb", "Golomb"),
+        ("lzw", "LZW"),
+        ("rans", "rANS"),
+        ("lz77", "LZ77 (Deflate-style)"),
+        ("bwt", "BWT + MTF (bzip2-style)"),
+        ("auto", "Auto (per block)"),
+    ],
+    "lossy": [
+        ("quantization", "Vector Quantization"),
+    ],
+}
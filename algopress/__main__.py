@@ -0,0 +1,5 @@
+import sys
+
+from algopress.cli import main
+
+sys.exit(main())
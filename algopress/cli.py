@@ -0,0 +1,217 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from algopress import ALGORITHMS, server
+from lossless import instrument, stream
+
+ALGORITHM_KEYS = [key for mode in ALGORITHMS.values() for key, _ in mode]
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+LOSSLESS_SUFFIX = ".apz"
+LOSSY_SUFFIX = ".npz"
+
+
+def iter_files(paths):
+    """
+    Yields (file path, path relative to the argument it was found under).
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    full = os.path.join(dirpath, name)
+                    yield full, os.path.relpath(full, path)
+        else:
+            yield path, os.path.basename(path)
+
+
+def _output_path(path, relative, output_dir, suffix=None, strip=None):
+    target = os.path.join(output_dir, relative) if output_dir else path
+    if strip and target.endswith(strip):
+        target = target[:-len(strip)]
+    return target + (suffix or "")
+
+
+def plan_jobs(action, algo, paths, output_dir=None):
+    """
+    Maps input files to (action, algo, input path, output path) jobs,
+    skipping files the chosen action does not apply to.
+    """
+    jobs = []
+    for path, relative in iter_files(paths):
+        lower = path.lower()
+        if action == "compress":
+            if lower.endswith(LOSSLESS_SUFFIX) or lower.endswith(LOSSY_SUFFIX):
+                continue
+            if algo == "quantization":
+                if lower.endswith(IMAGE_EXTENSIONS):
+                    jobs.append((action, algo, path, _output_path(path, relative, output_dir, LOSSY_SUFFIX)))
+            else:
+                jobs.append((action, algo, path, _output_path(path, relative, output_dir, LOSSLESS_SUFFIX)))
+        elif lower.endswith(LOSSLESS_SUFFIX):
+            jobs.append((action, None, path, _output_path(path, relative, output_dir, strip=LOSSLESS_SUFFIX)))
+        elif lower.endswith(LOSSY_SUFFIX):
+            suffix = "" if lower[:-len(LOSSY_SUFFIX)].endswith(IMAGE_EXTENSIONS) else ".png"
+            jobs.append((action, "quantization", path, _output_path(path, relative, output_dir, suffix, LOSSY_SUFFIX)))
+    return jobs
+
+
+def run_job(job, force=False, stats=False, memory=False):
+    """
+    Runs one job in a worker process and returns its stats record.
+    With stats=True the record also holds the job's instrumentation under "stats".
+    """
+    if not stats:
+        return _run_job(job, force)
+    with instrument.collect(memory) as collected:
+        record = _run_job(job, force)
+    record["stats"] = collected.to_dict()
+    return record
+
+
+def _run_job(job, force):
+    action, algo, path, output_path = job
+    if not force and os.path.exists(output_path):
+        raise FileExistsError(f"{output_path} already exists (use --force to overwrite)")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    start = time.perf_counter()
+    if algo == "quantization":
+        from lossy.quantization import dequantize_image, quantize_image
+
+        # the VQ functions report with print(); keep stdout clean for JSON lines
+        with contextlib.redirect_stdout(io.StringIO()):
+            if action == "compress":
+                quantize_image(path, levels=16, save_path=output_path)
+            else:
+                dequantize_image(path, save_path=output_path)
+        input_bytes = os.path.getsize(path)
+        output_bytes = os.path.getsize(output_path)
+    else:
+        with open(path, 'rb') as src, open(output_path, 'wb') as dst:
+            if action == "compress":
+                input_bytes, output_bytes = stream.compress_file(src, dst, algo)
+            else:
+                algo = stream.read_algorithm(src)
+                src.seek(0)
+                input_bytes, output_bytes = stream.decompress_file(src, dst)
+    seconds = time.perf_counter() - start
+    return _record("file", action, algo, input_bytes, output_bytes, seconds, path=path, output=output_path)
+
+
+def _record(event, action, algo, input_bytes, output_bytes, seconds, **extra):
+    raw_bytes = input_bytes if action == "compress" else output_bytes
+    packed_bytes = output_bytes if action == "compress" else input_bytes
+    record = {"event": event, **extra, "action": action, "algo": algo}
+    record.update({
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "ratio": round(raw_bytes / packed_bytes, 4) if raw_bytes and packed_bytes else None,
+        "seconds": round(seconds, 6),
+        "mb_per_s": round(raw_bytes / 1e6 / seconds, 3) if seconds > 0 else None,
+    })
+    return record
+
+
+def write_stats(stats, path):
+    """
+    Writes Stats to `path`: Prometheus text for a .prom file, JSON otherwise.
+    """
+    with open(path, "w") as f:
+        f.write(stats.to_prometheus() if path.endswith(".prom") else stats.to_json(indent=2) + "\n")
+
+
+def run(action, algo, paths, jobs=None, output_dir=None, force=False, out=sys.stdout, stats_path=None, memory=False):
+    """
+    Runs every job across a process pool, writing one JSON line per file as it
+    finishes and a final summary line. Returns the number of failed files.
+    With `stats_path` every job is instrumented and the merged stats are
+    written there (see write_stats).
+    """
+    planned = plan_jobs(action, algo, paths, output_dir)
+    start = time.perf_counter()
+    totals = {"files": 0, "failed": 0, "input_bytes": 0, "output_bytes": 0}
+    stats = instrument.Stats() if stats_path else None
+    with ProcessPoolExecutor(jobs or os.cpu_count() or 1) as pool:
+        futures = {pool.submit(run_job, job, force, stats is not None, memory): job for job in planned}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as exc:
+                totals["failed"] += 1
+                record = {"event": "error", "path": futures[future][2], "action": action, "error": str(exc)}
+            else:
+                totals["files"] += 1
+                totals["input_bytes"] += record["input_bytes"]
+                totals["output_bytes"] += record["output_bytes"]
+                if stats is not None:
+                    stats.merge(record.pop("stats"))
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    summary = _record("summary", action, algo, totals["input_bytes"], totals["output_bytes"], time.perf_counter() - start,
+                      files=totals["files"], failed=totals["failed"])
+    out.write(json.dumps(summary) + "\n")
+    if stats is not None:
+        write_stats(stats, stats_path)
+    return totals["failed"]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="algopress", description="Batch compression with the AlgoPress codecs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    compress = sub.add_parser("compress", help="compress files and directories")
+    compress.add_argument("--algo", choices=ALGORITHM_KEYS, required=True)
+    decompress = sub.add_parser("decompress", help="decompress .apz / .npz outputs")
+    for p in (compress, decompress):
+        p.add_argument("--jobs", "-j", type=int, default=None, help="worker processes (default: CPU count)")
+        p.add_argument("--output-dir", "-o", default=None, help="write outputs here, mirroring input layout")
+        p.add_argument("--force", "-f", action="store_true", help="overwrite existing outputs")
+        p.add_argument("--stats", default=None, metavar="PATH",
+                       help="write stage timings and counters here (Prometheus text for .prom, else JSON)")
+        p.add_argument("--trace-memory", action="store_true", help="with --stats, trace peak memory (slower)")
+        p.add_argument("paths", nargs="+")
+    read = sub.add_parser("read", help="print a byte range of an .apz file, decoding only the blocks it covers")
+    read.add_argument("--offset", type=int, default=0)
+    read.add_argument("--length", type=int, default=None, help="bytes to read (default: to the end)")
+    read.add_argument("path")
+    serve = sub.add_parser("serve", help="run the HTTP compression service")
+    serve.add_argument("--host", default=server.DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=server.DEFAULT_PORT)
+    serve.add_argument("--workers", "-j", type=int, default=None, help="worker processes (default: CPU count)")
+    serve.add_argument("--max-requests", type=int, default=server.MAX_REQUESTS, help="codec requests running at once")
+    serve.add_argument("--max-queue", type=int, default=server.MAX_QUEUE, help="codec requests waiting before 503")
+    serve.add_argument("--window", type=int, default=server.WINDOW, help="blocks per request in the worker pool")
+    serve.add_argument("--max-body", type=int, default=server.MAX_BODY, help="largest image or VQ archive, in bytes")
+    serve.add_argument("--instrument", action="store_true", help="add codec stage timings to /metrics")
+    return parser
+
+
+def read_range(path, offset, length=None, out=None):
+    """
+    Writes `length` bytes of the original data at `offset` to `out` (stdout by default).
+    """
+    out = out or sys.stdout.buffer
+    with stream.MappedReader(path) as reader:
+        if length is None:
+            length = max(0, reader.size - offset)
+        out.write(reader.read(offset, length))
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "read":
+        read_range(args.path, args.offset, args.length)
+        return 0
+    if args.command == "serve":
+        return server.serve(args.host, args.port, workers=args.workers, max_requests=args.max_requests,
+                            max_queue=args.max_queue, window=args.window, max_body=args.max_body,
+                            instrumented=args.instrument)
+    failed = run(args.command, getattr(args, "algo", None), args.paths, args.jobs, args.output_dir, args.force,
+                 stats_path=args.stats, memory=args.trace_memory)
+    return 1 if failed else 0
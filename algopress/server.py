@@ -0,0 +1,711 @@
+"""
+Asynchronous HTTP front end for the codecs, stdlib only.
+
+    python -m algopress serve --port 8080 --workers 4
+
+Routes:
+    POST /compress?algo=<name>  body: raw data; response: an .apz block stream.
+                                algo=quantization takes an image and returns
+                                the .npz (optional &levels=16)
+    POST /decompress            body: an .apz stream or a VQ .npz; response:
+                                the original data, or a PNG
+    GET  /algorithms            codec names as JSON
+    GET  /metrics               Prometheus text; ?format=json for JSON
+    GET  /health                "ok"
+
+Lossless bodies are streamed: the request is cut into blocks as it arrives,
+blocks are encoded (or frames decoded) in a process pool, and the frames go
+back in order as a chunked response. At most `window` blocks per request are
+in the pool; the body is not read further until the oldest one is done and
+written, so a slow pool or a slow client pushes back through TCP flow control
+instead of piling up in memory. At most `max_requests` codec requests run at
+once and `max_queue` more wait; beyond that requests get 503. The VQ routes
+need the whole image and read at most `max_body` bytes of it.
+
+Errors before the response has started get a JSON {"error": ...} body: 400
+for malformed requests, 422 for data the codecs reject. A codec error in the
+middle of a streamed response can only be signalled by dropping the connection.
+"""
+import asyncio
+import contextlib
+import io
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+import zipfile
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from algopress import ALGORITHMS
+from lossless import instrument
+from lossless.instrument import format_labels
+from lossless.stream import (BLOCK_SIZE, FRAME_HEADER, STREAM_HEADER, STREAM_MAGIC, FrameWriter, decode_frame_bytes,
+                             encode_frame_parts, parse_stream_header)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+# codec requests running at once, and waiting for a slot before 503
+MAX_REQUESTS = 16
+MAX_QUEUE = 256
+# blocks per request in the process pool
+WINDOW = 4
+# bodies that have to be held whole (VQ images and archives)
+MAX_BODY = 64 << 20
+# seconds allowed for a request's headers (also the keep-alive idle time) and for each read of its body
+HEADER_TIMEOUT = 30
+BODY_TIMEOUT = 60
+MAX_HEADERS = 100
+READ_SIZE = 1 << 16
+# response bytes left unsent to a client that is still sending, before the rest is spooled
+OUTPUT_BUFFER = 1 << 20
+# latency quantiles are computed over this many recent requests per route
+LATENCY_WINDOW = 1024
+QUANTILES = (0.5, 0.9, 0.99)
+
+LOSSLESS = [key for key, _ in ALGORITHMS["lossless"]]
+LOSSY = [key for key, _ in ALGORITHMS["lossy"]]
+NPZ_MAGIC = b"PK\x03\x04"
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = list(headers)
+
+
+def _run(fn, args, collect):
+    """
+    Runs in a pool worker. Returns (result, stats dict or None).
+    """
+    if not collect:
+        return fn(*args), None
+    with instrument.collect() as stats:
+        result = fn(*args)
+    return result, stats.to_dict()
+
+
+def _quantize(data, levels):
+    from PIL import UnidentifiedImageError
+
+    from lossy.quantization import quantize_image
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "input")
+        dst = os.path.join(tmp, "output.npz")
+        with open(src, "wb") as f:
+            f.write(data)
+        try:
+            # the VQ functions report with print()
+            with contextlib.redirect_stdout(io.StringIO()):
+                quantize_image(src, levels=levels, save_path=dst)
+        except UnidentifiedImageError:
+            raise ValueError("Body is not an image") from None
+        with open(dst, "rb") as f:
+            return f.read()
+
+
+def _dequantize(data):
+    from lossy.quantization import dequantize_image
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "input.npz")
+        dst = os.path.join(tmp, "output.png")
+        with open(src, "wb") as f:
+            f.write(data)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                dequantize_image(src, save_path=dst)
+        except (OSError, KeyError, zipfile.BadZipFile) as exc:
+            raise ValueError(f"Body is not a VQ archive: {exc}") from None
+        with open(dst, "rb") as f:
+            return f.read()
+
+
+class _Body:
+    """
+    A request body as an async byte source, sized by Content-Length or
+    chunked. An interim 100 Continue goes out before the first read when
+    the client asked for one.
+    """
+
+    def __init__(self, reader, writer, length, chunked, expect_continue):
+        self._reader = reader
+        self._writer = writer
+        self._chunked = chunked
+        # bytes left in the body, or in the current chunk
+        self._remaining = 0 if chunked else length
+        self._continue = expect_continue
+        self.done = not chunked and length == 0
+        self.received = 0
+
+    async def _wait(self, awaitable):
+        try:
+            return await asyncio.wait_for(awaitable, BODY_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Timed out reading the request body") from None
+        except asyncio.IncompleteReadError:
+            raise HTTPError(400, "Request body is truncated") from None
+        except ValueError:
+            # StreamReader.readline past its limit
+            raise HTTPError(400, "Malformed chunked body") from None
+
+    async def _next_chunk(self):
+        line = await self._wait(self._reader.readline())
+        try:
+            size = int(line.split(b";")[0].strip(), 16)
+        except ValueError:
+            raise HTTPError(400, "Malformed chunked body") from None
+        if size == 0:
+            # trailers, up to the blank line
+            while (await self._wait(self._reader.readline())).strip():
+                pass
+            self.done = True
+        self._remaining = size
+
+    async def read(self, n):
+        """
+        Up to n bytes; fewer only at the end of the body.
+        """
+        if self._continue:
+            self._continue = False
+            self._writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await self._writer.drain()
+        out = bytearray()
+        while len(out) < n and not self.done:
+            if self._remaining == 0:
+                if not self._chunked:
+                    self.done = True
+                    break
+                await self._next_chunk()
+                continue
+            data = await self._wait(self._reader.read(min(n - len(out), self._remaining)))
+            if not data:
+                raise HTTPError(400, "Request body is truncated")
+            out += data
+            self._remaining -= len(data)
+            if self._chunked and self._remaining == 0:
+                await self._wait(self._reader.readexactly(2))
+            elif not self._chunked and self._remaining == 0:
+                self.done = True
+        self.received += len(out)
+        return bytes(out)
+
+    async def readexactly(self, n):
+        data = await self.read(n)
+        if len(data) < n:
+            raise ValueError("Stream is truncated")
+        return data
+
+    async def read_all(self, limit):
+        parts = []
+        while not self.done:
+            parts.append(await self.read(READ_SIZE))
+            if self.received > limit:
+                raise HTTPError(413, "Request body is larger than %d bytes" % limit)
+        return b"".join(parts)
+
+    async def drain(self):
+        while not self.done:
+            await self.read(READ_SIZE)
+
+
+class _Request:
+    def __init__(self, method, target, version, headers, body):
+        self.method = method
+        url = urlsplit(target)
+        self.path = url.path
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.1":
+            self.keep_alive = connection != "close"
+        else:
+            self.keep_alive = connection == "keep-alive"
+
+
+class _Response:
+    """
+    Either a whole response (send) or a chunked one (start, write..., finish).
+    Most clients send the whole request before reading the response, so while
+    the request body is still arriving, output the client has not taken yet
+    (beyond OUTPUT_BUFFER) is spooled rather than waited for; otherwise each
+    side would block on the other. Once the body is in, the spool is sent and
+    writes wait for the client again.
+    """
+
+    def __init__(self, writer, keep_alive, body):
+        self._writer = writer
+        self._body = body
+        self._spool = None
+        self.keep_alive = keep_alive
+        self.started = False
+        self.aborted = False
+        self.sent = 0
+
+    def _head(self, status, headers):
+        lines = ["HTTP/1.1 %d %s" % (status, HTTPStatus(status).phrase)]
+        lines += ["%s: %s" % (name, value) for name, value in headers]
+        lines.append("Connection: " + ("keep-alive" if self.keep_alive else "close"))
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        self.started = True
+
+    async def send(self, status, body, content_type, headers=()):
+        self._head(status, [("Content-Type", content_type), ("Content-Length", len(body)), *headers])
+        self._writer.write(body)
+        self.sent += len(body)
+        await self._writer.drain()
+
+    def start(self, status, content_type, headers=()):
+        self._head(status, [("Content-Type", content_type), ("Transfer-Encoding", "chunked"), *headers])
+
+    def _out(self, data):
+        if self._spool is None and self._writer.transport.get_write_buffer_size() < OUTPUT_BUFFER:
+            self._writer.write(data)
+            return
+        if self._spool is None:
+            self._spool = tempfile.SpooledTemporaryFile(OUTPUT_BUFFER)
+        self._spool.write(data)
+
+    async def _flush(self, force=False):
+        if not (force or self._body.done):
+            return
+        if self._spool is not None:
+            spool, self._spool = self._spool, None
+            with spool:
+                spool.seek(0)
+                for data in iter(lambda: spool.read(READ_SIZE), b""):
+                    self._writer.write(data)
+                    await self._writer.drain()
+        await self._writer.drain()
+
+    async def write(self, *parts):
+        # one chunk per call
+        size = sum(len(part) for part in parts)
+        if size:
+            self._out(b"%x\r\n" % size)
+            for part in parts:
+                self._out(part)
+            self._out(b"\r\n")
+            self.sent += size
+        await self._flush()
+
+    async def finish(self):
+        self._out(b"0\r\n\r\n")
+        await self._flush(force=True)
+
+    async def error(self, exc):
+        if self.started:
+            if self._spool is not None:
+                self._spool.close()
+                self._spool = None
+            self._writer.transport.abort()
+            self.aborted = True
+            return
+        body = json.dumps({"error": exc.message}).encode() + b"\n"
+        await self.send(exc.status, body, "application/json", exc.headers)
+
+
+class Metrics:
+    """
+    Request counts, bytes, latencies and load gauges of one server. `codec`
+    collects the codecs' own stage timings when the server is instrumented.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = defaultdict(int)
+        self.bytes_in = defaultdict(int)
+        self.bytes_out = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self.in_flight = 0
+        self.waiting = 0
+        self.tasks = 0
+        self.rejected = 0
+        self.codec = instrument.Stats()
+
+    def observe(self, route, status, seconds, bytes_in, bytes_out):
+        self.requests[route, status] += 1
+        self.bytes_in[route] += bytes_in
+        self.bytes_out[route] += bytes_out
+        self.seconds[route] += seconds
+        self.latencies[route].append(seconds)
+
+    def _quantiles(self, route):
+        recent = sorted(self.latencies[route])
+        return {q: recent[min(len(recent) - 1, int(q * len(recent)))] for q in QUANTILES}
+
+    def to_dict(self):
+        routes = {}
+        for route in sorted(self.seconds):
+            count = sum(n for (r, _), n in self.requests.items() if r == route)
+            routes[route] = {
+                "requests": count,
+                "statuses": {str(status): n for (r, status), n in sorted(self.requests.items()) if r == route},
+                "bytes_in": self.bytes_in[route],
+                "bytes_out": self.bytes_out[route],
+                "seconds": round(self.seconds[route], 6),
+                "mb_per_s": round(self.bytes_in[route] / 1e6 / self.seconds[route], 3) if self.seconds[route] > 0 else None,
+                "latency": {"p%d" % round(q * 100): round(value, 6) for q, value in self._quantiles(route).items()},
+            }
+        return {
+            "uptime": round(time.monotonic() - self.started, 3),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "pool_tasks": self.tasks,
+            "rejected": self.rejected,
+            "routes": routes,
+            "codec": self.codec.to_dict() if self.codec.timers else None,
+        }
+
+    def to_prometheus(self, prefix="algopress_server"):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{prefix}_{name}{suffix}{labels} {value}")
+
+        metric("requests_total", "counter", "Requests by route and status.",
+               [("", format_labels(route=route, status=status), n) for (route, status), n in sorted(self.requests.items())])
+        metric("bytes_total", "counter", "Body bytes by route and direction.",
+               [("", format_labels(route=route, direction=direction), counts[route])
+                for route in sorted(self.seconds) for direction, counts in (("in", self.bytes_in), ("out", self.bytes_out))])
+        samples = []
+        for route in sorted(self.seconds):
+            samples += [("", format_labels(route=route, quantile=q), round(value, 6)) for q, value in self._quantiles(route).items()]
+            samples.append(("_sum", format_labels(route=route), round(self.seconds[route], 6)))
+            samples.append(("_count", format_labels(route=route), sum(n for (r, _), n in self.requests.items() if r == route)))
+        metric("request_seconds", "summary", "Request latency; quantiles over recent requests.", samples)
+        metric("in_flight_requests", "gauge", "Codec requests running.", [("", "", self.in_flight)])
+        metric("waiting_requests", "gauge", "Codec requests waiting for a slot.", [("", "", self.waiting)])
+        metric("pool_tasks", "gauge", "Blocks and images in the process pool.", [("", "", self.tasks)])
+        metric("rejected_total", "counter", "Requests turned away with 503.", [("", "", self.rejected)])
+        metric("uptime_seconds", "gauge", "Seconds since the server started.", [("", "", round(time.monotonic() - self.started, 3))])
+        text = "\n".join(lines) + "\n"
+        if self.codec.timers:
+            text += self.codec.to_prometheus("algopress_codec")
+        return text
+
+
+class CompressionServer:
+    """
+    The HTTP service. start() binds (port 0 picks a free port, see .port),
+    serve_forever() runs until close().
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_requests=MAX_REQUESTS,
+                 max_queue=MAX_QUEUE, window=WINDOW, max_body=MAX_BODY, instrumented=False):
+        if max_requests < 1 or window < 1:
+            raise ValueError("max_requests and window must be positive")
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_requests = max_requests
+        self.max_queue = max_queue
+        self.window = window
+        self.max_body = max_body
+        self.instrumented = instrumented
+        self.metrics = Metrics()
+        self._routes = {
+            ("POST", "/compress"): ("compress", self._compress),
+            ("POST", "/decompress"): ("decompress", self._decompress),
+            ("GET", "/algorithms"): ("algorithms", self._algorithms),
+            ("GET", "/metrics"): ("metrics", self._metrics),
+            ("GET", "/health"): ("health", self._health),
+        }
+        self._pool = None
+        self._server = None
+        self._slots = None
+
+    async def start(self):
+        self._pool = ProcessPoolExecutor(self.workers)
+        self._slots = asyncio.Semaphore(self.max_requests)
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    # connection handling
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader, writer)
+                except HTTPError as exc:
+                    await _Response(writer, False, None).error(exc)
+                    break
+                if request is None or not await self._dispatch(request, writer):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError, asyncio.CancelledError):
+                await writer.wait_closed()
+
+    async def _read_request(self, reader, writer):
+        """
+        Parses the request line and headers. Returns None when the client
+        closes the connection or stays idle between requests.
+        """
+        try:
+            line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+            if not line.strip():
+                return None
+            parts = line.decode("latin-1").split()
+            if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+                raise HTTPError(400, "Malformed request line")
+            headers = {}
+            for _ in range(MAX_HEADERS + 1):
+                line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+                if not line.strip():
+                    break
+                name, sep, value = line.decode("latin-1").partition(":")
+                if not sep:
+                    raise HTTPError(400, "Malformed header line")
+                headers[name.strip().lower()] = value.strip()
+            else:
+                raise HTTPError(431, "Too many headers")
+        except asyncio.TimeoutError:
+            return None
+        except ValueError:
+            raise HTTPError(431, "Header line too long") from None
+
+        method, target, version = parts
+        chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+        try:
+            length = 0 if chunked else int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length") from None
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+        expect = headers.get("expect", "").lower() == "100-continue"
+        body = _Body(reader, writer, length, chunked, expect)
+        return _Request(method, target, version, headers, body)
+
+    async def _dispatch(self, request, writer):
+        """
+        Runs one request. Returns whether the connection can take another.
+        """
+        start = time.perf_counter()
+        route = self._routes.get((request.method, request.path))
+        response = _Response(writer, request.keep_alive, request.body)
+        name = route[0] if route else "other"
+        status = 500
+        try:
+            if route is None:
+                known = any(path == request.path for _, path in self._routes)
+                raise HTTPError(405 if known else 404, "No route for %s %s" % (request.method, request.path))
+            status = await route[1](request, response)
+        except HTTPError as exc:
+            status = exc.status
+            response.keep_alive = response.keep_alive and request.body.done
+            await response.error(exc)
+        except ValueError as exc:
+            status = 422
+            response.keep_alive = response.keep_alive and request.body.done
+            await response.error(HTTPError(422, str(exc)))
+        except (ConnectionError, asyncio.CancelledError):
+            # recorded as nginx does: client closed the request
+            status = 499
+            raise
+        except Exception as exc:
+            status = 500
+            response.keep_alive = False
+            await response.error(HTTPError(500, "Internal error: %s" % exc))
+        finally:
+            self.metrics.observe(name, status, time.perf_counter() - start, request.body.received, response.sent)
+        return response.keep_alive and request.body.done and not response.aborted
+
+    @contextlib.asynccontextmanager
+    async def _slot(self):
+        # codec requests queue here; the queue itself is bounded
+        if self._slots.locked() and self.metrics.waiting >= self.max_queue:
+            self.metrics.rejected += 1
+            raise HTTPError(503, "Server is busy", [("Retry-After", "1")])
+        self.metrics.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.metrics.waiting -= 1
+        self.metrics.in_flight += 1
+        try:
+            yield
+        finally:
+            self.metrics.in_flight -= 1
+            self._slots.release()
+
+    async def _call(self, fn, *args):
+        self.metrics.tasks += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, stats = await loop.run_in_executor(self._pool, _run, fn, args, self.instrumented)
+        finally:
+            self.metrics.tasks -= 1
+        if stats is not None:
+            self.metrics.codec.merge(stats)
+        return result
+
+    async def _ordered(self, items, emit):
+        """
+        Schedules (key, fn, args) items from an async iterator on the pool,
+        `window` at a time, and passes (key, result) to emit() in order.
+        """
+        pending = deque()
+        try:
+            async for key, fn, args in items:
+                pending.append((key, asyncio.ensure_future(self._call(fn, *args))))
+                while len(pending) >= self.window:
+                    key, task = pending.popleft()
+                    await emit(key, await task)
+            while pending:
+                key, task = pending.popleft()
+                await emit(key, await task)
+        finally:
+            for _, task in pending:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+    # routes
+
+    async def _health(self, request, response):
+        await response.send(200, b"ok\n", "text/plain; charset=utf-8")
+        return 200
+
+    async def _algorithms(self, request, response):
+        body = json.dumps({"lossless": LOSSLESS, "lossy": LOSSY}).encode() + b"\n"
+        await response.send(200, body, "application/json")
+        return 200
+
+    async def _metrics(self, request, response):
+        if request.query.get("format") == "json":
+            await response.send(200, json.dumps(self.metrics.to_dict()).encode() + b"\n", "application/json")
+        else:
+            await response.send(200, self.metrics.to_prometheus().encode(), "text/plain; version=0.0.4")
+        return 200
+
+    async def _compress(self, request, response):
+        algorithm = request.query.get("algo")
+        if algorithm not in LOSSLESS + LOSSY:
+            raise HTTPError(400, "algo must be one of: %s" % ", ".join(LOSSLESS + LOSSY))
+        async with self._slot():
+            if algorithm == "quantization":
+                try:
+                    levels = int(request.query.get("levels", 16))
+                except ValueError:
+                    raise HTTPError(400, "levels must be an integer") from None
+                if not 1 <= levels <= 256:
+                    raise HTTPError(400, "levels must be between 1 and 256")
+                data = await request.body.read_all(self.max_body)
+                await response.send(200, await self._call(_quantize, data, levels), "application/octet-stream",
+                                    [("X-Algorithm", algorithm)])
+                return 200
+            return await self._compress_stream(request, response, algorithm)
+
+    async def _compress_stream(self, request, response, algorithm):
+        frames = FrameWriter(algorithm, BLOCK_SIZE)
+
+        async def blocks():
+            while True:
+                block = await request.body.read(BLOCK_SIZE)
+                if not block:
+                    return
+                yield len(block), encode_frame_parts, (algorithm, block)
+
+        async def emit(size, parts):
+            if not response.started:
+                response.start(200, "application/octet-stream", [("X-Algorithm", algorithm)])
+            await response.write(*frames.frame_parts(size, parts))
+
+        await self._ordered(blocks(), emit)
+        if not response.started:
+            response.start(200, "application/octet-stream", [("X-Algorithm", algorithm)])
+        await response.write(frames.close())
+        await response.finish()
+        return 200
+
+    async def _decompress(self, request, response):
+        async with self._slot():
+            magic = await request.body.read(len(STREAM_MAGIC))
+            if magic == NPZ_MAGIC:
+                data = magic + await request.body.read_all(self.max_body)
+                await response.send(200, await self._call(_dequantize, data), "image/png",
+                                    [("X-Algorithm", "quantization")])
+                return 200
+            if magic != STREAM_MAGIC:
+                raise ValueError("Body is neither an AlgoPress stream nor a VQ archive")
+            return await self._decompress_stream(request, response, magic)
+
+    async def _decompress_stream(self, request, response, magic):
+        algorithm, _ = parse_stream_header(magic + await request.body.readexactly(STREAM_HEADER.size - len(magic)))
+
+        async def frames():
+            while True:
+                header = await request.body.readexactly(FRAME_HEADER.size)
+                algo_id, _, _, params_len, payload_len = FRAME_HEADER.unpack(header)
+                if algo_id == 0:
+                    return
+                frame = header + await request.body.readexactly(params_len + payload_len)
+                yield None, decode_frame_bytes, (frame,)
+
+        async def emit(_, block):
+            if not response.started:
+                response.start(200, "application/octet-stream", [("X-Algorithm", algorithm)])
+            await response.write(block)
+
+        await self._ordered(frames(), emit)
+        # the block index after the end frame is not needed here
+        await request.body.drain()
+        if not response.started:
+            response.start(200, "application/octet-stream", [("X-Algorithm", algorithm)])
+        await response.finish()
+        return 200
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, out=None, **options):
+    """
+    Runs a CompressionServer until SIGINT/SIGTERM. Prints one JSON line
+    (event: "listening") once the socket is bound.
+    """
+    async def main():
+        server = CompressionServer(host, port, **options)
+        await server.start()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError):
+                loop.add_signal_handler(sig, stop.set)
+        (out or sys.stdout).write(json.dumps({"event": "listening", "host": host, "port": server.port,
+                                              "workers": server.workers}) + "\n")
+        (out or sys.stdout).flush()
+        task = asyncio.ensure_future(server.serve_forever())
+        try:
+            await stop.wait()
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+            await server.close()
+
+    asyncio.run(main())
+    return 0
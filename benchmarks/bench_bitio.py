@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from lossless.bitio import BitReader, BitWriter
+from lossless.huffman import compress_bytes, decompress_bytes
+from corpus import english_text
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def report(name, bits, seconds):
+    print(f"{name:<28} {bits / seconds / 1e6:9.2f} Mbit/s")
+
+
+def main(count=1_000_000):
+    rng = np.random.default_rng(0)
+    widths = rng.integers(1, 25, count)
+    values = rng.integers(0, 1 << 24, count) & ((1 << widths) - 1)
+    total = int(widths.sum())
+
+    def scalar_write():
+        writer = BitWriter()
+        for value, width in zip(values.tolist(), widths.tolist()):
+            writer.write(value, width)
+        return writer.getvalue()
+
+    def bulk_write():
+        writer = BitWriter()
+        writer.write_bits(values, widths)
+        return writer.getvalue()
+
+    scalar, t = timed(scalar_write)
+    report("write() per code", total, t)
+    bulk, t = timed(bulk_write)
+    report("write_bits() 1-24 bits", total, t)
+    assert scalar == bulk
+
+    def scalar_read():
+        reader = BitReader(bulk)
+        read = reader.read
+        return [read(width) for width in widths.tolist()]
+
+    decoded, t = timed(scalar_read)
+    report("read() per code", total, t)
+    assert decoded == values.tolist()
+
+    fixed = BitWriter()
+    fixed.write_bits(values & 0xFFF, 12)
+    packed = fixed.getvalue()
+    decoded, t = timed(lambda: BitReader(packed).read_array(12, count))
+    report("read_array() 12 bits", 12 * count, t)
+    assert (decoded == (values & 0xFFF)).all()
+
+    # table-driven decode (BitReader.decode) through the Huffman codec
+    data = english_text(count).encode("utf-8")
+    (payload, lengths), t = timed(compress_bytes, data)
+    bits = sum(lengths[symbol] for symbol in data)
+    report("Huffman encode (write_bits)", bits, t)
+    decoded, t = timed(decompress_bytes, payload, lengths, len(data))
+    report("Huffman decode (table)", bits, t)
+    assert decoded == data
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,34 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import english_text
+from lossless.huffman import compress, decompress, compress_bytes, decompress_bytes
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(size=2_000_000):
+    text = english_text(size)
+    data = text.encode("utf-8")
+    mb = len(data) / 1e6
+
+    (bits, root), t_enc = timed(compress, text)
+    decoded, t_dec = timed(decompress, bits, root)
+    assert decoded == text
+    print(f"string path : encode {mb / t_enc:6.2f} MB/s, decode {mb / t_dec:6.2f} MB/s, output {len(bits):,} bytes")
+
+    (payload, lengths), t_enc = timed(compress_bytes, data)
+    decoded, t_dec = timed(decompress_bytes, payload, lengths, len(data))
+    assert decoded == data
+    print(f"packed path : encode {mb / t_enc:6.2f} MB/s, decode {mb / t_dec:6.2f} MB/s, output {len(payload):,} bytes")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000)
@@ -0,0 +1,65 @@
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import english_text
+from lossless.lzw import compress, decompress_bytes, compress_packed, decompress_packed
+
+VARIANTS = ["list", "packed12", "packed16"]
+
+
+def run_variant(variant, size):
+    """
+    Runs one variant in this process and returns its measurements.
+    Called in a fresh subprocess per variant so ru_maxrss is not shared.
+    """
+    data = english_text(size).encode("utf-8")
+    start = time.perf_counter()
+    if variant == "list":
+        codes = compress(data)
+        encoded = json.dumps({"compressed": codes}).encode("utf-8")  # what the GUI used to store
+    else:
+        max_bits = int(variant[len("packed"):])
+        encoded = compress_packed(data, max_bits)
+    t_enc = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if variant == "list":
+        decoded = decompress_bytes(json.loads(encoded)["compressed"])
+    else:
+        decoded = decompress_packed(encoded, max_bits)
+    t_dec = time.perf_counter() - start
+    assert decoded == data
+
+    mb = len(data) / 1e6
+    return {
+        "variant": variant,
+        "ratio": round(len(data) / len(encoded), 3),
+        "encode_mb_s": round(mb / t_enc, 2),
+        "decode_mb_s": round(mb / t_dec, 2),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main(size):
+    for variant in VARIANTS:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--variant", variant, str(size)],
+            check=True, capture_output=True, text=True,
+        )
+        r = json.loads(out.stdout)
+        print(f"{r['variant']:>9}: ratio {r['ratio']:6.3f}, encode {r['encode_mb_s']:6.2f} MB/s, "
+              f"decode {r['decode_mb_s']:6.2f} MB/s, peak RSS {r['peak_rss_kb'] / 1024:7.1f} MB")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "--variant":
+        print(json.dumps(run_variant(args[1], int(args[2]))))
+    else:
+        main(int(args[0]) if args else 5_000_000)
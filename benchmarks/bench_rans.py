@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import TEXT_CORPUS
+from lossless import huffman, rans
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(size=1 << 20):
+    for name, (generate, _) in TEXT_CORPUS.items():
+        data = generate(size)
+        mb = len(data) / 1e6
+
+        (payload, lengths), t_enc = timed(huffman.compress_bytes, data)
+        decoded, t_dec = timed(huffman.decompress_bytes, payload, lengths, len(data))
+        assert decoded == data
+        print(f"{name:<11} huffman       : ratio {len(data) / (len(payload) + 256):6.3f}, "
+              f"encode {mb / t_enc:6.2f} MB/s, decode {mb / t_dec:6.2f} MB/s")
+
+        for model in rans.MODELS:
+            payload, t_enc = timed(rans.compress_bytes, data, model)
+            decoded, t_dec = timed(rans.decompress_bytes, payload)
+            assert decoded == data
+            print(f"{name:<11} rans {model:<9}: ratio {len(data) / len(payload):6.3f}, "
+                  f"encode {mb / t_enc:6.2f} MB/s, decode {mb / t_dec:6.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20)
@@ -0,0 +1,120 @@
+import json
+import random
+
+import numpy as np
+
+WORDS = [
+    "the", "of", "and", "to", "in", "is", "that", "for", "it", "as", "was", "with", "be", "by", "on",
+    "not", "he", "this", "are", "or", "his", "from", "at", "which", "but", "have", "an", "had", "they",
+    "compression", "data", "signal", "entropy", "block", "stream", "archive", "record", "value", "window",
+]
+
+
+def english_text(size, seed=0):
+    """
+    English-like text: Zipf-weighted words, sentences and paragraphs.
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    out = []
+    total = 0
+    while total < size:
+        sentence = rng.choices(WORDS, weights, k=rng.randint(5, 16))
+        sentence[0] = sentence[0].capitalize()
+        text = " ".join(sentence) + (".\n\n" if rng.random() < 0.1 else ". ")
+        out.append(text)
+        total += len(text)
+    return "".join(out)[:size]
+
+
+def repetitive_text(size, seed=0):
+    """
+    Long runs and a short repeating vocabulary: the best case for RLE/LZW.
+    """
+    rng = random.Random(seed)
+    out = bytearray()
+    while len(out) < size:
+        if rng.random() < 0.5:
+            out += bytes([rng.choice(b"ABCD")]) * rng.randint(4, 64)
+        else:
+            out += b"TOBEORNOTTOBE" * rng.randint(1, 4)
+    return bytes(out[:size])
+
+
+def random_bytes(size, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+
+def skewed_telemetry(size, seed=0):
+    """
+    Sensor samples that sit on one value 90% of the time: a heavily skewed
+    distribution where Huffman's whole-bit codes waste the most.
+    """
+    rng = np.random.default_rng(seed)
+    probabilities = np.full(256, 0.1 / 255)
+    probabilities[0] = 0.9
+    return rng.choice(256, size, p=probabilities).astype(np.uint8).tobytes()
+
+
+def json_logs(size, seed=0):
+    """
+    Newline-delimited JSON log records with timestamps, levels and counters.
+    """
+    rng = random.Random(seed)
+    levels = ["DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR"]
+    services = ["api", "worker", "scheduler", "auth", "billing"]
+    out = []
+    total = 0
+    ts = 1_700_000_000_000
+    while total < size:
+        ts += rng.randint(1, 500)
+        record = {
+            "ts": ts,
+            "level": rng.choice(levels),
+            "service": rng.choice(services),
+            "latency_ms": round(rng.expovariate(1 / 40), 2),
+            "status": rng.choice([200, 200, 200, 201, 404, 500]),
+            "msg": english_text(rng.randint(20, 80), seed=rng.randint(0, 1 << 30)).strip(),
+        }
+        line = json.dumps(record) + "\n"
+        out.append(line)
+        total += len(line)
+    return "".join(out)[:size].encode("utf-8")
+
+
+def synthetic_image(width, height, seed=0):
+    """
+    RGB image with smooth gradients, flat shapes and sensor-like noise, roughly
+    the statistics of a photo without shipping one.
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.stack([
+        255 * x / max(width - 1, 1),
+        255 * y / max(height - 1, 1),
+        127 + 127 * np.sin(x / 37.0) * np.cos(y / 53.0),
+    ], axis=2)
+    for _ in range(12):
+        cx, cy = rng.integers(0, width), rng.integers(0, height)
+        r = rng.integers(min(width, height) // 20 + 1, min(width, height) // 5 + 2)
+        mask = (x - cx) ** 2 + (y - cy) ** 2 < r * r
+        image[mask] = rng.integers(0, 256, 3)
+    image += rng.normal(0, 6, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+# name -> (generator, default size in bytes)
+TEXT_CORPUS = {
+    "repetitive": (repetitive_text, 1 << 20),
+    "english": (lambda size, seed=0: english_text(size, seed).encode("utf-8"), 1 << 20),
+    "random": (random_bytes, 1 << 20),
+    "json_logs": (json_logs, 1 << 20),
+    "skewed": (skewed_telemetry, 1 << 20),
+}
+
+# name -> (width, height)
+IMAGE_CORPUS = {
+    "image_256": (256, 256),
+    "image_1024": (1024, 1024),
+    "image_2048x1536": (2048, 1536),
+}
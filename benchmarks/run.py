@@ -0,0 +1,209 @@
+"""
+Benchmark harness: runs every lossless codec and vector quantization over a
+deterministic corpus and reports MB/s, ratio, peak memory and (VQ) MSE.
+
+    python benchmarks/run.py                        # print results
+    python benchmarks/run.py --save baseline.json   # store a baseline
+    python benchmarks/run.py --compare baseline.json --threshold 0.15
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from corpus import IMAGE_CORPUS, TEXT_CORPUS, synthetic_image
+from lossless.container import ALGORITHM_IDS, dumps, loads
+from lossy.quantization import dequantize_image, quantize_image
+
+LOSSLESS_CODECS = list(ALGORITHM_IDS)
+# metric -> True if larger is better; used by --compare
+METRICS = {
+    "compress_mb_s": True,
+    "decompress_mb_s": True,
+    "ratio": True,
+    "peak_mb": False,
+    "mse": False,
+}
+
+
+def _best_time(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def _peak_mb(fn):
+    """
+    Peak traced allocation while running fn, in MB. Run separately from the
+    timing passes because tracemalloc slows Python code down considerably.
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def bench_lossless(codec, data, repeat):
+    blob, t_compress = _best_time(lambda: dumps(codec, data), repeat)
+    (_, restored), t_decompress = _best_time(lambda: loads(blob), repeat)
+    if restored != data:
+        raise ValueError("round trip mismatch")
+    peak = max(_peak_mb(lambda: dumps(codec, data)), _peak_mb(lambda: loads(blob)))
+    mb = len(data) / 1e6
+    return {
+        "input_bytes": len(data),
+        "output_bytes": len(blob),
+        "ratio": round(len(data) / len(blob), 4),
+        "compress_mb_s": round(mb / t_compress, 3),
+        "decompress_mb_s": round(mb / t_decompress, 3),
+        "peak_mb": round(peak, 2),
+    }
+
+
+def bench_quantization(image_path, pixels, workdir, repeat):
+    npz_path = os.path.join(workdir, "bench.npz")
+    png_path = os.path.join(workdir, "bench_out.png")
+    with contextlib.redirect_stdout(io.StringIO()):
+        (_, mse), t_compress = _best_time(lambda: quantize_image(image_path, levels=16, save_path=npz_path), repeat)
+        _, t_decompress = _best_time(lambda: dequantize_image(npz_path, save_path=png_path), repeat)
+        peak = max(
+            _peak_mb(lambda: quantize_image(image_path, levels=16, save_path=npz_path)),
+            _peak_mb(lambda: dequantize_image(npz_path, save_path=png_path)),
+        )
+    raw = pixels.nbytes
+    mb = raw / 1e6
+    return {
+        "input_bytes": raw,
+        "output_bytes": os.path.getsize(npz_path),
+        "ratio": round(raw / os.path.getsize(npz_path), 4),
+        "compress_mb_s": round(mb / t_compress, 3),
+        "decompress_mb_s": round(mb / t_decompress, 3),
+        "peak_mb": round(peak, 2),
+        "mse": round(mse, 3),
+    }
+
+
+def run(codecs, corpora, scale, repeat, log=print):
+    results = {}
+    text = [name for name in corpora if name in TEXT_CORPUS]
+    images = [name for name in corpora if name in IMAGE_CORPUS]
+    for name in text:
+        generate, size = TEXT_CORPUS[name]
+        data = generate(max(1, int(size * scale)))
+        for codec in codecs:
+            if codec == "quantization":
+                continue
+            key = f"{codec}/{name}"
+            try:
+                results[key] = bench_lossless(codec, data, repeat)
+            except Exception as exc:
+                results[key] = {"error": f"{type(exc).__name__}: {exc}"}
+            log(_format(key, results[key]))
+
+    if "quantization" in codecs and images:
+        with tempfile.TemporaryDirectory() as workdir:
+            for name in images:
+                width, height = IMAGE_CORPUS[name]
+                pixels = synthetic_image(max(4, int(width * scale ** 0.5)), max(4, int(height * scale ** 0.5)))
+                image_path = os.path.join(workdir, name + ".png")
+                Image.fromarray(pixels).save(image_path)
+                key = f"quantization/{name}"
+                try:
+                    results[key] = bench_quantization(image_path, pixels, workdir, repeat)
+                except Exception as exc:
+                    results[key] = {"error": f"{type(exc).__name__}: {exc}"}
+                log(_format(key, results[key]))
+    return results
+
+
+def _format(key, r):
+    if "error" in r:
+        return f"{key:<32} ERROR: {r['error']}"
+    line = (f"{key:<32} ratio {r['ratio']:8.3f}  compress {r['compress_mb_s']:8.2f} MB/s  "
+            f"decompress {r['decompress_mb_s']:8.2f} MB/s  peak {r['peak_mb']:8.2f} MB")
+    if "mse" in r:
+        line += f"  MSE {r['mse']:.2f}"
+    return line
+
+
+def compare(baseline, current, threshold):
+    """
+    Returns a list of human-readable regressions: metrics that got worse by
+    more than `threshold` (relative), plus cases that started failing.
+    """
+    regressions = []
+    for key, base in baseline.items():
+        now = current.get(key)
+        if now is None:
+            continue
+        if "error" in now and "error" not in base:
+            regressions.append(f"{key}: now fails ({now['error']})")
+            continue
+        if "error" in now or "error" in base:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in base or metric not in now or not base[metric]:
+                continue
+            change = (now[metric] - base[metric]) / base[metric]
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append(f"{key}: {metric} {base[metric]} -> {now[metric]} ({change:+.1%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--codecs", nargs="+", default=LOSSLESS_CODECS + ["quantization"])
+    parser.add_argument("--corpora", nargs="+", default=list(TEXT_CORPUS) + list(IMAGE_CORPUS))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply corpus sizes (pixel counts for images)")
+    parser.add_argument("--repeat", type=int, default=3, help="timing passes; the best one is kept")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change counted as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.codecs, args.corpora, args.scale, args.repeat)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+                "scale": args.scale,
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != args.scale:
+            print(f"warning: baseline scale {baseline.get('scale')} != current scale {args.scale}")
+        regressions = compare(baseline["results"], results, args.threshold)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            return 1
+        print("No regressions beyond {:.0%}".format(args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
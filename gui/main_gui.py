@@ -1,38 +1,19 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import os
+import queue
 import sys
-import json
-import math
+import threading
 import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from lossless.rle import compress as rle_compress, decompress as rle_decompress
-from lossless.huffman import (
-    compress as huffman_compress,
-    decompress as huffman_decompress,
-    frequency_dict,
-    build_tree,
-)
-from lossless.golomb import compress as golomb_compress, decompress as golomb_decompress
-from lossless.lzw import compress as lzw_compress, decompress as lzw_decompress
+from algopress import ALGORITHMS
+from lossless import instrument
+from lossless.stream import compress_file as compress_stream, decompress_file as decompress_stream, read_algorithm as stream_algorithm
 from lossy.quantization import quantize_image, dequantize_image
 
 
-ALGORITHMS = {
-    "lossless": [
-        ("rle", "RLE"),
-        ("huffman", "Huffman"),
-        ("golomb", "Golomb"),
-        ("lzw", "LZW"),
-    ],
-    "lossy": [
-        ("quantization", "Vector Quantization"),
-    ],
-}
-
-
 def compression_percentage(original_size, compressed_size):
     if original_size == 0:
         return 0.0
@@ -84,139 +65,67 @@ def show_result_window(title, output_path, percent=None, ratio=None, mse=None, d
     ttk.Button(result_window, text="Close", width=16, command=result_window.destroy).pack(pady=4)
 
 
-def run_rle(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        data = f.read()
-    compressed = rle_compress(data)
-    output_path = os.path.join(os.path.dirname(path), "rle_output.txt")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(compressed)
-    original_size = len(data.encode('utf-8'))
-    compressed_size = len(compressed.encode('utf-8'))
-    percent = compression_percentage(original_size, compressed_size)
-    ratio = compression_ratio(original_size, compressed_size)
-    show_result_window("RLE Result", output_path, percent, ratio, decompress_fn=lambda: run_rle_decompress(output_path))
-    return {"output": output_path, "percent": percent, "ratio": ratio}
-
-
-def run_rle_decompress(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        compressed = f.read()
-    decompressed = rle_decompress(compressed)
-    output_path = os.path.join(os.path.dirname(path), "rle_decompressed.txt")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(decompressed)
-    messagebox.showinfo("Done", f"RLE decompression done.\nSaved: {output_path}")
-    return {"output": output_path}
-
-
-def run_huffman(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        data = f.read()
-    compressed, root = huffman_compress(data)
-    freq = dict(frequency_dict(data))
-    output_path = os.path.join(os.path.dirname(path), "huffman_output.json")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump({"compressed": compressed, "freq": freq}, f)
-    compressed_size = max(1, math.ceil(len(compressed) / 8))  # bits to bytes approximation, avoid zero
-    original_size = len(data.encode('utf-8'))
-    percent = compression_percentage(original_size, compressed_size)
-    ratio = compression_ratio(original_size, compressed_size)
-    show_result_window("Huffman Result", output_path, percent, ratio, decompress_fn=lambda: run_huffman_decompress(output_path))
-    return {"output": output_path, "percent": percent, "ratio": ratio}
-
-
-def run_huffman_decompress(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        payload = json.load(f)
-    compressed = payload.get("compressed", "")
-    freq = payload.get("freq", {})
-    root = build_tree(freq)
-    decompressed = huffman_decompress(compressed, root)
-    output_path = os.path.join(os.path.dirname(path), "huffman_decompressed.txt")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(decompressed)
-    messagebox.showinfo("Done", f"Huffman decompression done.\nSaved: {output_path}")
-    return {"output": output_path}
-
-
-def run_golomb(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        data = f.read()
-    compressed = golomb_compress(data)
-    output_path = os.path.join(os.path.dirname(path), "golomb_output.txt")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(compressed)
-    original_size = len(data.encode('utf-8'))
-    compressed_size = len(compressed.encode('utf-8'))
-    percent = compression_percentage(original_size, compressed_size)
-    ratio = compression_ratio(original_size, compressed_size)
-    show_result_window("Golomb Result", output_path, percent, ratio, decompress_fn=lambda: run_golomb_decompress(output_path))
-    return {"output": output_path, "percent": percent, "ratio": ratio}
+def algorithm_label(algo):
+    for mode_algorithms in ALGORITHMS.values():
+        for key, label in mode_algorithms:
+            if key == algo:
+                return label
+    return algo
+
 
+class JobCancelled(Exception):
+    pass
 
-def run_golomb_decompress(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        compressed = f.read()
-    decompressed = golomb_decompress(compressed)
-    output_path = os.path.join(os.path.dirname(path), "golomb_decompressed.txt")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(decompressed)
-    messagebox.showinfo("Done", f"Golomb decompression done.\nSaved: {output_path}")
-    return {"output": output_path}
 
+def _remove_partial(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# The run_* functions execute on the worker thread: they must not touch Tk.
+# They return a result dict that finish_job() presents on the main thread.
 
-def run_lzw(path):
+def run_lossless(path, algo, progress=None):
+    output_path = os.path.join(os.path.dirname(path), f"{algo}_output.apz")
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            data = f.read()
-    except UnicodeDecodeError:
-        with open(path, 'r', encoding='utf-8', errors='replace') as f:
-            data = f.read()
-    if not data:
-        messagebox.showwarning("Empty file", "Selected file is empty; nothing to compress.")
-        return {"output": "n/a", "percent": None, "ratio": None}
-    compressed = lzw_compress(data)
-    output_path = os.path.join(os.path.dirname(path), "lzw_output.json")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump({"compressed": compressed}, f)
-    compressed_size = max(1, len(compressed) * 4)  # rough bytes estimate, avoid zero
-    original_size = len(data.encode('utf-8'))
+        with open(path, 'rb') as src, open(output_path, 'wb') as dst:
+            original_size, compressed_size = compress_stream(src, dst, algo, progress=progress)
+    except BaseException:
+        _remove_partial(output_path)
+        raise
     percent = compression_percentage(original_size, compressed_size)
     ratio = compression_ratio(original_size, compressed_size)
-    show_result_window("LZW Result", output_path, percent, ratio, decompress_fn=lambda: run_lzw_decompress(output_path))
-    return {"output": output_path, "percent": percent, "ratio": ratio}
+    return {"output": output_path, "percent": percent, "ratio": ratio, "title": f"{algorithm_label(algo)} Result"}
 
 
-def run_lzw_decompress(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        payload = json.load(f)
-    compressed = payload.get("compressed", [])
-    if not isinstance(compressed, list):
-        raise ValueError("Invalid LZW file: 'compressed' field must be a list")
-    decompressed = lzw_decompress(compressed.copy())
-    output_path = os.path.join(os.path.dirname(path), "lzw_decompressed.txt")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(decompressed)
-    messagebox.showinfo("Done", f"LZW decompression done.\nSaved: {output_path}")
-    return {"output": output_path}
+def run_lossless_decompress(path, progress=None):
+    with open(path, 'rb') as f:
+        stored_algo = stream_algorithm(f)
+    output_path = os.path.join(os.path.dirname(path), f"{stored_algo}_decompressed.txt")
+    try:
+        with open(path, 'rb') as src, open(output_path, 'wb') as dst:
+            decompress_stream(src, dst, progress=progress)
+    except BaseException:
+        _remove_partial(output_path)
+        raise
+    return {"output": output_path, "message": f"{algorithm_label(stored_algo)} decompression done."}
 
 
-def run_quantization(image_path):
+def run_quantization(image_path, progress=None):
     output_path = os.path.join(os.path.dirname(image_path), "compressed_image.npz")
-    percent, mse = quantize_image(image_path, levels=16, save_path=output_path)
+    percent, mse = quantize_image(image_path, levels=16, save_path=output_path, progress=progress)
     original_size = os.path.getsize(image_path)
     compressed_size = os.path.getsize(output_path)
     ratio = compression_ratio(original_size, compressed_size)
-    show_result_window("Quantization Result", output_path, percent, ratio, mse, decompress_fn=lambda: run_quantization_decompress(output_path))
-    return {"output": output_path, "percent": percent, "ratio": ratio, "mse": mse}
+    return {"output": output_path, "percent": percent, "ratio": ratio, "mse": mse, "title": "Quantization Result"}
 
 
-def run_quantization_decompress(image_path):
+def run_quantization_decompress(image_path, progress=None):
     output_path = os.path.join(os.path.dirname(image_path), "decompressed_image.png")
     dequantize_image(image_path, save_path=output_path)
-    messagebox.showinfo("Done", f"Image decompression done.\nSaved: {output_path}")
-    return {"output": output_path}
+    return {"output": output_path, "message": "Image decompression done."}
 
 
 def update_algorithms(mode):
@@ -229,7 +138,10 @@ def update_algorithms(mode):
 def browse_file(action="compress"):
     mode = mode_var.get()
     if mode == "lossless":
-        filetypes = [("Text/JSON", "*.txt *.json"), ("All files", "*.*")]
+        if action == "compress":
+            filetypes = [("Text/JSON", "*.txt *.json"), ("All files", "*.*")]
+        else:
+            filetypes = [("Compressed files", "*.apz"), ("All files", "*.*")]
     else:
         if action == "compress":
             filetypes = [("Image files", "*.png *.jpg *.jpeg"), ("All files", "*.*")]
@@ -241,34 +153,106 @@ def browse_file(action="compress"):
         status_var.set(f"Selected: {selected}")
 
 
-def perform(action):
-    path = file_var.get()
+def run_job(action, algo, path, progress):
+    if algo == "quantization":
+        return run_quantization(path, progress) if action == "compress" else run_quantization_decompress(path, progress)
+    return run_lossless(path, algo, progress) if action == "compress" else run_lossless_decompress(path, progress)
+
+
+def perform(action, path=None, algo=None):
+    global current_job
+    path = path or file_var.get()
     if not path:
         messagebox.showwarning("Select file", "Please choose a file first.")
         return
+    if current_job is not None:
+        messagebox.showwarning("Busy", "A job is already running.")
+        return
 
     mode = mode_var.get()
-    algo = algo_var.get()
+    algo = algo or algo_var.get()
+    cancel_event = threading.Event()
+    current_job = {"action": action, "algo": algo, "mode": mode, "cancel": cancel_event, "start": time.perf_counter()}
 
-    start = time.perf_counter()
-    result = None
+    def progress(done, total):
+        # runs on the worker thread: only hand the numbers over
+        if cancel_event.is_set():
+            raise JobCancelled()
+        events.put(("progress", done, total))
 
+    def worker():
+        try:
+            with instrument.collect() as stats:
+                result = run_job(action, algo, path, progress)
+        except JobCancelled:
+            events.put(("cancelled",))
+        except Exception as exc:
+            events.put(("error", exc))
+        else:
+            events.put(("done", result, stats))
+
+    set_busy(True)
+    progress_var.set(0)
+    status_var.set(f"{algorithm_label(algo)} {action} running...")
+    threading.Thread(target=worker, daemon=True).start()
+
+
+def cancel_job():
+    if current_job is not None:
+        current_job["cancel"].set()
+        status_var.set("Cancelling...")
+
+
+def set_busy(busy):
+    state = "disabled" if busy else "normal"
+    compress_button.configure(state=state)
+    decompress_button.configure(state=state)
+    cancel_button.configure(state="normal" if busy else "disabled")
+    if not busy:
+        progress_bar.stop()
+        progress_bar.configure(mode="determinate")
+
+
+def poll_events():
+    """
+    Drains worker events on the Tk main thread; rescheduled with root.after.
+    """
     try:
-        if algo == "rle":
-            result = run_rle(path) if action == "compress" else run_rle_decompress(path)
-        elif algo == "huffman":
-            result = run_huffman(path) if action == "compress" else run_huffman_decompress(path)
-        elif algo == "golomb":
-            result = run_golomb(path) if action == "compress" else run_golomb_decompress(path)
-        elif algo == "lzw":
-            result = run_lzw(path) if action == "compress" else run_lzw_decompress(path)
-        elif algo == "quantization":
-            result = run_quantization(path) if action == "compress" else run_quantization_decompress(path)
-    except Exception as exc:
-        messagebox.showerror("Error", f"Operation failed: {exc}")
+        while True:
+            event = events.get_nowait()
+            if event[0] == "progress":
+                _, done, total = event
+                if total:
+                    progress_var.set(100 * done / total)
+                elif str(progress_bar.cget("mode")) != "indeterminate":
+                    progress_bar.configure(mode="indeterminate")
+                    progress_bar.start(20)
+            else:
+                finish_job(event)
+    except queue.Empty:
+        pass
+    root.after(POLL_MS, poll_events)
+
+
+def finish_job(event):
+    global current_job
+    job, current_job = current_job, None
+    set_busy(False)
+    kind = event[0]
+    if kind == "cancelled":
+        progress_var.set(0)
+        status_var.set(f"{algorithm_label(job['algo'])} {job['action']} cancelled")
+        return
+    if kind == "error":
+        progress_var.set(0)
+        status_var.set("Ready")
+        messagebox.showerror("Error", f"Operation failed: {event[1]}")
         return
 
-    elapsed = time.perf_counter() - start
+    result, stats = event[1], event[2]
+    progress_var.set(100)
+    action, algo, mode = job["action"], job["algo"], job["mode"]
+    elapsed = time.perf_counter() - job["start"]
     output_path = result.get("output") if result else "n/a"
     percent = result.get("percent")
     ratio = result.get("ratio")
@@ -278,13 +262,33 @@ def perform(action):
     percent_text = f"Compression: {percent}%" if percent is not None else "Compression: n/a"
     ratio_text = f"Ratio: {ratio}:1" if ratio is not None else "Ratio: n/a"
     mse_text = f"MSE: {mse:.2f}" if mse is not None else "MSE: n/a"
-    stats_var.set(f"Mode: {mode.title()} | Algo: {algo.title()} | Time: {elapsed:.3f}s\nOutput: {output_path}\n{percent_text} | {ratio_text} | {mse_text}")
+    stats_var.set(f"Mode: {mode.title()} | Algo: {algo.title()} | Time: {elapsed:.3f}s\nOutput: {output_path}\n{percent_text} | {ratio_text} | {mse_text}\n{stage_summary(stats)}")
+
+    if action == "compress":
+        show_result_window(result["title"], output_path, percent, ratio, mse,
+                           decompress_fn=lambda: perform("decompress", output_path, algo))
+    else:
+        messagebox.showinfo("Done", f"{result['message']}\nSaved: {output_path}")
 
 
+def stage_summary(stats, top=4):
+    """
+    The slowest stages of a job as one line, e.g. "Stages: encode 1.20s | write 0.05s".
+    """
+    timers = sorted(stats.timers.items(), key=lambda item: -item[1][1])[:top]
+    if not timers:
+        return "Stages: n/a"
+    return "Stages: " + " | ".join(f"{name} {seconds:.3f}s" for name, (_, seconds, _) in timers)
+
+
+POLL_MS = 50
+events = queue.Queue()
+current_job = None
+
 root = tk.Tk()
 root.title("Data Compression Studio")
-root.geometry("620x360")
-root.minsize(600, 340)
+root.geometry("620x390")
+root.minsize(600, 370)
 
 style = ttk.Style()
 style.theme_use("clam")
@@ -294,6 +298,7 @@ algo_var = tk.StringVar(value="rle")
 file_var = tk.StringVar(value="")
 status_var = tk.StringVar(value="Ready")
 stats_var = tk.StringVar(value="Mode: Lossless | Algo: RLE | Time: --\nOutput: --\nCompression: --")
+progress_var = tk.DoubleVar(value=0)
 
 # Top header
 header = ttk.Label(root, text="Data Compression Studio", font=("Segoe UI", 14, "bold"))
@@ -332,8 +337,15 @@ ttk.Button(file_frame, text="Browse", width=10, command=lambda: browse_file("com
 
 action_frame = ttk.Frame(right)
 action_frame.pack(pady=6)
-ttk.Button(action_frame, text="Compress", width=16, command=lambda: perform("compress")).grid(row=0, column=0, padx=6, pady=4)
-ttk.Button(action_frame, text="Decompress", width=16, command=lambda: browse_file("decompress") or perform("decompress")).grid(row=0, column=1, padx=6, pady=4)
+compress_button = ttk.Button(action_frame, text="Compress", width=16, command=lambda: perform("compress"))
+compress_button.grid(row=0, column=0, padx=6, pady=4)
+decompress_button = ttk.Button(action_frame, text="Decompress", width=16, command=lambda: browse_file("decompress") or perform("decompress"))
+decompress_button.grid(row=0, column=1, padx=6, pady=4)
+cancel_button = ttk.Button(action_frame, text="Cancel", width=10, command=cancel_job, state="disabled")
+cancel_button.grid(row=0, column=2, padx=6, pady=4)
+
+progress_bar = ttk.Progressbar(right, variable=progress_var, maximum=100, mode="determinate")
+progress_bar.pack(fill="x", pady=(4, 0))
 
 status_label = ttk.Label(right, textvariable=status_var, foreground="#0078d4")
 status_label.pack(anchor="w", pady=(8, 2))
@@ -342,5 +354,6 @@ stats_box = ttk.Label(right, textvariable=stats_var, background="#f7f7f7", relie
 stats_box.pack(fill="x", pady=(4, 0))
 
 update_algorithms("lossless")
+root.after(POLL_MS, poll_events)
 
 root.mainloop()
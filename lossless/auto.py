@@ -0,0 +1,78 @@
+"""
+Codec selection for the "auto" algorithm.
+
+Every block gets a size estimate per codec, computed without running the
+encoders over the block: RLE and Golomb sizes follow exactly from run
+statistics and histograms, Huffman from the code lengths of the byte
+histogram, rANS from the histogram entropy. LZW, BWT and LZ77 compress a
+few evenly spaced slices and scale the result (repeat density is what they
+feed on, so the slices need to be contiguous); LZ77 samples at a fast level.
+BWT and LZ77 are the slowest encoders, so they are only estimated when the
+LZW estimate beats the order-0 coders, i.e. the block has repeated strings.
+Candidates are ordered fastest first; a slower codec is only chosen when it
+is more than TOLERANCE smaller than the best faster choice.
+"stored" copies the block and wins whenever nothing else saves enough.
+"""
+from lossless import golomb, huffman, lz77, lzw, rans, rle, transforms
+
+# fastest first
+CANDIDATES = ["stored", "rle", "rans", "golomb", "huffman", "lzw", "bwt", "lz77"]
+TOLERANCE = 0.03
+SLICES = 4
+SLICE_SIZE = 1 << 13
+# sampling level; the container encodes at lz77.DEFAULT_LEVEL, which does no worse
+LZ77_LEVEL = 1
+
+
+def _sampled(data, compressed_size):
+    n = len(data)
+    if n <= SLICES * SLICE_SIZE:
+        return compressed_size(data)
+    step = n // SLICES
+    sample = b"".join(bytes(data[i * step:i * step + SLICE_SIZE]) for i in range(SLICES))
+    return compressed_size(sample) * n // len(sample)
+
+
+def _lzw_size(data):
+    return len(lzw.compress_packed(data))
+
+
+def _bwt_size(data):
+    params, payload = transforms.compress_bytes(data)
+    return len(params) + len(payload)
+
+
+def _lz77_size(data):
+    return len(lz77.compress_bytes(data, LZ77_LEVEL))
+
+
+def estimate_sizes(data):
+    """
+    Returns {codec: estimated compressed size in bytes, params included}.
+    "bwt" and "lz77" are left out when the block shows no repeated strings.
+    """
+    data = memoryview(data).cast("B")
+    estimates = {
+        "stored": len(data),
+        "rle": rle.estimate_size(data),
+        "rans": rans.estimate_size(data),
+        "golomb": golomb.estimate_size(data),
+        "huffman": huffman.estimate_size(data) + 256,
+        "lzw": _sampled(data, _lzw_size) + 1,
+    }
+    if estimates["lzw"] < min(estimates["rans"], estimates["huffman"]) * (1 - TOLERANCE):
+        estimates["bwt"] = _sampled(data, _bwt_size)
+        estimates["lz77"] = _sampled(data, _lz77_size)
+    return estimates
+
+
+def choose(data):
+    """
+    Picks the codec for one block of data.
+    """
+    estimates = estimate_sizes(data)
+    best = CANDIDATES[0]
+    for codec in CANDIDATES[1:]:
+        if codec in estimates and estimates[codec] < estimates[best] * (1 - TOLERANCE):
+            best = codec
+    return best
@@ -0,0 +1,294 @@
+"""
+MSB-first bit streams shared by the entropy coders.
+
+BitWriter collects codes into a bytearray through an integer accumulator;
+write_bits() packs whole NumPy arrays of (value, width) pairs at once.
+BitReader serves peek/consume for table-driven decoders and runs the
+multi-symbol table loop used by Huffman and Golomb. Reading past the end
+yields zero bits; callers compare `position` with `bit_length` to detect
+truncated input.
+"""
+import numpy as np
+
+WRITE_CHUNK = 1 << 16
+MAX_WIDTH = 64
+
+
+class BitWriter:
+    def __init__(self):
+        self._out = bytearray()
+        self._acc = 0
+        self._nbits = 0
+
+    @property
+    def bit_count(self):
+        return len(self._out) * 8 + self._nbits
+
+    def write(self, value, width):
+        acc = (self._acc << width) | value
+        nbits = self._nbits + width
+        if nbits >= 64:
+            rest = nbits & 7
+            self._out += (acc >> rest).to_bytes(nbits >> 3, "big")
+            acc &= (1 << rest) - 1
+            nbits = rest
+        self._acc = acc
+        self._nbits = nbits
+
+    def write_bits(self, values, widths):
+        """
+        Writes the low widths[i] bits of values[i] for every i. `widths` may
+        be a scalar; widths are limited to 64 bits.
+        """
+        values = np.asarray(values, dtype=np.uint64).ravel()
+        widths = np.broadcast_to(np.asarray(widths, dtype=np.int64), values.shape)
+        if not values.shape[0]:
+            return
+        if widths.min() < 0 or widths.max() > MAX_WIDTH:
+            raise ValueError("bit widths must be between 0 and %d" % MAX_WIDTH)
+        # drop bits above each width, so callers can pass don't-care values with width 0
+        ones = np.uint64(0xFFFFFFFFFFFFFFFF)
+        values = np.where(widths > 0, values & (ones >> (64 - np.maximum(widths, 1)).astype(np.uint64)), np.uint64(0))
+        if widths.max() > 32:
+            # split into 32-bit halves so a shifted code always fits in 64 bits
+            high = np.maximum(widths - 32, 0)
+            values = np.stack((values >> np.uint64(32), values & np.uint64(0xFFFFFFFF)), axis=1).ravel()
+            widths = np.stack((high, widths - high), axis=1).ravel()
+        self._flush_bytes()
+        for start in range(0, values.shape[0], WRITE_CHUNK):
+            self._write_chunk(values[start:start + WRITE_CHUNK], widths[start:start + WRITE_CHUNK])
+
+    def _write_chunk(self, values, widths):
+        # the pending accumulator bits go first, as one more code
+        values = np.concatenate(([self._acc], values)).astype(np.uint64)
+        widths = np.concatenate(([self._nbits], widths))
+        offsets = np.cumsum(widths) - widths
+        total = int(offsets[-1] + widths[-1])
+        # left-align each code in a 64-bit word starting at its first byte,
+        # then add the bytes of all words into place (codes never overlap)
+        shifts = (64 - (offsets & 7) - widths).astype(np.uint64)
+        span = int(((offsets & 7) + widths + 7).max()) // 8
+        words = (values << shifts).astype(">u8").view(np.uint8).reshape(-1, 8)[:, :span]
+        positions = (offsets >> 3)[:, None] + np.arange(span)
+        packed = np.bincount(positions.ravel(), weights=words.ravel(), minlength=(total + 7) // 8)
+        packed = packed[:(total + 7) // 8].astype(np.uint8)
+        whole = total >> 3
+        self._out += packed[:whole].tobytes()
+        self._nbits = total & 7
+        self._acc = int(packed[whole]) >> (8 - self._nbits) if self._nbits else 0
+
+    def align(self):
+        """
+        Pads with zero bits up to the next byte boundary.
+        """
+        if self._nbits & 7:
+            self.write(0, 8 - (self._nbits & 7))
+
+    def _flush_bytes(self):
+        # moves whole bytes from the accumulator to the output
+        if self._nbits >= 8:
+            rest = self._nbits & 7
+            self._out += (self._acc >> rest).to_bytes(self._nbits >> 3, "big")
+            self._acc &= (1 << rest) - 1
+            self._nbits = rest
+
+    def take(self):
+        """
+        Returns and forgets the whole bytes written so far; a partial byte stays
+        in the accumulator. Used by streaming encoders.
+        """
+        self._flush_bytes()
+        out = bytes(self._out)
+        self._out.clear()
+        return out
+
+    def getvalue(self):
+        """
+        Everything written so far, zero-padded to a whole byte.
+        """
+        pad = -self._nbits % 8
+        return bytes(self._out) + (self._acc << pad).to_bytes((self._nbits + pad) // 8, "big")
+
+
+class BitReader:
+    def __init__(self, data=b""):
+        self._data = bytearray(data)
+        self._pos = 0
+        self._dropped = 0
+        self._acc = 0
+        self._nbits = 0
+
+    def extend(self, data):
+        """
+        Appends more input, for decoders fed in chunks.
+        """
+        # the accumulator may hold prefetched bits that are not consumed yet,
+        # so only bytes before the read position can go
+        position = self.position
+        overrun = self._pos > len(self._data)
+        drop = min(position // 8 - self._dropped, len(self._data))
+        if drop >= 1 << 16:
+            del self._data[:drop]
+            self._dropped += drop
+            self._pos -= drop
+        self._data += data
+        if overrun:
+            # zero padding was prefetched past the old end; read the new data instead
+            self.seek(position)
+
+    @property
+    def bit_length(self):
+        return (self._dropped + len(self._data)) * 8
+
+    @property
+    def position(self):
+        """
+        Bits consumed so far; larger than bit_length once padding was read.
+        """
+        return (self._dropped + self._pos) * 8 - self._nbits
+
+    @property
+    def available(self):
+        return self.bit_length - self.position
+
+    def _refill(self, width):
+        acc = self._acc & ((1 << self._nbits) - 1)
+        nbits = self._nbits
+        data = self._data
+        pos = self._pos
+        while nbits < width:
+            acc = (acc << 64) | int.from_bytes(data[pos:pos + 8].ljust(8, b"\x00"), "big")
+            pos += 8
+            nbits += 64
+        self._acc = acc
+        self._nbits = nbits
+        self._pos = pos
+
+    def peek(self, width):
+        if self._nbits < width:
+            self._refill(width)
+        return (self._acc >> (self._nbits - width)) & ((1 << width) - 1)
+
+    def consume(self, width):
+        if self._nbits < width:
+            self._refill(width)
+        self._nbits -= width
+
+    def read(self, width):
+        if self._nbits < width:
+            self._refill(width)
+        self._nbits -= width
+        return (self._acc >> self._nbits) & ((1 << width) - 1)
+
+    def seek(self, position):
+        """
+        Moves to an absolute bit position inside the buffered data.
+        """
+        byte = position // 8 - self._dropped
+        if byte < 0:
+            raise ValueError("cannot seek before buffered data")
+        self._pos = byte
+        self._acc = 0
+        self._nbits = 0
+        if position & 7:
+            self.consume(position & 7)
+
+    def read_array(self, width, count):
+        """
+        Reads `count` codes of up to 63 bits each into an int64 NumPy array.
+        """
+        if not 0 < width < 64:
+            raise ValueError("read_array widths must be between 1 and 63")
+        start = self.position
+        first = start // 8 - self._dropped
+        stop = (start + width * count + 7) // 8 - self._dropped
+        chunk = np.frombuffer(bytes(self._data[first:stop]).ljust(stop - first, b"\x00"), dtype=np.uint8)
+        skip = start & 7
+        bits = np.unpackbits(chunk)[skip:skip + width * count].reshape(count, width)
+        codes = bits.astype(np.int64) @ (1 << np.arange(width - 1, -1, -1, dtype=np.int64))
+        self.seek(start + width * count)
+        return codes
+
+    def count_ones(self):
+        """
+        Consumes a unary prefix: the run of one bits and the zero ending it.
+        Returns the number of ones.
+        """
+        count = 0
+        while True:
+            if not self._nbits:
+                if self.position >= self.bit_length:
+                    raise ValueError("unary code runs past the end of the data")
+                self._refill(64)
+            window = self._acc & ((1 << self._nbits) - 1)
+            ones = self._nbits - (window ^ ((1 << self._nbits) - 1)).bit_length()
+            if ones < self._nbits:
+                self._nbits -= ones + 1
+                return count + ones
+            count += ones
+            self._nbits = 0
+
+    def decode(self, table, table_bits, count, lengths, long_code):
+        """
+        Decodes `count` byte symbols with a table from decode_table().
+        Entries that hold no complete code are handed to long_code(reader),
+        which returns one symbol. `lengths[symbol]` is the code length, used to
+        give back the bits of symbols decoded past `count`.
+        """
+        mask = (1 << table_bits) - 1
+        out = bytearray()
+        # padded copy so refills near the end never come up short
+        data = bytes(self._data) + bytes(8)
+        while len(out) < count:
+            acc = self._acc & ((1 << self._nbits) - 1)
+            nbits = self._nbits
+            pos = self._pos
+            acc = (acc << 64) | int.from_bytes(data[pos:pos + 8], "big")
+            pos += 8
+            nbits += 64
+            while nbits >= table_bits:
+                symbols, used = table[(acc >> (nbits - table_bits)) & mask]
+                if used:
+                    out += symbols
+                    nbits -= used
+                    continue
+                self._acc, self._nbits, self._pos = acc, nbits, pos
+                out.append(long_code(self))
+                acc, nbits, pos = self._acc, self._nbits, self._pos
+                if len(out) >= count:
+                    break
+            self._acc, self._nbits, self._pos = acc, nbits, pos
+        if len(out) > count:
+            self._nbits += sum(lengths[symbol] for symbol in out[count:])
+            del out[count:]
+        return bytes(out)
+
+
+def decode_table(codes, table_bits):
+    """
+    Lookup table indexed by the next `table_bits` bits of the stream.
+    Each entry is (symbols, bits): every complete code that fits in the window,
+    and the number of bits they use. bits == 0 marks a code longer than the table.
+    Works for any prefix code over byte symbols given as {symbol: (code, length)}.
+    """
+    single = [(0, 0)] * (1 << table_bits)
+    for symbol, (code, length) in codes.items():
+        if length > table_bits:
+            continue
+        shift = table_bits - length
+        start = code << shift
+        single[start:start + (1 << shift)] = [(symbol, length)] * (1 << shift)
+
+    mask = (1 << table_bits) - 1
+    table = []
+    for window in range(1 << table_bits):
+        symbols = bytearray()
+        used = 0
+        while True:
+            symbol, length = single[((window << used) & mask)]
+            if not length or used + length > table_bits:
+                break
+            symbols.append(symbol)
+            used += length
+        table.append((bytes(symbols), used))
+    return table
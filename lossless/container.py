@@ -0,0 +1,179 @@
+import struct
+import zlib
+
+from lossless import auto, golomb, huffman, instrument, lz77, lzw, rans, rle, transforms
+
+MAGIC = b"ALGP"
+VERSION = 4
+
+# magic, version, algorithm id, original size, CRC-32 of the original data, params length
+HEADER = struct.Struct(">4sBBQIH")
+
+ALGORITHM_IDS = {
+    "rle": 1,
+    "huffman": 2,
+    "golomb": 3,
+    "lzw": 4,
+    "stored": 5,
+    # picks one of the other codecs per block; never stored in a frame itself
+    "auto": 6,
+    "rans": 7,
+    "lz77": 8,
+    # params hold the transform pipeline (lossless/transforms.py)
+    "bwt": 9,
+}
+ALGORITHM_NAMES = {value: key for key, value in ALGORITHM_IDS.items()}
+
+
+def _encode_rle(data):
+    return b"", rle.compress_bytes(data)
+
+
+def _decode_rle(params, payload, size):
+    return rle.decompress_bytes(payload)
+
+
+def _encode_huffman(data):
+    payload, lengths = huffman.compress_bytes(data)
+    return bytes(lengths), payload
+
+
+def _decode_huffman(params, payload, size):
+    return huffman.decompress_bytes(payload, list(params), size)
+
+
+def _encode_golomb(data):
+    return b"", golomb.compress_bytes(data)
+
+
+def _decode_golomb(params, payload, size):
+    return golomb.decompress_bytes(payload)
+
+
+def _encode_rans(data):
+    return b"", rans.compress_bytes(data)
+
+
+def _decode_rans(params, payload, size):
+    return rans.decompress_bytes(payload, size)
+
+
+def _encode_lz77(data, level=lz77.DEFAULT_LEVEL):
+    return b"", lz77.compress_bytes(data, level)
+
+
+def _decode_lz77(params, payload, size):
+    return lz77.decompress_bytes(payload)
+
+
+def _encode_bwt(data):
+    return transforms.compress_bytes(data)
+
+
+def _decode_bwt(params, payload, size):
+    return transforms.decompress_bytes(params, payload)
+
+
+def _encode_stored(data):
+    return b"", bytes(data)
+
+
+def _decode_stored(params, payload, size):
+    return bytes(payload)
+
+
+def _encode_lzw(data, max_bits=lzw.DEFAULT_MAX_BITS):
+    return bytes([max_bits]), lzw.compress_packed(data, max_bits)
+
+
+def _decode_lzw(params, payload, size):
+    return lzw.decompress_packed(payload, params[0])
+
+
+_CODECS = {
+    "rle": (_encode_rle, _decode_rle),
+    "huffman": (_encode_huffman, _decode_huffman),
+    "golomb": (_encode_golomb, _decode_golomb),
+    "lzw": (_encode_lzw, _decode_lzw),
+    "stored": (_encode_stored, _decode_stored),
+    "rans": (_encode_rans, _decode_rans),
+    "lz77": (_encode_lz77, _decode_lz77),
+    "bwt": (_encode_bwt, _decode_bwt),
+}
+
+
+def resolve_algorithm(algorithm, data):
+    """
+    Returns the codec to use for `data`: "auto" is decided per block.
+    """
+    if algorithm == "auto":
+        with instrument.stage("auto.choose"):
+            return auto.choose(data)
+    return algorithm
+
+
+def encode_block(algorithm, data):
+    """
+    Compresses bytes with one of the lossless codecs.
+    Returns (params, payload): codec parameters (code lengths, code width, ...) and packed data.
+    """
+    if algorithm not in _CODECS:
+        raise ValueError("Unknown algorithm: %s" % algorithm)
+    with instrument.stage(algorithm + ".encode"):
+        return _CODECS[algorithm][0](data)
+
+
+def decode_block(algorithm, params, payload, size):
+    if algorithm not in _CODECS:
+        raise ValueError("Unknown algorithm: %s" % algorithm)
+    with instrument.stage(algorithm + ".decode"):
+        return _CODECS[algorithm][1](params, payload, size)
+
+
+def dumps(algorithm, data):
+    """
+    Serializes data into a self-describing container:
+    header (magic, version, algorithm id, size, CRC-32), codec params, payload.
+    """
+    algorithm = resolve_algorithm(algorithm, data)
+    params, payload = encode_block(algorithm, data)
+    header = HEADER.pack(MAGIC, VERSION, ALGORITHM_IDS[algorithm], len(data), zlib.crc32(data), len(params))
+    return header + params + payload
+
+
+def loads(blob):
+    """
+    Parses a container produced by dumps. Returns (algorithm, data).
+    """
+    blob = memoryview(blob)
+    if len(blob) < HEADER.size:
+        raise ValueError("Not an AlgoPress container: file is too short")
+    magic, version, algo_id, size, crc, params_len = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Not an AlgoPress container: bad magic")
+    if version != VERSION:
+        raise ValueError("Unsupported container version: %d" % version)
+    if algo_id not in ALGORITHM_NAMES:
+        raise ValueError("Unknown algorithm id: %d" % algo_id)
+    algorithm = ALGORITHM_NAMES[algo_id]
+    params = bytes(blob[HEADER.size:HEADER.size + params_len])
+    payload = blob[HEADER.size + params_len:]
+    data = decode_block(algorithm, params, payload, size)
+    if len(data) != size or zlib.crc32(data) != crc:
+        raise ValueError("Container checksum mismatch: data is corrupt")
+    return algorithm, data
+
+
+def write_file(path, algorithm, data):
+    """
+    Writes a container to `path` and returns its size in bytes.
+    """
+    blob = dumps(algorithm, data)
+    with open(path, 'wb') as f:
+        f.write(blob)
+    return len(blob)
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
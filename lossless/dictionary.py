@@ -0,0 +1,363 @@
+"""
+Trained dictionaries for compressing many small messages.
+
+A message of a few hundred bytes barely compresses on its own: LZW starts
+from the 256 single-byte entries and Huffman has to send its code lengths.
+A dictionary is trained once from sample messages and holds
+    - LZW entries: the strings the packed LZW encoder emitted most often
+      over the samples, closed under prefixes
+    - Huffman code lengths from the samples' byte histogram, with every byte
+      given a code so any message can be encoded
+Messages are coded against it and carry no tables:
+    dictionary id (first ID_SIZE bytes of its hash), method byte, then
+    lzw     -- packed codes as in lossless.lzw; the dictionary starts with
+               the trained entries and goes back to them when full
+    huffman -- the message size as a varint, then the packed codes
+    stored  -- the message
+A Dictionary keeps its coding tables built, and load_dictionary caches
+Dictionary objects by hash, so each message only pays for its coding loop.
+"""
+import hashlib
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+from lossless import huffman
+from lossless.bitio import BitReader, BitWriter
+from lossless.lzw import CLEAR_CODE, END_CODE, FIRST_CODE, MIN_BITS, check_max_bits
+
+METHODS = {"stored": 0, "lzw": 1, "huffman": 2}
+METHOD_NAMES = {value: key for key, value in METHODS.items()}
+DEFAULT_MAX_BITS = 16
+ID_SIZE = 4
+# codes up to this many are packed without NumPy
+SMALL_MESSAGE = 512
+# Trained dictionaries kept in memory, keyed by hash, least recently used evicted first.
+DICTIONARY_CACHE_SIZE = 8
+
+_DICTIONARY_CACHE = OrderedDict()
+
+
+def _width(next_code):
+    return max(MIN_BITS, (next_code - 1).bit_length())
+
+
+def _varint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise ValueError("Message size is truncated")
+        byte = data[pos]
+        value |= (byte & 0x7F) << shift
+        pos += 1
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _pack(codes, widths):
+    if len(codes) <= SMALL_MESSAGE:
+        acc = nbits = 0
+        for code, width in zip(codes, widths):
+            acc = (acc << width) | code
+            nbits += width
+        pad = -nbits % 8
+        return (acc << pad).to_bytes((nbits + pad) // 8, "big")
+    writer = BitWriter()
+    writer.write_bits(codes, widths)
+    return writer.getvalue()
+
+
+def _train_lzw(samples, max_bits, size):
+    """
+    Runs the packed LZW encoder over every sample (a message boundary ends
+    the current string, the dictionary carries on) and returns the `size`
+    strings with the highest score. A string's score is how often it was
+    emitted plus the scores of its extensions, so a string always ranks
+    above its extensions and every prefix of a kept string is kept too.
+    """
+    limit = 1 << max_bits
+    emitted = defaultdict(int)
+    dictionary = {}
+    strings = [bytes([i]) for i in range(256)] + [b"", b""]
+    hits = [0] * limit
+
+    def retire():
+        for code in range(FIRST_CODE, len(strings)):
+            if hits[code]:
+                emitted[strings[code]] += hits[code]
+                hits[code] = 0
+
+    for sample in samples:
+        current = -1
+        for byte in bytes(sample):
+            if current < 0:
+                current = byte
+                continue
+            key = (current << 8) | byte
+            code = dictionary.get(key)
+            if code is not None:
+                current = code
+                continue
+            hits[current] += 1
+            if len(strings) < limit:
+                dictionary[key] = len(strings)
+                strings.append(strings[current] + bytes([byte]))
+            else:
+                retire()
+                dictionary = {}
+                del strings[FIRST_CODE:]
+            current = byte
+        if current >= 0:
+            hits[current] += 1
+    retire()
+
+    scores = defaultdict(int)
+    for string, count in emitted.items():
+        for end in range(2, len(string) + 1):
+            scores[string[:end]] += count
+    ranked = sorted(scores, key=lambda string: (-scores[string], len(string), string))
+    return ranked[:size]
+
+
+class Dictionary:
+    """
+    Trained LZW entries and Huffman code lengths, with the tables for both
+    directions built once. compress() and decompress() code single messages.
+    """
+
+    def __init__(self, entries, lengths, max_bits=DEFAULT_MAX_BITS):
+        check_max_bits(max_bits)
+        self.max_bits = max_bits
+        self.entries = [bytes(entry) for entry in entries]
+        self.lengths = [int(length) for length in lengths]
+        if len(self.lengths) != 256 or min(self.lengths) < 1 or max(self.lengths) > huffman.MAX_CODE_LENGTH:
+            raise ValueError("Dictionary needs a Huffman code for each of the 256 bytes")
+        self._limit = 1 << max_bits
+        self._first = FIRST_CODE + len(self.entries)
+        if self._first > self._limit:
+            raise ValueError("%d entries do not fit in %d-bit codes" % (len(self.entries), max_bits))
+
+        # encoder: (prefix code << 8) | byte -> code; decoder: code -> string.
+        # Entries come prefixes first, as train_dictionary returns them.
+        index = {}
+        self._codes = {}
+        for code, entry in enumerate(self.entries, FIRST_CODE):
+            if len(entry) < 2 or entry in index:
+                raise ValueError("Dictionary entries must be distinct and at least 2 bytes long")
+            prefix = entry[0] if len(entry) == 2 else index.get(entry[:-1])
+            if prefix is None:
+                raise ValueError("Dictionary entries must follow every prefix of theirs")
+            index[entry] = code
+            self._codes[(prefix << 8) | entry[-1]] = code
+        self._strings = [bytes([i]) for i in range(256)] + [b"", b""] + self.entries
+
+        self._huffman_encoder = huffman.Encoder(self.lengths)
+        self._huffman_decoder = huffman.Decoder(self.lengths)
+        self.hash = self._digest()
+        self.id = bytes.fromhex(self.hash)[:ID_SIZE]
+
+    def _digest(self):
+        h = hashlib.sha256()
+        h.update(bytes([self.max_bits]) + bytes(self.lengths))
+        for entry in self.entries:
+            h.update(_varint(len(entry)) + entry)
+        return h.hexdigest()
+
+    def save(self, path):
+        """
+        Writes the dictionary to an .npz file that load_dictionary reads back.
+        """
+        np.savez_compressed(
+            path,
+            entries=np.frombuffer(b"".join(self.entries), dtype=np.uint8),
+            entry_lengths=np.array([len(entry) for entry in self.entries], dtype=np.uint32),
+            huffman_lengths=np.array(self.lengths, dtype=np.uint8),
+            max_bits=np.array(self.max_bits),
+            dictionary_hash=np.array(self.hash),
+        )
+
+    def _lzw_encode(self, message):
+        trained = self._codes
+        added = {}
+        first = next_code = self._first
+        limit = self._limit
+        codes = []
+        widths = []
+        emit = codes.append
+        emit_width = widths.append
+        width = _width(next_code)
+        current = -1
+        for byte in message:
+            if current < 0:
+                current = byte
+                continue
+            key = (current << 8) | byte
+            code = trained.get(key)
+            if code is None:
+                code = added.get(key)
+            if code is not None:
+                current = code
+                continue
+            emit(current)
+            emit_width(width)
+            if next_code < limit:
+                added[key] = next_code
+                next_code += 1
+                width = _width(next_code)
+            else:
+                emit(CLEAR_CODE)
+                emit_width(width)
+                added = {}
+                next_code = first
+                width = _width(next_code)
+            current = byte
+        if current >= 0:
+            emit(current)
+            emit_width(width)
+            next_code = min(next_code + 1, limit)
+        emit(END_CODE)
+        emit_width(_width(next_code))
+        return _pack(codes, widths)
+
+    def _lzw_decode(self, payload):
+        trained = self._strings
+        first = next_code = self._first
+        limit = self._limit
+        added = []
+        reader = BitReader(payload)
+        read = reader.read
+        out = bytearray()
+        prev = None
+        while True:
+            width = _width(next_code)
+            if reader.position + width > reader.bit_length:
+                raise ValueError("LZW message is truncated: missing end code")
+            code = read(width)
+            if code == END_CODE:
+                return bytes(out)
+            if code == CLEAR_CODE:
+                added = []
+                next_code = first
+                prev = None
+                continue
+            next_code = min(next_code + 1, limit)
+            if code < first:
+                entry = trained[code]
+            elif code < first + len(added):
+                entry = added[code - first]
+            elif code == first + len(added) and prev is not None:
+                entry = prev + prev[:1]
+            else:
+                raise ValueError("Bad compressed k: %s" % code)
+            if prev is not None and first + len(added) < limit:
+                added.append(prev + entry[:1])
+            out += entry
+            prev = entry
+
+    def compress(self, message, method="auto"):
+        """
+        Compresses one message. `method` is one of METHODS or "auto", which
+        keeps the smaller of lzw and huffman, or stored if neither is smaller.
+        """
+        if method != "auto" and method not in METHODS:
+            raise ValueError("Unknown method: %s" % method)
+        message = bytes(message)
+        candidates = {}
+        if method in ("auto", "lzw"):
+            candidates["lzw"] = self._lzw_encode(message)
+        if method in ("auto", "huffman"):
+            candidates["huffman"] = _varint(len(message)) + self._huffman_encoder.encode(message)
+        if method in ("auto", "stored"):
+            candidates["stored"] = message
+        # ties go to the faster decoder
+        best = min(candidates, key=lambda name: (len(candidates[name]), METHODS[name]))
+        return self.id + bytes([METHODS[best]]) + candidates[best]
+
+    def decompress(self, blob):
+        """
+        Inverse of compress.
+        """
+        blob = memoryview(blob).cast("B")
+        if len(blob) < ID_SIZE + 1:
+            raise ValueError("Message is truncated")
+        if blob[:ID_SIZE] != self.id:
+            raise ValueError("Message was compressed with a different dictionary")
+        method = METHOD_NAMES.get(blob[ID_SIZE])
+        payload = blob[ID_SIZE + 1:]
+        if method == "lzw":
+            return self._lzw_decode(payload)
+        if method == "huffman":
+            size, pos = _read_varint(payload, 0)
+            if size > len(payload) * 8:
+                raise ValueError("Message size does not match its payload")
+            return self._huffman_decoder.decode(payload[pos:], size)
+        if method == "stored":
+            return bytes(payload)
+        raise ValueError("Unknown method id: %d" % blob[ID_SIZE])
+
+
+def _cache_dictionary(dictionary):
+    _DICTIONARY_CACHE[dictionary.hash] = dictionary
+    _DICTIONARY_CACHE.move_to_end(dictionary.hash)
+    while len(_DICTIONARY_CACHE) > DICTIONARY_CACHE_SIZE:
+        _DICTIONARY_CACHE.popitem(last=False)
+
+
+def train_dictionary(samples, save_path=None, max_bits=DEFAULT_MAX_BITS, entries=None):
+    """
+    Trains a Dictionary from an iterable of sample messages (bytes-like) and
+    saves it to `save_path` if given. At most `entries` LZW entries are kept,
+    by default three quarters of the 2**max_bits codes, leaving the rest for
+    strings a message adds while it is coded.
+    """
+    check_max_bits(max_bits)
+    samples = [bytes(sample) for sample in samples]
+    if not samples:
+        raise ValueError("No samples to train on")
+    if entries is None:
+        entries = (1 << max_bits) * 3 // 4 - FIRST_CODE
+    trained = _train_lzw(samples, max_bits, max(0, entries))
+    counts = np.bincount(np.frombuffer(b"".join(samples), dtype=np.uint8), minlength=256)
+    # every byte keeps a code; unseen ones count as seen once
+    lengths = huffman.limited_code_lengths(counts + 1)
+    dictionary = Dictionary(trained, lengths.tolist(), max_bits)
+    if save_path is not None:
+        dictionary.save(save_path)
+    _cache_dictionary(dictionary)
+    return dictionary
+
+
+def load_dictionary(path, expected_hash=None):
+    """
+    Loads a trained Dictionary. If `expected_hash` is already cached the file
+    is not read at all.
+    """
+    if expected_hash is not None and expected_hash in _DICTIONARY_CACHE:
+        _DICTIONARY_CACHE.move_to_end(expected_hash)
+        return _DICTIONARY_CACHE[expected_hash]
+    with np.load(path) as data:
+        blob = data["entries"].tobytes()
+        entry_lengths = data["entry_lengths"].astype(np.int64)
+        huffman_lengths = data["huffman_lengths"].tolist()
+        max_bits = int(data["max_bits"])
+    ends = np.cumsum(entry_lengths).tolist()
+    if (ends[-1] if ends else 0) != len(blob):
+        raise ValueError(f"Dictionary {path} is corrupt")
+    entries = [blob[start:end] for start, end in zip([0] + ends[:-1], ends)]
+    dictionary = Dictionary(entries, huffman_lengths, max_bits)
+    if expected_hash is not None and dictionary.hash != expected_hash:
+        raise ValueError(f"Dictionary {path} does not match the expected hash")
+    if dictionary.hash in _DICTIONARY_CACHE:
+        dictionary = _DICTIONARY_CACHE[dictionary.hash]
+    _cache_dictionary(dictionary)
+    return dictionary
@@ -0,0 +1,133 @@
+"""
+Binary file I/O without intermediate copies.
+
+Inputs are memory-mapped and handed to the codecs as memoryview slices, so a
+block is never copied out of the page cache before it is encoded. Outputs
+are gathered as lists of buffers (frame header, params, payload, ...) and
+written with os.writev, so the pieces are not concatenated first either.
+"""
+import io
+import mmap
+import os
+import stat
+from contextlib import contextmanager
+
+from lossless import instrument
+
+# pending output is written once it reaches this many bytes
+WRITE_BUFFER = 1 << 20
+
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 16
+
+
+def _fileno(fileobj):
+    try:
+        return fileobj.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+@contextmanager
+def map_input(fileobj):
+    """
+    Yields a read-only memoryview of `fileobj` from its current position to
+    the end, backed by a memory map, and leaves the file positioned at the
+    end. Yields None when the file cannot be mapped (pipes, in-memory files,
+    nothing left to read); callers then fall back to read().
+    Slices of the view must not outlive the with block.
+    """
+    fd = _fileno(fileobj)
+    if fd is None or not stat.S_ISREG(os.fstat(fd).st_mode):
+        yield None
+        return
+    start = fileobj.tell()
+    size = os.fstat(fd).st_size
+    if size <= start:
+        yield None
+        return
+    mapping = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    body = view[start:]
+    try:
+        yield body
+        fileobj.seek(size)
+    except BaseException:
+        body.release()
+        view.release()
+        try:
+            mapping.close()
+        except BufferError:
+            # the traceback still references slices of the map; raising here
+            # would hide the original error, and the map closes once it is gone
+            pass
+        raise
+    body.release()
+    view.release()
+    # raises BufferError if the caller kept a slice past the with block
+    mapping.close()
+
+
+def writev_all(fd, buffers):
+    """
+    Writes every buffer to `fd` with as few os.writev calls as possible,
+    retrying after partial writes. Returns the number of bytes written.
+    """
+    buffers = [memoryview(b).cast("B") for b in buffers if len(b)]
+    total = 0
+    while buffers:
+        n = os.writev(fd, buffers[:IOV_MAX])
+        total += n
+        while buffers and n >= len(buffers[0]):
+            n -= len(buffers[0])
+            buffers.pop(0)
+        if n:
+            buffers[0] = buffers[0][n:]
+    return total
+
+
+class GatherWriter:
+    """
+    Buffers references to output buffers and writes them in bulk: with
+    os.writev when `fileobj` is backed by a file descriptor, otherwise with one
+    write() of the joined buffers. close() flushes; `fileobj` stays open.
+    """
+
+    def __init__(self, fileobj, limit=WRITE_BUFFER):
+        self._fileobj = fileobj
+        self._limit = limit
+        self._buffers = []
+        self._pending = 0
+        self.written = 0
+        fileobj.flush()
+        self._fd = _fileno(fileobj)
+
+    def write(self, *buffers):
+        for b in buffers:
+            self._buffers.append(b)
+            self._pending += len(b)
+        if self._pending >= self._limit:
+            self.flush()
+        return sum(len(b) for b in buffers)
+
+    def flush(self):
+        if not self._buffers:
+            return
+        with instrument.stage("write"):
+            if self._fd is not None:
+                self.written += writev_all(self._fd, self._buffers)
+            else:
+                self.written += self._fileobj.write(b"".join(self._buffers))
+        self._buffers = []
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        if self._fd is not None:
+            # the file object's idea of its position is stale after raw writes
+            try:
+                self._fileobj.seek(os.lseek(self._fd, 0, os.SEEK_CUR))
+            except (OSError, io.UnsupportedOperation):
+                pass
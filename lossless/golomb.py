@@ -1,4 +1,11 @@
 import math
+import struct
+from functools import lru_cache
+
+import numpy as np
+
+from lossless.bitio import MAX_WIDTH, BitReader, BitWriter, decode_table
+from lossless.huffman import TABLE_BITS
 
 
 def unary_encode(n):
@@ -50,6 +57,228 @@ def decompress(compressed, m=5):
     return result
 
 
+# Binary mode: bytes are coded in blocks, each with its own transform and m.
+# Block header: transform, m, symbol count, packed byte length.
+BLOCK_HEADER = struct.Struct(">BHII")
+BLOCK_SIZE = 1 << 16
+TRANSFORMS = {"raw": 0, "delta": 1, "rank": 2}
+MAX_M = 256
+
+
+def _remainder_code(m):
+    """
+    Truncated binary parameters for divisor m: the first `short` remainders
+    use k bits, the rest k + 1 bits (stored as r + short).
+    """
+    k = m.bit_length() - 1
+    short = (1 << (k + 1)) - m
+    return k, short
+
+
+def _code_lengths(values, m):
+    k, short = _remainder_code(m)
+    return values // m + 1 + np.where(values % m < short, k, k + 1)
+
+
+@lru_cache(maxsize=1)
+def _length_matrix():
+    """
+    Code length of every byte value (columns) under every divisor (rows).
+    """
+    return np.stack([_code_lengths(np.arange(256), m) for m in range(1, MAX_M + 1)])
+
+
+def _best_m(hist):
+    """
+    Picks the divisor with the smallest coded size for a 256-bin histogram.
+    Returns (m, bits).
+    """
+    cost = _length_matrix() @ hist
+    best = int(np.argmin(cost))
+    return best + 1, int(cost[best])
+
+
+def _forward(arr, transform):
+    """
+    Maps a block to small non-negative values. Returns (values, side data).
+    """
+    if transform == "raw":
+        return arr, b""
+    if transform == "delta":
+        # byte differences as signed values, zigzagged so small moves stay small
+        diff = np.diff(arr, prepend=np.uint8(0)).view(np.int8)
+        return ((diff.astype(np.uint8) << 1) ^ (diff >> 7).view(np.uint8)), b""
+    # rank: most frequent byte becomes 0, the next 1, ...
+    order = np.argsort(-np.bincount(arr, minlength=256), kind="stable").astype(np.uint8)
+    rank = np.empty(256, dtype=np.uint8)
+    rank[order] = np.arange(256, dtype=np.uint8)
+    return rank[arr], order.tobytes()
+
+
+def _inverse(values, transform, side):
+    if transform == "raw":
+        return values
+    if transform == "delta":
+        diff = (values >> 1) ^ (-(values & 1).astype(np.int8)).view(np.uint8)
+        return np.cumsum(diff, dtype=np.uint8)
+    return np.frombuffer(side, dtype=np.uint8)[values]
+
+
+@lru_cache(maxsize=64)
+def _codes(m):
+    """
+    {value: (code, length)} for every byte value under divisor m: q ones, a
+    zero, then the remainder in truncated binary.
+    """
+    k, short = _remainder_code(m)
+    codes = {}
+    for value in range(256):
+        q, r = divmod(value, m)
+        width = k if r < short else k + 1
+        rval = r if r < short else r + short
+        codes[value] = ((((1 << q) - 1) << 1) << width | rval, q + 1 + width)
+    return codes
+
+
+def _pack(values, m):
+    """
+    Golomb-codes an array of byte values into packed bytes.
+    """
+    codes = _codes(m)
+    if max(length for _, length in codes.values()) <= MAX_WIDTH:
+        code_table = np.array([code for code, _ in codes.values()], dtype=np.uint64)
+        length_table = np.array([length for _, length in codes.values()])
+        writer = BitWriter()
+        writer.write_bits(code_table[values], length_table[values])
+        return writer.getvalue()
+
+    # small divisors give codes too long for the bit writer: build the bit
+    # array from the prefix and remainder positions instead
+    values = values.astype(np.int64)
+    k, short = _remainder_code(m)
+    q = values // m
+    r = values % m
+    width = np.where(r < short, k, k + 1)
+    rval = np.where(r < short, r, r + short)
+    lengths = q + 1 + width
+    offsets = np.cumsum(lengths) - lengths
+    total = int(lengths.sum())
+
+    # unary prefixes: +1 where a prefix starts, -1 at its terminating zero
+    edges = np.zeros(total + 1, dtype=np.int8)
+    edges[offsets] = 1
+    edges[offsets + q] -= 1
+    bits = np.cumsum(edges[:total], dtype=np.int8).view(np.uint8)
+    start = offsets + q + 1
+    for j in range(k + 1):
+        sel = j < width
+        bits[start[sel] + j] = (rval[sel] >> (width[sel] - 1 - j)) & 1
+    return np.packbits(bits).tobytes()
+
+
+@lru_cache(maxsize=64)
+def _decoder(m):
+    codes = _codes(m)
+    lengths = [length for _, length in codes.values()]
+    table_bits = min(max(lengths), TABLE_BITS)
+    return decode_table(codes, table_bits), table_bits, lengths
+
+
+def _unpack(payload, m, count):
+    table, table_bits, lengths = _decoder(m)
+    k, short = _remainder_code(m)
+
+    def long_code(reader):
+        # long unary prefix: count the leading ones directly
+        q = reader.count_ones()
+        r = reader.read(k) if k else 0
+        if r >= short:
+            r = ((r << 1) | reader.read(1)) - short
+        return q * m + r
+
+    reader = BitReader(payload)
+    out = reader.decode(table, table_bits, count, lengths, long_code)
+    if reader.position > reader.bit_length:
+        raise ValueError("Golomb payload is truncated")
+    return np.frombuffer(out, dtype=np.uint8)
+
+
+def _choose(block, transform=None, m=None):
+    """
+    Picks the transform and divisor with the smallest coded size for a block.
+    Returns (bits including side data, transform name, m, values, side data).
+    """
+    best = None
+    for name in [transform] if transform else list(TRANSFORMS):
+        values, side = _forward(block, name)
+        hist = np.bincount(values, minlength=256)
+        if m:
+            block_m, cost = m, int(_code_lengths(np.arange(256), m) @ hist)
+        else:
+            block_m, cost = _best_m(hist)
+        choice = (cost + 8 * len(side), name, block_m, values, side)
+        if best is None or choice[0] < best[0]:
+            best = choice
+    return best
+
+
+def estimate_size(data, block_size=BLOCK_SIZE):
+    """
+    compress_bytes output size computed from block histograms alone.
+    """
+    arr = np.frombuffer(data, dtype=np.uint8)
+    total = 0
+    for start in range(0, arr.shape[0], block_size):
+        bits = _choose(arr[start:start + block_size])[0]
+        total += BLOCK_HEADER.size + (bits + 7) // 8
+    return total
+
+
+def compress_bytes(data, block_size=BLOCK_SIZE, transform=None, m=None):
+    """
+    Golomb-code a bytes-like object. Each block picks the transform (raw
+    bytes, zigzagged deltas or frequency ranks) and divisor m with the
+    smallest coded size unless `transform` / `m` are given.
+    """
+    arr = np.frombuffer(data, dtype=np.uint8)
+    out = bytearray()
+    for start in range(0, arr.shape[0], block_size):
+        block = arr[start:start + block_size]
+        _, name, block_m, values, side = _choose(block, transform, m)
+        packed = _pack(values, block_m)
+        out += BLOCK_HEADER.pack(TRANSFORMS[name], block_m, block.shape[0], len(packed))
+        out += side + packed
+    return bytes(out)
+
+
+def decompress_bytes(payload):
+    """
+    Inverse of compress_bytes.
+    """
+    names = {number: name for name, number in TRANSFORMS.items()}
+    payload = memoryview(payload)
+    out = []
+    pos = 0
+    while pos < len(payload):
+        if pos + BLOCK_HEADER.size > len(payload):
+            raise ValueError("Golomb block header is truncated")
+        transform, m, count, size = BLOCK_HEADER.unpack_from(payload, pos)
+        pos += BLOCK_HEADER.size
+        if transform not in names or not 1 <= m <= MAX_M:
+            raise ValueError("Invalid Golomb block header")
+        name = names[transform]
+        side = b""
+        if name == "rank":
+            side = bytes(payload[pos:pos + 256])
+            pos += 256
+        if pos + size > len(payload):
+            raise ValueError("Golomb payload is truncated")
+        values = _unpack(payload[pos:pos + size], m, count)
+        pos += size
+        out.append(_inverse(values, name, side).tobytes())
+    return b"".join(out)
+
+
 if __name__ == "__main__":
     sample = "HELLO"
     compressed = compress(sample)
@@ -2,6 +2,19 @@
 from heapq import heappush, heappop, heapify
 from collections import defaultdict
 
+import numpy as np
+
+from lossless import instrument
+from lossless.bitio import BitReader, BitWriter, decode_table
+
+TABLE_BITS = 12
+# compress_bytes limits codes to this length, so four codes fit one 64-bit word
+MAX_CODE_LENGTH = 15
+# symbols packed per write_bits call; a multiple of 4
+ENCODE_CHUNK = 1 << 20
+# inputs up to this many bytes are packed without NumPy
+SMALL_INPUT = 256
+
 class Node:
     def __init__(self, char=None, freq=0):
         self.char = char
@@ -13,6 +26,9 @@ class Node:
         return self.freq < other.freq
 
 def frequency_dict(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+        return {symbol: int(counts[symbol]) for symbol in np.flatnonzero(counts)}
     freq = defaultdict(int)
     for char in data:
         freq[char] += 1
@@ -31,7 +47,9 @@ def build_tree(freq_dict):
         heappush(heap, merged)
     return heap[0]  
 
-def generate_codes(node, prefix="", code_dict={}):
+def generate_codes(node, prefix="", code_dict=None):
+    if code_dict is None:
+        code_dict = {}
     if node is None:
         return
     if node.char is not None:
@@ -59,6 +77,199 @@ def decompress(compressed, root):
             node = root
     return decompressed
 
+def code_lengths(root):
+    """
+    Returns {symbol: code length} for the leaves of a Huffman tree.
+    A tree with a single leaf gets a 1-bit code so it still produces output.
+    """
+    if root is None:
+        return {}
+    if root.char is not None:
+        return {root.char: 1}
+    lengths = {}
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if node.char is not None:
+            lengths[node.char] = depth
+            continue
+        if node.left is not None:
+            stack.append((node.left, depth + 1))
+        if node.right is not None:
+            stack.append((node.right, depth + 1))
+    return lengths
+
+
+def limited_code_lengths(counts, max_length=MAX_CODE_LENGTH):
+    """
+    Optimal code lengths of at most max_length bits (package-merge).
+    `counts` is indexed by symbol; returns an array of lengths, 0 for unused
+    symbols. A lone symbol gets a 1-bit code.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    lengths = np.zeros(counts.shape[0], dtype=np.int64)
+    used = np.flatnonzero(counts)
+    n = used.shape[0]
+    if n <= 1:
+        lengths[used] = 1
+        return lengths
+    if n > 1 << max_length:
+        raise ValueError("%d symbols do not fit in %d-bit codes" % (n, max_length))
+    order = used[np.argsort(counts[used], kind="stable")]
+    leaf_weights = counts[order]
+    # row i of a "contents" matrix counts how often each leaf occurs in item i
+    leaf_contents = np.eye(n, dtype=np.int32)
+    weights, contents = leaf_weights, leaf_contents
+    for _ in range(max_length - 1):
+        pairs = weights.shape[0] // 2 * 2
+        weights = np.concatenate((leaf_weights, weights[0:pairs:2] + weights[1:pairs:2]))
+        contents = np.concatenate((leaf_contents, contents[0:pairs:2] + contents[1:pairs:2]))
+        merged = np.argsort(weights, kind="stable")
+        weights, contents = weights[merged], contents[merged]
+    # a leaf's code length is the number of the 2n - 2 cheapest items it occurs in
+    lengths[order] = contents[:2 * n - 2].sum(axis=0)
+    return lengths
+
+
+def canonical_codes(lengths):
+    """
+    Assigns canonical codes from {symbol: length}: shorter codes first, ties broken by symbol.
+    Returns {symbol: (code, length)}.
+    """
+    codes = {}
+    code = 0
+    prev_len = 0
+    for symbol, length in sorted(((s, l) for s, l in lengths.items() if l), key=lambda item: (item[1], item[0])):
+        code <<= length - prev_len
+        codes[symbol] = (code, length)
+        code += 1
+        prev_len = length
+    return codes
+
+
+class Encoder:
+    """
+    Packing tables for one set of code lengths, built once and reused:
+    the code of every byte and of every byte pair. Every byte to be encoded
+    needs a nonzero length.
+    """
+
+    def __init__(self, lengths):
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.codes = np.zeros(256, dtype=np.uint64)
+        for symbol, (code, _) in canonical_codes(dict(enumerate(self.lengths.tolist()))).items():
+            self.codes[symbol] = code
+        # every byte pair's two codes joined, indexed by the pair as a big-endian uint16
+        self._pair_codes = ((self.codes[:, None] << self.lengths[None, :].astype(np.uint64)) | self.codes[None, :]).ravel()
+        self._pair_lengths = (self.lengths[:, None] + self.lengths[None, :]).ravel()
+        self._small = list(zip(self.codes.tolist(), self.lengths.tolist()))
+
+    def encode(self, data):
+        """
+        Packed codes of a bytes-like object, zero-padded to a whole byte.
+        """
+        if len(data) <= SMALL_INPUT:
+            # one Python int beats the NumPy setup cost for a few hundred codes
+            acc = nbits = 0
+            small = self._small
+            for symbol in bytes(data):
+                code, length = small[symbol]
+                acc = (acc << length) | code
+                nbits += length
+            pad = -nbits % 8
+            return (acc << pad).to_bytes((nbits + pad) // 8, "big")
+        symbols = np.frombuffer(data, dtype=np.uint8)
+        pair_codes, pair_lengths = self._pair_codes, self._pair_lengths
+        writer = BitWriter()
+        for start in range(0, symbols.shape[0], ENCODE_CHUNK):
+            chunk = symbols[start:start + ENCODE_CHUNK]
+            whole = chunk.shape[0] // 4 * 4
+            pairs = chunk[:whole].view(">u2")
+            first, second = pairs[0::2], pairs[1::2]
+            # four codes per value: at most 4 * MAX_CODE_LENGTH bits
+            values = (pair_codes[first] << pair_lengths[second].astype(np.uint64)) | pair_codes[second]
+            widths = pair_lengths[first] + pair_lengths[second]
+            tail = chunk[whole:]
+            writer.write_bits(np.concatenate((values, self.codes[tail])), np.concatenate((widths, self.lengths[tail])))
+        return writer.getvalue()
+
+
+def compress_bytes(data):
+    """
+    Huffman-encode a bytes-like object into packed bits.
+    Returns (payload, lengths) where lengths is a 256-entry list of code lengths
+    (0 for absent bytes); the canonical codes are rebuilt from it on decode.
+    Codes are length-limited to MAX_CODE_LENGTH bits.
+    """
+    symbols = np.frombuffer(data, dtype=np.uint8)
+    if not symbols.shape[0]:
+        return b"", [0] * 256
+    with instrument.stage("huffman.frequency"):
+        counts = np.bincount(symbols, minlength=256)
+    with instrument.stage("huffman.tree"):
+        lengths = limited_code_lengths(counts)
+    return Encoder(lengths).encode(symbols), lengths.tolist()
+
+
+def estimate_size(data):
+    """
+    compress_bytes payload size, from the byte histogram alone.
+    """
+    if not len(data):
+        return 0
+    hist = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+    return (int(hist @ limited_code_lengths(hist)) + 7) // 8
+
+
+class Decoder:
+    """
+    Decoding tables for one set of code lengths, built once and reused.
+    Each table lookup emits every code that fits in the next TABLE_BITS bits;
+    codes longer than the table fall back to a per-length canonical search.
+    """
+
+    def __init__(self, lengths):
+        self.lengths = list(lengths)
+        codes = canonical_codes(dict(enumerate(self.lengths)))
+        self.max_len = max((length for _, length in codes.values()), default=0)
+        self.table_bits = min(self.max_len, TABLE_BITS)
+        self.table = decode_table(codes, self.table_bits) if codes else []
+        self.by_length = {}
+        for symbol, (code, length) in codes.items():
+            self.by_length.setdefault(length, {})[code] = symbol
+
+    def _long_code(self, reader):
+        for length in range(self.table_bits + 1, self.max_len + 1):
+            symbol = self.by_length.get(length, {}).get(reader.peek(length))
+            if symbol is not None:
+                reader.consume(length)
+                return symbol
+        raise ValueError("Invalid Huffman code in payload")
+
+    def decode(self, payload, size):
+        """
+        Decodes `size` bytes from packed codes.
+        """
+        if size == 0:
+            return b""
+        if not self.max_len:
+            raise ValueError("Huffman payload has no codes")
+        reader = BitReader(payload)
+        out = reader.decode(self.table, self.table_bits, size, self.lengths, self._long_code)
+        if reader.position > reader.bit_length:
+            raise ValueError("Huffman payload is truncated")
+        return out
+
+
+def decompress_bytes(payload, lengths, size):
+    """
+    Decode `size` bytes from a payload produced by compress_bytes.
+    """
+    if size == 0:
+        return b""
+    return Decoder(lengths).decode(payload, size)
+
+
 if __name__ == "__main__":
     sample = "AAAABBBCCDAA"
     compressed, root = compress(sample)
@@ -0,0 +1,260 @@
+"""
+Opt-in instrumentation: stage timers, counters and peak memory.
+
+The codecs mark their hot sections with
+    with instrument.stage("huffman.tree"):
+        ...
+    instrument.count("raw_bytes", len(block))
+Both are no-ops until collection is enabled: stage() hands back a shared
+do-nothing context manager and count() returns after one global check, so
+the hooks sit at block granularity, never per byte.
+
+    with instrument.collect(memory=True) as stats:
+        stream.compress_file(src, dst, "huffman")
+    print(stats.to_json())          # or stats.to_prometheus()
+
+Stage names are "<area>.<step>": read, encode, decode and write come from
+the stream layer, "<codec>.encode"/"<codec>.decode" from the container,
+and codecs add their own steps (huffman.frequency, huffman.tree,
+vq.kmeans_iteration, vq.assign, ...). Nested stages are timed independently,
+so an outer stage's time includes its inner ones.
+memory=True traces allocations with tracemalloc for the peak; that slows
+allocation-heavy code down noticeably. The process's peak RSS is recorded
+either way where the resource module exists.
+"""
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# the Stats being collected into, None while disabled
+_stats = None
+_tracing = False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("_stats", "_name", "_start")
+
+    def __init__(self, stats, name):
+        self._stats = stats
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._stats.add_time(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Stats:
+    """
+    Collected measurements. `timers` maps a stage to [calls, total seconds,
+    longest call]; `counters` maps a name to an int. `peak_memory` is the
+    tracemalloc peak in bytes (None unless traced), `max_rss` the process's
+    peak resident size in bytes (None where unavailable).
+    """
+
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+        self.peak_memory = None
+        self.max_rss = None
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._memory = False
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    def add_count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        """
+        Adds another Stats (or its to_dict()) into this one, e.g. the stats
+        of jobs that ran in worker processes. Peaks keep the maximum.
+        """
+        if isinstance(other, Stats):
+            other = other.to_dict()
+        with self._lock:
+            for name, timer in other.get("timers", {}).items():
+                mine = self.timers.setdefault(name, [0, 0.0, 0.0])
+                mine[0] += timer["calls"]
+                mine[1] += timer["seconds"]
+                mine[2] = max(mine[2], timer["max_seconds"])
+            for name, value in other.get("counters", {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for field in ("peak_memory", "max_rss"):
+                value = other.get(field)
+                if value is not None:
+                    setattr(self, field, max(getattr(self, field) or 0, value))
+            self.seconds += other.get("seconds", 0.0)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "seconds": round(self.seconds, 6),
+                "timers": {
+                    name: {"calls": calls, "seconds": round(total, 6), "max_seconds": round(longest, 6)}
+                    for name, (calls, total, longest) in sorted(self.timers.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+                "peak_memory": self.peak_memory,
+                "max_rss": self.max_rss,
+            }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix="algopress"):
+        """
+        Prometheus text exposition format.
+        """
+        stats = self.to_dict()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            if not samples:
+                return
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{labels} {value}")
+
+        timers = stats["timers"].items()
+        metric("stage_calls_total", "counter", "Times each stage ran.",
+               [(format_labels(stage=name), timer["calls"]) for name, timer in timers])
+        metric("stage_seconds_total", "counter", "Seconds spent in each stage.",
+               [(format_labels(stage=name), timer["seconds"]) for name, timer in timers])
+        metric("stage_max_seconds", "gauge", "Longest single run of each stage.",
+               [(format_labels(stage=name), timer["max_seconds"]) for name, timer in timers])
+        metric("events_total", "counter", "Counted events and bytes.",
+               [(format_labels(name=name), value) for name, value in stats["counters"].items()])
+        metric("collect_seconds_total", "counter", "Seconds of collection.", [("", stats["seconds"])])
+        if stats["peak_memory"] is not None:
+            metric("peak_traced_bytes", "gauge", "Peak memory traced by tracemalloc.", [("", stats["peak_memory"])])
+        if stats["max_rss"] is not None:
+            metric("max_rss_bytes", "gauge", "Peak resident set size of the process.", [("", stats["max_rss"])])
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(**labels):
+    """
+    Prometheus label set, e.g. {stage="huffman.tree"}, with values escaped.
+    """
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _max_rss():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def enabled():
+    return _stats is not None
+
+
+def stage(name):
+    """
+    Context manager timing one run of stage `name`; free when disabled.
+    """
+    if _stats is None:
+        return _NULL_STAGE
+    return _Stage(_stats, name)
+
+
+def count(name, n=1):
+    """
+    Adds `n` to counter `name` when collection is enabled.
+    """
+    if _stats is not None:
+        _stats.add_count(name, n)
+
+
+def enable(memory=False):
+    """
+    Starts collecting into a new Stats and returns it, replacing any
+    collection in progress. memory=True also traces allocations.
+    """
+    global _stats, _tracing
+    disable()
+    if memory:
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+            _tracing = True
+    stats = Stats()
+    stats._memory = memory
+    _stats = stats
+    return stats
+
+
+def disable():
+    """
+    Stops collecting and returns the finished Stats, or None if collection
+    was not enabled.
+    """
+    global _stats, _tracing
+    stats, _stats = _stats, None
+    if stats is None:
+        return None
+    stats.seconds += time.perf_counter() - stats._started
+    if stats._memory and tracemalloc.is_tracing():
+        stats.peak_memory = tracemalloc.get_traced_memory()[1]
+        if _tracing:
+            tracemalloc.stop()
+            _tracing = False
+    stats.max_rss = _max_rss()
+    return stats
+
+
+@contextmanager
+def collect(memory=False):
+    """
+    Enables collection for the duration of the with block and yields the
+    Stats, complete once the block exits.
+    """
+    stats = enable(memory)
+    try:
+        yield stats
+    finally:
+        if _stats is stats:
+            disable()
@@ -0,0 +1,299 @@
+"""
+LZ77 with DEFLATE-style entropy coding.
+
+Matches are found with hash chains over 3-byte prefixes. The chains are
+built up front with NumPy (every position linked to the previous position
+with the same prefix), so the Python loop only walks them. Levels trade
+chain depth and lazy matching for speed, like zlib's levels.
+
+Tokens use the DEFLATE alphabets: literal/length symbols 0..285 (256 ends
+the block) and distance symbols 0..29, plus 30 and 31 for windows up to
+64 KiB (as in Deflate64). Both alphabets are Huffman-coded with canonical
+codes of at most 15 bits, as in DEFLATE, from lossless.huffman.
+
+Payload: 286 literal/length code lengths, 32 distance code lengths (one
+byte each), then the bit stream.
+"""
+import numpy as np
+
+from lossless import instrument
+from lossless.bitio import BitReader, BitWriter, decode_table
+from lossless.huffman import TABLE_BITS, canonical_codes, limited_code_lengths
+
+MIN_MATCH = 3
+MAX_MATCH = 258
+DEFAULT_WINDOW = 1 << 15
+MAX_WINDOW = 1 << 16
+DEFAULT_LEVEL = 6
+END_OF_BLOCK = 256
+
+# level -> (good length, nice length, max chain, lazy matching)
+# good: once a match this long is in hand, the lazy search only walks a
+# quarter of the chain; nice: stop searching at a match this long
+LEVELS = {
+    1: (4, 8, 4, False),
+    2: (4, 16, 8, False),
+    3: (4, 32, 32, False),
+    4: (4, 16, 16, True),
+    5: (8, 32, 32, True),
+    6: (8, 128, 128, True),
+    7: (8, 128, 256, True),
+    8: (32, 258, 1024, True),
+    9: (32, 258, 4096, True),
+}
+
+LENGTH_BASE = [3, 4, 5, 6, 7, 8, 9, 10, 11, 13, 15, 17, 19, 23, 27, 31,
+               35, 43, 51, 59, 67, 83, 99, 115, 131, 163, 195, 227, 258]
+LENGTH_EXTRA = [0] * 8 + [1] * 4 + [2] * 4 + [3] * 4 + [4] * 4 + [5] * 4 + [0]
+DIST_BASE = [1, 2, 3, 4, 5, 7, 9, 13, 17, 25, 33, 49, 65, 97, 129, 193, 257, 385, 513, 769,
+             1025, 1537, 2049, 3073, 4097, 6145, 8193, 12289, 16385, 24577, 32769, 49153]
+DIST_EXTRA = [0, 0, 0, 0] + [bits for bits in range(1, 15) for _ in range(2)]
+LITLEN_SYMBOLS = 286
+DIST_SYMBOLS = 32
+
+# length -> length symbol index (0..28)
+_LENGTH_CODE = np.zeros(MAX_MATCH + 1, dtype=np.int64)
+for _code, _base in enumerate(LENGTH_BASE):
+    _LENGTH_CODE[_base:] = _code
+
+
+def _chains(arr):
+    """
+    prev[i] = the closest earlier position with the same 3 bytes as i, or -1.
+    """
+    n = arr.shape[0]
+    prev = np.full(n, -1, dtype=np.int64)
+    if n < MIN_MATCH:
+        return prev
+    a = arr.astype(np.int64)
+    keys = (a[:-2] << 16) | (a[1:-1] << 8) | a[2:]
+    order = np.argsort(keys, kind="stable")
+    same = keys[order[1:]] == keys[order[:-1]]
+    prev[order[1:][same]] = order[:-1][same]
+    return prev
+
+
+def _match_length(data, a, b, limit):
+    """
+    Length of the common prefix of data[a:] and data[b:], at most `limit`;
+    the first MIN_MATCH bytes are known to match. Compares 8 bytes at a time.
+    """
+    length = MIN_MATCH
+    while length < limit:
+        x = int.from_bytes(data[a + length:a + length + 8], "big") ^ int.from_bytes(data[b + length:b + length + 8], "big")
+        if x:
+            length += (64 - x.bit_length()) // 8
+            break
+        length += 8
+    return min(length, limit)
+
+
+def tokenize(data, level=DEFAULT_LEVEL, window=DEFAULT_WINDOW):
+    """
+    Splits data into literals and back-references.
+    Returns (lengths, values) lists: length 0 marks a literal whose value is
+    the byte; otherwise value is the match distance.
+    """
+    if level not in LEVELS:
+        raise ValueError("level must be between 1 and 9, got %s" % level)
+    if not 1 <= window <= MAX_WINDOW:
+        raise ValueError("window must be between 1 and %d, got %s" % (MAX_WINDOW, window))
+    good, nice, max_chain, lazy = LEVELS[level]
+    data = bytes(data)
+    n = len(data)
+    # padding keeps the 8-byte comparisons in range at the end of the data
+    padded = data + b"\x00" * 16
+    prev = _chains(np.frombuffer(data, dtype=np.uint8)).tolist()
+
+    def find(i, chain, have):
+        # longest match at i that beats `have`, or (0, 0)
+        limit = min(MAX_MATCH, n - i)
+        best_len = have
+        best_dist = 0
+        j = prev[i]
+        while j >= 0 and i - j <= window and chain:
+            if padded[j + best_len] == padded[i + best_len]:
+                length = _match_length(padded, j, i, limit)
+                if length > best_len:
+                    best_len = length
+                    best_dist = i - j
+                    if length >= nice:
+                        break
+            j = prev[j]
+            chain -= 1
+        if best_dist and best_len >= MIN_MATCH:
+            return best_len, best_dist
+        return 0, 0
+
+    lengths = []
+    values = []
+    i = 0
+    while i < n:
+        length, dist = find(i, max_chain, MIN_MATCH - 1)
+        if length and lazy and length < nice:
+            # lazy matching: a longer match one byte later wins over this one
+            while i + 1 < n:
+                chain = max_chain >> 2 if length >= good else max_chain
+                next_length, next_dist = find(i + 1, chain, length)
+                if not next_length:
+                    break
+                lengths.append(0)
+                values.append(data[i])
+                i += 1
+                length, dist = next_length, next_dist
+                if length >= nice:
+                    break
+        if length:
+            lengths.append(length)
+            values.append(dist)
+            i += length
+        else:
+            lengths.append(0)
+            values.append(data[i])
+            i += 1
+    return lengths, values
+
+
+def _code_arrays(lengths):
+    codes = canonical_codes(dict(enumerate(lengths)))
+    values = np.zeros(len(lengths), dtype=np.uint64)
+    for symbol, (code, _) in codes.items():
+        values[symbol] = code
+    return values, np.array(lengths, dtype=np.int64)
+
+
+def compress_bytes(data, level=DEFAULT_LEVEL, window=DEFAULT_WINDOW):
+    """
+    LZ77 + Huffman compress a bytes-like object.
+    """
+    with instrument.stage("lz77.match"):
+        lengths, values = tokenize(data, level, window)
+    lengths = np.array(lengths, dtype=np.int64)
+    values = np.array(values, dtype=np.int64)
+    match = lengths > 0
+
+    litlen = np.where(match, 257 + _LENGTH_CODE[lengths], values)
+    len_code = _LENGTH_CODE[lengths]
+    len_extra_bits = np.where(match, np.array(LENGTH_EXTRA)[len_code], 0)
+    len_extra = np.where(match, lengths - np.array(LENGTH_BASE)[len_code], 0)
+    dist_code = np.where(match, np.searchsorted(DIST_BASE, values, side="right") - 1, 0)
+    dist_extra_bits = np.where(match, np.array(DIST_EXTRA)[dist_code], 0)
+    dist_extra = np.where(match, values - np.array(DIST_BASE)[dist_code], 0)
+
+    litlen_counts = np.bincount(np.append(litlen, END_OF_BLOCK), minlength=LITLEN_SYMBOLS)
+    dist_counts = np.bincount(dist_code[match], minlength=DIST_SYMBOLS)
+    with instrument.stage("lz77.tree"):
+        litlen_lengths = limited_code_lengths(litlen_counts).tolist()
+        dist_lengths = limited_code_lengths(dist_counts).tolist()
+    litlen_codes, litlen_widths = _code_arrays(litlen_lengths)
+    dist_codes, dist_widths = _code_arrays(dist_lengths)
+
+    # four fields per token; unused fields have width 0
+    fields = np.stack((
+        litlen_codes[litlen], len_extra.astype(np.uint64),
+        dist_codes[dist_code], dist_extra.astype(np.uint64),
+    ), axis=1)
+    widths = np.stack((
+        litlen_widths[litlen], len_extra_bits,
+        np.where(match, dist_widths[dist_code], 0), dist_extra_bits,
+    ), axis=1)
+    writer = BitWriter()
+    writer.write_bits(fields.ravel(), widths.ravel())
+    writer.write(int(litlen_codes[END_OF_BLOCK]), int(litlen_widths[END_OF_BLOCK]))
+    return bytes(litlen_lengths) + bytes(dist_lengths) + writer.getvalue()
+
+
+class _Alphabet:
+    """
+    Decoding side of one canonical code: a single-symbol table for codes up
+    to TABLE_BITS bits and a per-length search for longer ones.
+    """
+
+    def __init__(self, lengths):
+        codes = canonical_codes(dict(enumerate(lengths)))
+        self.max_len = max(lengths) if codes else 0
+        self.table_bits = min(self.max_len, TABLE_BITS)
+        self.table = [(0, 0)] * (1 << self.table_bits)
+        self.by_length = {}
+        for symbol, (code, length) in codes.items():
+            self.by_length.setdefault(length, {})[code] = symbol
+            if length <= self.table_bits:
+                shift = self.table_bits - length
+                self.table[code << shift:(code + 1) << shift] = [(symbol, length)] * (1 << shift)
+
+    def read(self, reader):
+        if not self.max_len:
+            raise ValueError("LZ77 stream uses an empty code")
+        symbol, length = self.table[reader.peek(self.table_bits)]
+        if length:
+            reader.consume(length)
+            return symbol
+        for length in range(self.table_bits + 1, self.max_len + 1):
+            symbol = self.by_length.get(length, {}).get(reader.peek(length))
+            if symbol is not None:
+                reader.consume(length)
+                return symbol
+        raise ValueError("Invalid code in LZ77 stream")
+
+
+def decompress_bytes(payload):
+    """
+    Inverse of compress_bytes.
+    """
+    payload = memoryview(payload)
+    if len(payload) < LITLEN_SYMBOLS + DIST_SYMBOLS:
+        raise ValueError("LZ77 payload is truncated")
+    litlen_lengths = list(payload[:LITLEN_SYMBOLS])
+    dist_lengths = list(payload[LITLEN_SYMBOLS:LITLEN_SYMBOLS + DIST_SYMBOLS])
+    litlen = _Alphabet(litlen_lengths)
+    dist = _Alphabet(dist_lengths)
+    if not litlen.max_len:
+        raise ValueError("LZ77 payload has no end-of-block code")
+
+    # runs of literals decode several at a time from a multi-symbol table
+    literal_codes = {symbol: code for symbol, code in canonical_codes(dict(enumerate(litlen_lengths))).items() if symbol < 256}
+    literal_table = decode_table(literal_codes, litlen.table_bits)
+    table_bits = litlen.table_bits
+
+    reader = BitReader(payload[LITLEN_SYMBOLS + DIST_SYMBOLS:])
+    peek = reader.peek
+    consume = reader.consume
+    read = reader.read
+    out = bytearray()
+    check = 0
+    while True:
+        symbols, used = literal_table[peek(table_bits)]
+        if used:
+            out += symbols
+            consume(used)
+            # zero bits past the end may decode as literals forever
+            check += 1
+            if check & 0xFFF == 0 and reader.position > reader.bit_length:
+                raise ValueError("LZ77 payload is truncated")
+            continue
+        symbol = litlen.read(reader)
+        if symbol < 256:
+            out.append(symbol)
+            continue
+        if symbol == END_OF_BLOCK:
+            break
+        code = symbol - 257
+        if code >= len(LENGTH_BASE):
+            raise ValueError("Invalid length symbol in LZ77 stream")
+        length = LENGTH_BASE[code] + (read(LENGTH_EXTRA[code]) if LENGTH_EXTRA[code] else 0)
+        code = dist.read(reader)
+        distance = DIST_BASE[code] + (read(DIST_EXTRA[code]) if DIST_EXTRA[code] else 0)
+        start = len(out) - distance
+        if start < 0:
+            raise ValueError("LZ77 distance points before the start of the data")
+        if distance >= length:
+            out += out[start:start + length]
+        else:
+            # overlapping copy: the last `distance` bytes repeat
+            pattern = out[start:]
+            out += (pattern * (length // distance + 1))[:length]
+        if reader.position > reader.bit_length:
+            raise ValueError("LZ77 payload is truncated")
+    if reader.position > reader.bit_length:
+        raise ValueError("LZ77 payload is truncated")
+    return bytes(out)
@@ -1,3 +1,6 @@
+from lossless.bitio import BitReader, BitWriter
+
+
 # def compress(data):
 #     dict_size = 256
 #     dictionary = {chr(i): i for i in range(dict_size)}
@@ -49,9 +52,10 @@
 def compress(text):
     """
     LZW compress using UTF-8 bytes to safely handle any Unicode input.
+    Bytes-like input is compressed as-is.
     Returns a list of integer codes.
     """
-    data = text.encode("utf-8")
+    data = text.encode("utf-8") if isinstance(text, str) else text
     dict_size = 256
     dictionary = {bytes([i]): i for i in range(dict_size)}
 
@@ -78,8 +82,15 @@ def decompress(compressed):
     LZW decompress list of integer codes to text (UTF-8).
     Returns a Unicode string; undecodable bytes are replaced.
     """
+    return decompress_bytes(compressed).decode("utf-8", errors="replace")
+
+
+def decompress_bytes(compressed):
+    """
+    LZW decompress list of integer codes to the original bytes.
+    """
     if not compressed:
-        return ""
+        return b""
     dict_size = 256
     dictionary = {i: bytes([i]) for i in range(dict_size)}
 
@@ -97,7 +108,227 @@ def decompress(compressed):
         dictionary[dict_size] = w + entry[:1]
         dict_size += 1
         w = entry
-    return result_bytes.decode("utf-8", errors="replace")
+    return bytes(result_bytes)
+
+
+# Packed mode: variable-width codes (9 bits up to max_bits) written MSB-first.
+# When the dictionary reaches 2**max_bits entries the encoder emits CLEAR_CODE
+# and both sides start over from the 256 single-byte entries; END_CODE marks
+# the end of the stream so it can be decoded without knowing the input size.
+CLEAR_CODE = 256
+END_CODE = 257
+FIRST_CODE = 258
+MIN_BITS = 9
+DEFAULT_MAX_BITS = 12
+CHUNK_SIZE = 1 << 16
+READ_BATCH = 1 << 12
+
+
+def check_max_bits(max_bits):
+    """
+    Raises ValueError unless codes of up to `max_bits` bits are supported.
+    """
+    if not MIN_BITS <= max_bits <= 24:
+        raise ValueError("max_bits must be between %d and 24, got %s" % (MIN_BITS, max_bits))
+
+
+class PackedEncoder:
+    """
+    Incremental LZW encoder: feed() bytes as they arrive, then flush() once.
+    Both return the packed output produced so far.
+    """
+
+    def __init__(self, max_bits=DEFAULT_MAX_BITS):
+        check_max_bits(max_bits)
+        self.max_bits = max_bits
+        self._limit = 1 << max_bits
+        self._dictionary = {}
+        self._next_code = FIRST_CODE
+        self._current = -1
+        self._writer = BitWriter()
+        self._finished = False
+
+    def feed(self, chunk):
+        if self._finished:
+            raise ValueError("Encoder already flushed")
+        dictionary = self._dictionary
+        next_code = self._next_code
+        current = self._current
+        limit = self._limit
+        # codes and widths are collected here and packed in bulk
+        codes = []
+        widths = []
+        emit = codes.append
+        emit_width = widths.append
+        width = max(MIN_BITS, (next_code - 1).bit_length())
+
+        for byte in chunk:
+            if current < 0:
+                current = byte
+                continue
+            key = (current << 8) | byte
+            code = dictionary.get(key)
+            if code is not None:
+                current = code
+                continue
+            # codes emitted now are all < next_code, so that many bits suffice
+            emit(current)
+            emit_width(width)
+            if next_code < limit:
+                dictionary[key] = next_code
+                next_code += 1
+                width = max(MIN_BITS, (next_code - 1).bit_length())
+            else:
+                emit(CLEAR_CODE)
+                emit_width(width)
+                dictionary = {}
+                next_code = FIRST_CODE
+                width = MIN_BITS
+            current = byte
+
+        self._dictionary = dictionary
+        self._next_code = next_code
+        self._current = current
+        self._writer.write_bits(codes, widths)
+        return self._writer.take()
+
+    def flush(self):
+        if self._finished:
+            return b""
+        self._finished = True
+        writer = self._writer
+        next_code = self._next_code
+        if self._current >= 0:
+            writer.write(self._current, max(MIN_BITS, (next_code - 1).bit_length()))
+        # the decoder has added one more entry by the time it reads END_CODE
+        writer.write(END_CODE, min(self.max_bits, max(MIN_BITS, next_code.bit_length())))
+        self._dictionary = {}
+        writer.align()
+        return writer.take()
+
+
+class PackedDecoder:
+    """
+    Incremental counterpart of PackedEncoder. feed() returns decoded bytes;
+    input after END_CODE is ignored.
+    """
+
+    def __init__(self, max_bits=DEFAULT_MAX_BITS):
+        check_max_bits(max_bits)
+        self.max_bits = max_bits
+        self._limit = 1 << max_bits
+        self._entries = [bytes([i]) for i in range(256)] + [b"", b""]
+        self._prev = None
+        self._reader = BitReader()
+        self._width = MIN_BITS
+        self.finished = False
+
+    def feed(self, data):
+        entries = self._entries
+        prev = self._prev
+        width = self._width
+        limit = self._limit
+        max_bits = self.max_bits
+        reader = self._reader
+        reader.extend(data)
+        out = bytearray()
+
+        while not self.finished:
+            # read a batch of codes that all share the current width: the
+            # width can only grow once the dictionary reaches 2**width entries
+            count = reader.available // width
+            if len(entries) < limit:
+                count = min(count, (1 << width) - len(entries))
+            count = min(count, READ_BATCH)
+            if count <= 0:
+                break
+            start = reader.position
+            for i, code in enumerate(reader.read_array(width, count).tolist()):
+                if code == CLEAR_CODE:
+                    del entries[FIRST_CODE:]
+                    prev = None
+                    # later codes in the batch were read at the old width
+                    reader.seek(start + (i + 1) * width)
+                    break
+                elif code == END_CODE:
+                    self.finished = True
+                    break
+                elif prev is None:
+                    if code >= 256:
+                        raise ValueError("Bad compressed k: %s" % code)
+                    entry = entries[code]
+                    out += entry
+                    prev = entry
+                else:
+                    if code < len(entries):
+                        entry = entries[code]
+                    elif code == len(entries):
+                        entry = prev + prev[:1]
+                    else:
+                        raise ValueError("Bad compressed k: %s" % code)
+                    if len(entries) < limit:
+                        entries.append(prev + entry[:1])
+                    out += entry
+                    prev = entry
+            width = min(max_bits, max(MIN_BITS, len(entries).bit_length()))
+
+        self._prev = prev
+        self._width = width
+        return bytes(out)
+
+    def flush(self):
+        if not self.finished:
+            raise ValueError("LZW stream is truncated: missing end code")
+        return b""
+
+
+def compress_packed(data, max_bits=DEFAULT_MAX_BITS):
+    """
+    LZW compress bytes into a packed variable-width code stream.
+    """
+    encoder = PackedEncoder(max_bits)
+    data = memoryview(data)
+    parts = [encoder.feed(data[i:i + CHUNK_SIZE]) for i in range(0, len(data), CHUNK_SIZE)]
+    parts.append(encoder.flush())
+    return b"".join(parts)
+
+
+def decompress_packed(payload, max_bits=DEFAULT_MAX_BITS):
+    decoder = PackedDecoder(max_bits)
+    result = decoder.feed(payload)
+    decoder.flush()
+    return result
+
+
+def compress_file(src, dst, max_bits=DEFAULT_MAX_BITS, chunk_size=CHUNK_SIZE):
+    """
+    Streams binary file object `src` through the packed encoder into `dst`.
+    Memory use is bounded by the dictionary cap, not the input size.
+    Returns (bytes read, bytes written).
+    """
+    encoder = PackedEncoder(max_bits)
+    read = written = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        read += len(chunk)
+        written += dst.write(encoder.feed(chunk))
+    written += dst.write(encoder.flush())
+    return read, written
+
+
+def decompress_file(src, dst, max_bits=DEFAULT_MAX_BITS, chunk_size=CHUNK_SIZE):
+    decoder = PackedDecoder(max_bits)
+    read = written = 0
+    while not decoder.finished:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        read += len(chunk)
+        written += dst.write(decoder.feed(chunk))
+    decoder.flush()
+    return read, written
 
 
 if __name__ == "__main__":
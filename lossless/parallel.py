@@ -0,0 +1,69 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from lossless.stream import BLOCK_SIZE, FrameWriter, decode_frame_bytes, encode_frame, read_index
+
+# Blocks in flight per worker; bounds memory to roughly workers * IN_FLIGHT * block_size.
+IN_FLIGHT = 2
+
+
+def _ordered(pool, fn, jobs, window):
+    """
+    Like pool.map, but only keeps `window` jobs submitted at a time so the input
+    iterator is consumed lazily. Results are yielded in submission order.
+    """
+    pending = deque()
+    for args in jobs:
+        pending.append(pool.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def compress_file(src_path, dst_path, algorithm, block_size=BLOCK_SIZE, workers=None):
+    """
+    Compresses a file by encoding independent blocks across a process pool.
+    The output is a regular block stream with its index, so it can be read
+    by lossless.stream as well as decompressed in parallel here.
+    Returns (bytes read, bytes written).
+    """
+    workers = workers or os.cpu_count() or 1
+    writer = FrameWriter(algorithm, block_size)
+    sizes = deque()
+
+    def blocks(f):
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            sizes.append(len(block))
+            yield algorithm, block
+
+    written = 0
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst, ProcessPoolExecutor(workers) as pool:
+        for frame in _ordered(pool, encode_frame, blocks(src), workers * IN_FLIGHT):
+            written += dst.write(writer.frame(sizes.popleft(), frame))
+        written += dst.write(writer.close())
+    return writer.raw_offset, written
+
+
+def decompress_file(src_path, dst_path, workers=None):
+    """
+    Decompresses an indexed block stream, decoding blocks across a process pool.
+    Returns (bytes read, bytes written).
+    """
+    workers = workers or os.cpu_count() or 1
+    written = 0
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst, ProcessPoolExecutor(workers) as pool:
+        index = read_index(src)
+
+        def frames():
+            for (_, start), (_, end) in zip(index, index[1:]):
+                src.seek(start)
+                yield (src.read(end - start),)
+
+        for block in _ordered(pool, decode_frame_bytes, frames(), workers * IN_FLIGHT):
+            written += dst.write(block)
+    return os.path.getsize(src_path), written
@@ -0,0 +1,241 @@
+"""
+Order-0 rANS entropy coder over bytes.
+
+The input is dealt round-robin to `lanes` independent rANS states (symbol i
+goes to lane i % lanes), so every step of the coder is one NumPy operation
+across all lanes. States are 32-bit with 16-bit renormalization, which means
+a lane emits at most one word per symbol; the word order follows from the
+lane masks, so no per-lane bookkeeping is stored.
+
+Two models:
+    static   -- frequencies from the whole input, sent with the data
+    adaptive -- starts uniform and is rebuilt every EPOCH symbols from the
+                symbols already coded (older counts halve each time), so
+                nothing is sent and drifting statistics are followed
+
+Payload: header (model, symbol count, lanes), static frequency table, final
+lane states, then the renormalization words, all big-endian.
+"""
+import struct
+
+import numpy as np
+
+from lossless import instrument
+
+SCALE_BITS = 14
+M = 1 << SCALE_BITS
+RANS_L = 1 << 16
+# a state at or above this limit (times the symbol frequency) must emit a word first
+X_MAX_BASE = (RANS_L >> SCALE_BITS) << 16
+MAX_LANES = 4096
+# symbols per lane; each lane costs 4 bytes of final state
+LANE_SYMBOLS = 1024
+EPOCH = 1 << 14
+
+MODELS = {"static": 0, "adaptive": 1}
+HEADER = struct.Struct(">BQH")
+TABLE_ENTRY = struct.Struct(">BH")
+
+
+def normalize(freq):
+    """
+    Scales symbol counts to frequencies summing to M. Accepts a 256-entry
+    array or a {symbol: count} dict such as huffman.frequency_dict returns.
+    Every symbol with a non-zero count keeps a frequency of at least 1.
+    """
+    if isinstance(freq, dict):
+        counts = np.zeros(256, dtype=np.int64)
+        for symbol, count in freq.items():
+            counts[symbol] = count
+    else:
+        counts = np.asarray(freq, dtype=np.int64)
+    total = int(counts.sum())
+    if total == 0:
+        raise ValueError("cannot build a model from empty statistics")
+    scaled = counts * M // total
+    scaled[(counts > 0) & (scaled == 0)] = 1
+    diff = M - int(scaled.sum())
+    if diff > 0:
+        scaled[int(np.argmax(counts))] += diff
+    else:
+        for symbol in np.argsort(-scaled, kind="stable"):
+            take = min(-diff, int(scaled[symbol]) - 1)
+            scaled[symbol] -= take
+            diff += take
+            if diff == 0:
+                break
+    return scaled
+
+
+def _tables(freq):
+    cum = np.cumsum(freq) - freq
+    slots = np.repeat(np.arange(256, dtype=np.uint8), freq)
+    return freq.astype(np.uint64), cum.astype(np.uint64), slots
+
+
+def _lanes(n):
+    return int(min(MAX_LANES, max(1, n // LANE_SYMBOLS)))
+
+
+def _adaptive_models(steps, lanes, symbols=None):
+    """
+    Yields (first step, tables) for each epoch of the adaptive model. The
+    decoder passes symbols=None and sends the decoded epoch back with send().
+    """
+    counts = np.ones(256, dtype=np.int64)
+    epoch_steps = max(1, EPOCH // lanes)
+    for first in range(0, steps, epoch_steps):
+        decoded = yield first, _tables(normalize(counts))
+        block = symbols[first * lanes:(first + epoch_steps) * lanes] if symbols is not None else decoded
+        counts = counts // 2 + np.bincount(block, minlength=256) + 1
+
+
+def estimate_size(data):
+    """
+    Static-model compress_bytes size from the byte histogram (within a few
+    bytes: the final renormalization words are approximated).
+    """
+    symbols = np.frombuffer(data, dtype=np.uint8)
+    n = symbols.shape[0]
+    if n == 0:
+        return HEADER.size
+    counts = np.bincount(symbols, minlength=256)
+    freq = normalize(counts)
+    used = counts > 0
+    bits = float((counts[used] * (SCALE_BITS - np.log2(freq[used]))).sum())
+    table = 2 + TABLE_ENTRY.size * int(np.count_nonzero(freq))
+    return HEADER.size + table + 4 * _lanes(n) + int(bits / 16) * 2
+
+
+def compress_bytes(data, model="static", freq=None):
+    """
+    rANS-codes a bytes-like object. `freq` optionally supplies the static
+    statistics (e.g. from huffman.frequency_dict) instead of counting them.
+    """
+    if model not in MODELS:
+        raise ValueError("Unknown rANS model: %s" % model)
+    symbols = np.frombuffer(data, dtype=np.uint8)
+    n = symbols.shape[0]
+    lanes = _lanes(n)
+    out = bytearray(HEADER.pack(MODELS[model], n, lanes))
+    if n == 0:
+        return bytes(out)
+    steps = -(-n // lanes)
+    padded = np.zeros(steps * lanes, dtype=np.uint8)
+    padded[:n] = symbols
+    grid = padded.reshape(steps, lanes)
+
+    if model == "static":
+        with instrument.stage("rans.frequency"):
+            counts = np.bincount(symbols, minlength=256)
+            freq = normalize(counts if freq is None else freq)
+        missing = np.flatnonzero((freq == 0) & (counts > 0))
+        if missing.shape[0]:
+            raise ValueError("freq has no count for symbols: %s" % ", ".join(map(str, missing)))
+        used = np.flatnonzero(freq)
+        out += struct.pack(">H", used.shape[0])
+        out += b"".join(TABLE_ENTRY.pack(int(symbol), int(freq[symbol])) for symbol in used)
+        epochs = [(0, _tables(freq))]
+    else:
+        epochs = list(_adaptive_models(steps, lanes, padded[:n]))
+
+    # encode back to front so the decoder runs front to back
+    x = np.full(lanes, RANS_L, dtype=np.uint64)
+    emitted = []
+    last_active = np.arange(lanes) < n - (steps - 1) * lanes
+    epoch = len(epochs) - 1
+    for t in range(steps - 1, -1, -1):
+        while epochs[epoch][0] > t:
+            epoch -= 1
+        freq_table, cum_table, _ = epochs[epoch][1]
+        s = grid[t]
+        f = freq_table[s]
+        c = cum_table[s]
+        if t == steps - 1:
+            f = np.where(last_active, f, 1)
+        emit = x >= f * X_MAX_BASE
+        if t == steps - 1:
+            emit &= last_active
+        emitted.append(x[emit] & 0xFFFF)
+        x = np.where(emit, x >> 16, x)
+        coded = ((x // f) << SCALE_BITS) + (x % f) + c
+        x = np.where(last_active, coded, x) if t == steps - 1 else coded
+
+    words = [np.stack((x >> 16, x & 0xFFFF), axis=1).ravel()] + emitted[::-1]
+    out += np.concatenate(words).astype(">u2").tobytes()
+    return bytes(out)
+
+
+def decompress_bytes(payload, size=None):
+    """
+    Inverse of compress_bytes. If the caller knows the decoded `size`, the
+    header is checked against it before anything is allocated.
+    """
+    payload = memoryview(payload)
+    if len(payload) < HEADER.size:
+        raise ValueError("rANS payload is truncated")
+    model, n, lanes = HEADER.unpack_from(payload)
+    if model not in MODELS.values() or not 1 <= lanes <= MAX_LANES:
+        raise ValueError("Invalid rANS header")
+    if size is not None and n != size:
+        raise ValueError("rANS payload does not match the expected size")
+    if n == 0:
+        return b""
+    pos = HEADER.size
+    steps = -(-n // lanes)
+
+    if model == MODELS["static"]:
+        if len(payload) < pos + 2:
+            raise ValueError("rANS payload is truncated")
+        (count,) = struct.unpack_from(">H", payload, pos)
+        pos += 2
+        if len(payload) < pos + count * TABLE_ENTRY.size:
+            raise ValueError("rANS payload is truncated")
+        freq = np.zeros(256, dtype=np.int64)
+        for i in range(count):
+            symbol, value = TABLE_ENTRY.unpack_from(payload, pos + i * TABLE_ENTRY.size)
+            freq[symbol] = value
+        pos += count * TABLE_ENTRY.size
+        if freq.sum() != M:
+            raise ValueError("Invalid rANS frequency table")
+        models = None
+        tables = _tables(freq)
+        next_epoch = steps
+    else:
+        models = _adaptive_models(steps, lanes)
+        _, tables = next(models)
+        next_epoch = max(1, EPOCH // lanes)
+
+    if (len(payload) - pos) % 2:
+        raise ValueError("rANS payload is truncated")
+    words = np.frombuffer(payload[pos:], dtype=">u2").astype(np.uint64)
+    if words.shape[0] < 2 * lanes:
+        raise ValueError("rANS payload is truncated")
+    x = (words[0:2 * lanes:2] << 16) | words[1:2 * lanes:2]
+    ptr = 2 * lanes
+    out = np.empty(steps * lanes, dtype=np.uint8)
+    last_active = np.arange(lanes) < n - (steps - 1) * lanes
+    epoch_start = 0
+    for t in range(steps):
+        if t == next_epoch:
+            _, tables = models.send(out[epoch_start * lanes:t * lanes])
+            epoch_start = t
+            next_epoch = t + max(1, EPOCH // lanes)
+        freq_table, cum_table, slots = tables
+        slot = x & (M - 1)
+        s = slots[slot]
+        decoded = freq_table[s] * (x >> SCALE_BITS) + slot - cum_table[s]
+        # lanes without a symbol in the last step keep their state
+        x = np.where(last_active, decoded, x) if t == steps - 1 else decoded
+        need = x < RANS_L
+        k = int(np.count_nonzero(need))
+        if ptr + k > words.shape[0]:
+            raise ValueError("rANS payload is truncated")
+        x[need] = (x[need] << 16) | words[ptr:ptr + k]
+        ptr += k
+        out[t * lanes:(t + 1) * lanes] = s
+
+    # every lane must unwind to the encoder's initial state
+    if ptr != words.shape[0] or np.any(x != RANS_L):
+        raise ValueError("rANS payload is corrupt")
+    return out[:n].tobytes()
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def compress(data):
     if not data:
         return ""
@@ -31,6 +34,176 @@ def decompress(data):
     return result
 
 
+# Binary mode: PackBits-style packets over bytes.
+#   header 0..127   -> header + 1 literal bytes follow
+#   header 129..255 -> the next byte repeats 257 - header times (2..128)
+#   header 128      -> no-op
+MAX_PACKET = 128
+MIN_RUN = 3
+CHUNK_SIZE = 1 << 20
+
+
+def _split(starts, lengths, even):
+    """
+    Cuts segments longer than MAX_PACKET into packets.
+    even=True spreads a run evenly over its packets so none is shorter than 2.
+    Returns (packet starts, packet lengths).
+    """
+    pieces = (lengths + MAX_PACKET - 1) // MAX_PACKET
+    total = int(pieces.sum())
+    first = np.cumsum(pieces) - pieces
+    index = np.arange(total) - np.repeat(first, pieces)
+    seg_len = np.repeat(lengths, pieces)
+    if even:
+        seg_pieces = np.repeat(pieces, pieces)
+        base = seg_len // seg_pieces
+        extra = seg_len % seg_pieces
+        sizes = base + (index < extra)
+        offsets = index * base + np.minimum(index, extra)
+    else:
+        offsets = index * MAX_PACKET
+        sizes = np.minimum(seg_len - offsets, MAX_PACKET)
+    return np.repeat(starts, pieces) + offsets, sizes
+
+
+def _segments(arr):
+    """
+    Splits arr into runs of at least MIN_RUN equal bytes and the literal spans
+    between them. Returns (run starts, run ends, literal starts, literal ends).
+    """
+    n = arr.shape[0]
+    # regions where neighbouring bytes are equal; a region of r equal pairs is a run of r + 1 bytes
+    eq = np.concatenate(([0], (arr[1:] == arr[:-1]).view(np.int8), [0]))
+    edges = np.diff(eq)
+    pair_starts = np.flatnonzero(edges == 1)
+    pair_ends = np.flatnonzero(edges == -1)
+    keep = pair_ends - pair_starts + 1 >= MIN_RUN
+    run_seg_starts = pair_starts[keep]
+    run_seg_ends = pair_ends[keep] + 1
+
+    # everything between runs is literal
+    lit_seg_starts = np.concatenate(([0], run_seg_ends))
+    lit_seg_ends = np.concatenate((run_seg_starts, [n]))
+    nonempty = lit_seg_ends > lit_seg_starts
+    return run_seg_starts, run_seg_ends, lit_seg_starts[nonempty], lit_seg_ends[nonempty]
+
+
+def _compress_chunk(arr):
+    n = arr.shape[0]
+    if n == 0:
+        return b""
+    run_seg_starts, run_seg_ends, lit_seg_starts, lit_seg_ends = _segments(arr)
+    run_starts, run_lengths = _split(run_seg_starts, run_seg_ends - run_seg_starts, even=True)
+    lit_starts, lit_lengths = _split(lit_seg_starts, lit_seg_ends - lit_seg_starts, even=False)
+
+    pos = np.concatenate((run_starts, lit_starts))
+    plen = np.concatenate((run_lengths, lit_lengths))
+    run = np.concatenate((np.ones(run_starts.shape[0], bool), np.zeros(lit_starts.shape[0], bool)))
+    order = np.argsort(pos, kind="stable")
+    pos, plen, run = pos[order], plen[order], run[order]
+
+    out_len = np.where(run, 2, plen + 1)
+    out_off = np.cumsum(out_len) - out_len
+    out = np.empty(int(out_len.sum()), dtype=np.uint8)
+    out[out_off] = np.where(run, 257 - plen, plen - 1).astype(np.uint8)
+    out[out_off[run] + 1] = arr[pos[run]]
+
+    # literal bytes keep their order, so copy them with two boolean masks
+    in_run = np.zeros(n + 1, dtype=np.int8)
+    np.add.at(in_run, run_seg_starts, 1)
+    np.add.at(in_run, run_seg_ends, -1)
+    literal_in = np.cumsum(in_run[:n], dtype=np.int8) == 0
+    literal_out = np.ones(out.shape[0], dtype=bool)
+    literal_out[out_off] = False
+    literal_out[out_off[run] + 1] = False
+    out[literal_out] = arr[literal_in]
+    return out.tobytes()
+
+
+def compress_bytes(data):
+    """
+    PackBits-style RLE over bytes. Run detection is vectorized with NumPy;
+    input is processed in CHUNK_SIZE pieces to bound temporary arrays.
+    """
+    arr = np.frombuffer(data, dtype=np.uint8)
+    return b"".join(_compress_chunk(arr[i:i + CHUNK_SIZE]) for i in range(0, arr.shape[0], CHUNK_SIZE))
+
+
+def estimate_size(data):
+    """
+    Exact compress_bytes output size, without building the output.
+    """
+    arr = np.frombuffer(data, dtype=np.uint8)
+    total = 0
+    for i in range(0, arr.shape[0], CHUNK_SIZE):
+        run_starts, run_ends, lit_starts, lit_ends = _segments(arr[i:i + CHUNK_SIZE])
+        runs = run_ends - run_starts
+        literals = lit_ends - lit_starts
+        total += 2 * int(((runs + MAX_PACKET - 1) // MAX_PACKET).sum())
+        total += int(literals.sum() + ((literals + MAX_PACKET - 1) // MAX_PACKET).sum())
+    return total
+
+
+def _expand(arr, start, end, skip, lengths, run, values):
+    """
+    Builds the output for the packets found in arr[start:end]. `skip` holds
+    the positions of headers and run values; every other byte is literal data,
+    already in output order.
+    """
+    seg = arr[start:end]
+    literal_in = np.ones(seg.shape[0], dtype=bool)
+    literal_in[np.array(skip, dtype=np.int64) - start] = False
+    lengths = np.array(lengths, dtype=np.int64)
+    run = np.array(run, dtype=bool)
+    run_out = np.repeat(run, lengths)
+    out = np.empty(run_out.shape[0], dtype=np.uint8)
+    out[~run_out] = seg[literal_in]
+    out[run_out] = np.repeat(arr[np.array(values, dtype=np.int64)], lengths[run])
+    return out.tobytes()
+
+
+def decompress_bytes(data, group=8192):
+    """
+    Inverse of compress_bytes. Packet headers are parsed in Python (one per
+    packet of up to 128 bytes); output is assembled with boolean masks and
+    np.repeat, `group` packets at a time.
+    """
+    arr = np.frombuffer(data, dtype=np.uint8)
+    data = arr
+    n = arr.shape[0]
+    out = []
+    start = 0
+    skip, lengths, run, values = [], [], [], []
+    i = 0
+    while i < n:
+        header = int(data[i])
+        skip.append(i)
+        if header < 128:
+            length = header + 1
+            if i + 1 + length > n:
+                raise ValueError("RLE literal packet is truncated")
+            lengths.append(length)
+            run.append(False)
+            i += 1 + length
+        elif header > 128:
+            if i + 1 >= n:
+                raise ValueError("RLE run packet is truncated")
+            skip.append(i + 1)
+            values.append(i + 1)
+            lengths.append(257 - header)
+            run.append(True)
+            i += 2
+        else:
+            i += 1
+        if len(lengths) >= group:
+            out.append(_expand(arr, start, i, skip, lengths, run, values))
+            start = i
+            skip, lengths, run, values = [], [], [], []
+    if skip:
+        out.append(_expand(arr, start, i, skip, lengths, run, values))
+    return b"".join(out)
+
+
 if __name__ == "__main__":
     sample = "AAAABBDAA"
     compressed = compress(sample)
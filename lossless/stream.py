@@ -0,0 +1,535 @@
+import io
+import mmap
+import os
+import struct
+import zlib
+from bisect import bisect_right
+
+from lossless.container import ALGORITHM_IDS, ALGORITHM_NAMES, VERSION, decode_block, encode_block, resolve_algorithm
+from lossless import instrument
+from lossless.fileio import GatherWriter, map_input
+
+STREAM_MAGIC = b"ALGS"
+BLOCK_SIZE = 1 << 20
+READ_SIZE = 1 << 16
+
+# magic, version, algorithm id, block size
+STREAM_HEADER = struct.Struct(">4sBBI")
+# algorithm id (0 ends the stream), raw size, CRC-32 of the raw block, params length, payload length
+FRAME_HEADER = struct.Struct(">BIIHI")
+END_FRAME = FRAME_HEADER.pack(0, 0, 0, 0, 0)
+
+# Block index written after the end frame: one (raw offset, frame offset) entry per
+# block plus a final entry for the end frame, then a footer locating the index.
+INDEX_MAGIC = b"ALGX"
+INDEX_ENTRY = struct.Struct(">QQ")
+INDEX_FOOTER = struct.Struct(">QI4s")
+
+
+def encode_frame(algorithm, block):
+    """
+    Compresses one block into a self-delimiting frame. With "auto" the frame
+    records the codec chosen for this block.
+    """
+    return b"".join(encode_frame_parts(algorithm, block))
+
+
+def encode_frame_parts(algorithm, block):
+    """
+    encode_frame as a list of buffers [header, params, payload], for gathered writes.
+    """
+    with instrument.stage("encode"):
+        algorithm = resolve_algorithm(algorithm, block)
+        params, payload = encode_block(algorithm, block)
+        header = FRAME_HEADER.pack(ALGORITHM_IDS[algorithm], len(block), zlib.crc32(block), len(params), len(payload))
+    instrument.count("blocks")
+    instrument.count("raw_bytes", len(block))
+    instrument.count("compressed_bytes", FRAME_HEADER.size + len(params) + len(payload))
+    return [header, params, payload]
+
+
+def encode_index(entries):
+    return b"".join(INDEX_ENTRY.pack(raw, offset) for raw, offset in entries)
+
+
+def read_index(fileobj):
+    """
+    Reads the block index from the end of a seekable stream.
+    Returns a list of (raw offset, frame offset); the last entry points at the
+    end frame, so its raw offset is the total uncompressed size.
+    """
+    # mmap.seek only returns the position from Python 3.13 on
+    fileobj.seek(0, io.SEEK_END)
+    end = fileobj.tell()
+    if end < STREAM_HEADER.size + INDEX_FOOTER.size:
+        raise ValueError("Stream has no block index")
+    fileobj.seek(end - INDEX_FOOTER.size)
+    index_offset, count, magic = INDEX_FOOTER.unpack(fileobj.read(INDEX_FOOTER.size))
+    if magic != INDEX_MAGIC or index_offset + count * INDEX_ENTRY.size != end - INDEX_FOOTER.size:
+        raise ValueError("Stream has no block index")
+    fileobj.seek(index_offset)
+    raw = fileobj.read(count * INDEX_ENTRY.size)
+    index = [INDEX_ENTRY.unpack_from(raw, i * INDEX_ENTRY.size) for i in range(count)]
+    if not index or any(a[0] > b[0] or a[1] >= b[1] for a, b in zip(index, index[1:])) or index[-1][1] >= index_offset:
+        raise ValueError("Stream block index is corrupt")
+    return index
+
+
+def decode_frame_bytes(frame):
+    """
+    Decodes one complete frame (header, params, payload) into its block.
+    The payload reaches the codec as a slice of `frame`, not a copy.
+    """
+    frame = memoryview(frame)
+    algo_id, size, crc, params_len, payload_len = FRAME_HEADER.unpack_from(frame)
+    start = FRAME_HEADER.size
+    if len(frame) < start + params_len + payload_len:
+        raise ValueError("Frame is truncated")
+    params = bytes(frame[start:start + params_len])
+    payload = frame[start + params_len:start + params_len + payload_len]
+    return decode_frame(algo_id, size, crc, params, payload)
+
+
+def decode_frame(algo_id, size, crc, params, payload):
+    if algo_id not in ALGORITHM_NAMES:
+        raise ValueError("Unknown algorithm id: %d" % algo_id)
+    with instrument.stage("decode"):
+        block = decode_block(ALGORITHM_NAMES[algo_id], params, payload, size)
+        if len(block) != size or zlib.crc32(block) != crc:
+            raise ValueError("Block checksum mismatch: data is corrupt")
+    instrument.count("blocks")
+    instrument.count("raw_bytes", size)
+    instrument.count("compressed_bytes", FRAME_HEADER.size + len(params) + len(payload))
+    return block
+
+
+class Compressor:
+    """
+    Incremental compressor: input is cut into fixed-size blocks, each compressed
+    independently, so memory stays around one block regardless of input size.
+    feed() returns whatever frames are complete; flush() returns the rest,
+    including the end frame and the block index.
+    """
+
+    def __init__(self, algorithm, block_size=BLOCK_SIZE):
+        if algorithm not in ALGORITHM_IDS:
+            raise ValueError("Unknown algorithm: %s" % algorithm)
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+        self.algorithm = algorithm
+        self.block_size = block_size
+        self._buffer = bytearray()
+        self._writer = FrameWriter(algorithm, block_size)
+        self._finished = False
+
+    def feed(self, chunk):
+        if self._finished:
+            raise ValueError("Compressor already flushed")
+        out = []
+        self._buffer += chunk
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+            out.append(self._writer.frame(len(block), encode_frame(self.algorithm, block)))
+        return b"".join(out)
+
+    def flush(self):
+        if self._finished:
+            return b""
+        out = []
+        if self._buffer:
+            out.append(self._writer.frame(len(self._buffer), encode_frame(self.algorithm, bytes(self._buffer))))
+            self._buffer = bytearray()
+        out.append(self._writer.close())
+        self._finished = True
+        return b"".join(out)
+
+
+class FrameWriter:
+    """
+    Lays out already-encoded frames: prepends the stream header, tracks the
+    block index as frames are added and appends end frame + index on close().
+    Frames must be added in input order; they can be encoded anywhere.
+    """
+
+    def __init__(self, algorithm, block_size):
+        self.algorithm = algorithm
+        self.block_size = block_size
+        self.raw_offset = 0
+        self.offset = 0
+        self.index = []
+
+    def _emit(self, parts):
+        if self.offset == 0:
+            parts = [STREAM_HEADER.pack(STREAM_MAGIC, VERSION, ALGORITHM_IDS[self.algorithm], self.block_size)] + parts
+        self.offset += sum(len(part) for part in parts)
+        return parts
+
+    def frame(self, raw_size, frame):
+        return b"".join(self.frame_parts(raw_size, [frame]))
+
+    def frame_parts(self, raw_size, parts):
+        """
+        frame() for a frame given as a list of buffers; returns a list of buffers.
+        """
+        header = STREAM_HEADER.size if self.offset == 0 else 0
+        self.index.append((self.raw_offset, self.offset + header))
+        self.raw_offset += raw_size
+        return self._emit(parts)
+
+    def close(self):
+        header = STREAM_HEADER.size if self.offset == 0 else 0
+        self.index.append((self.raw_offset, self.offset + header))
+        out = self._emit([END_FRAME])
+        index_offset = self.offset
+        footer = INDEX_FOOTER.pack(index_offset, len(self.index), INDEX_MAGIC)
+        return b"".join(out + self._emit([encode_index(self.index) + footer]))
+
+
+def parse_stream_header(buf):
+    """
+    Checks the stream header at the start of `buf` and returns
+    (algorithm, block size).
+    """
+    magic, version, algo_id, block_size = STREAM_HEADER.unpack_from(buf)
+    if magic != STREAM_MAGIC:
+        raise ValueError("Not an AlgoPress stream: bad magic")
+    if version != VERSION:
+        raise ValueError("Unsupported stream version: %d" % version)
+    if algo_id not in ALGORITHM_NAMES:
+        raise ValueError("Unknown algorithm id: %d" % algo_id)
+    return ALGORITHM_NAMES[algo_id], block_size
+
+
+def _mapped_blocks(view):
+    """
+    Decodes a whole stream held in one buffer (a memory map), passing the
+    payloads to the codecs as slices. Yields (end of frame, block).
+    """
+    if len(view) < STREAM_HEADER.size:
+        raise ValueError("Not an AlgoPress stream: bad magic")
+    parse_stream_header(view)
+    pos = STREAM_HEADER.size
+    while True:
+        if len(view) - pos < FRAME_HEADER.size:
+            raise ValueError("Stream is truncated: missing end frame")
+        algo_id, size, crc, params_len, payload_len = FRAME_HEADER.unpack_from(view, pos)
+        if algo_id == 0:
+            return
+        start = pos + FRAME_HEADER.size
+        pos = start + params_len + payload_len
+        if len(view) < pos:
+            raise ValueError("Stream is truncated: missing end frame")
+        params = bytes(view[start:start + params_len])
+        yield pos, decode_frame(algo_id, size, crc, params, view[start + params_len:pos])
+
+
+class Decompressor:
+    """
+    Incremental decompressor for the output of Compressor. feed() accepts any
+    slicing of the compressed stream and returns the blocks completed so far.
+    """
+
+    def __init__(self):
+        self.algorithm = None
+        self.block_size = None
+        self.finished = False
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        if self.finished:
+            return b""
+        self._buffer += data
+        buf = self._buffer
+        pos = 0
+        out = []
+        if self.algorithm is None:
+            if len(buf) < STREAM_HEADER.size:
+                return b""
+            self.algorithm, self.block_size = parse_stream_header(buf)
+            pos = STREAM_HEADER.size
+
+        while len(buf) - pos >= FRAME_HEADER.size:
+            algo_id, size, crc, params_len, payload_len = FRAME_HEADER.unpack_from(buf, pos)
+            if algo_id == 0:
+                pos += FRAME_HEADER.size
+                self.finished = True
+                break
+            end = pos + FRAME_HEADER.size + params_len + payload_len
+            if len(buf) < end:
+                break
+            start = pos + FRAME_HEADER.size
+            params = bytes(buf[start:start + params_len])
+            payload = bytes(buf[start + params_len:end])
+            out.append(decode_frame(algo_id, size, crc, params, payload))
+            pos = end
+        del buf[:pos]
+        return b"".join(out)
+
+    def flush(self):
+        if not self.finished:
+            raise ValueError("Stream is truncated: missing end frame")
+        return b""
+
+
+def read_algorithm(fileobj):
+    """
+    Reads the stream header from `fileobj` and returns the algorithm name.
+    """
+    header = fileobj.read(STREAM_HEADER.size)
+    if len(header) < STREAM_HEADER.size or header[:4] != STREAM_MAGIC:
+        raise ValueError("Not an AlgoPress stream: bad magic")
+    algo_id = header[5]
+    if algo_id not in ALGORITHM_NAMES:
+        raise ValueError("Unknown algorithm id: %d" % algo_id)
+    return ALGORITHM_NAMES[algo_id]
+
+
+def compress_iter(chunks, algorithm, block_size=BLOCK_SIZE):
+    """
+    Generator over compressed output for an iterable of byte chunks.
+    """
+    compressor = Compressor(algorithm, block_size)
+    for chunk in chunks:
+        out = compressor.feed(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def decompress_iter(chunks):
+    decompressor = Decompressor()
+    for chunk in chunks:
+        out = decompressor.feed(chunk)
+        if out:
+            yield out
+        if decompressor.finished:
+            break
+    decompressor.flush()
+
+
+def _read_chunks(fileobj, size=READ_SIZE):
+    while True:
+        with instrument.stage("read"):
+            chunk = fileobj.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _remaining_size(fileobj):
+    try:
+        return os.fstat(fileobj.fileno()).st_size - fileobj.tell()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def compress_file(src, dst, algorithm, block_size=BLOCK_SIZE, progress=None):
+    """
+    Compresses binary file object `src` into `dst`. Returns (bytes read, bytes written).
+    progress(done, total) is called after every block with input bytes consumed
+    and the input size (None if unknown); raising from it aborts the job.
+    """
+    with map_input(src) as view:
+        if view is not None:
+            return _compress_mapped(view, dst, algorithm, block_size, progress)
+    compressor = Compressor(algorithm, block_size)
+    total = _remaining_size(src) if progress else None
+    read = written = 0
+    for chunk in _read_chunks(src, block_size):
+        read += len(chunk)
+        frames = compressor.feed(chunk)
+        with instrument.stage("write"):
+            written += dst.write(frames)
+        if progress:
+            progress(read, total)
+    frames = compressor.flush()
+    with instrument.stage("write"):
+        written += dst.write(frames)
+    return read, written
+
+
+def decompress_file(src, dst, progress=None):
+    """
+    Decompresses `src` into `dst`. Returns (bytes read, bytes written).
+    progress(done, total) reports compressed bytes consumed, as in compress_file.
+    """
+    with map_input(src) as view:
+        if view is not None:
+            return _decompress_mapped(view, dst, progress)
+    decompressor = Decompressor()
+    total = _remaining_size(src) if progress else None
+    read = written = 0
+    for chunk in _read_chunks(src):
+        read += len(chunk)
+        blocks = decompressor.feed(chunk)
+        with instrument.stage("write"):
+            written += dst.write(blocks)
+        if progress:
+            progress(read, total)
+        if decompressor.finished:
+            break
+    decompressor.flush()
+    return read, written
+
+
+def _compress_mapped(view, dst, algorithm, block_size, progress):
+    # blocks are slices of the map and frames go out as separate buffers: no copies
+    if algorithm not in ALGORITHM_IDS:
+        raise ValueError("Unknown algorithm: %s" % algorithm)
+    if block_size <= 0:
+        raise ValueError("block_size must be positive")
+    writer = FrameWriter(algorithm, block_size)
+    out = GatherWriter(dst)
+    written = 0
+    for start in range(0, len(view), block_size):
+        block = view[start:start + block_size]
+        written += out.write(*writer.frame_parts(len(block), encode_frame_parts(algorithm, block)))
+        if progress:
+            progress(start + len(block), len(view))
+    written += out.write(writer.close())
+    out.close()
+    return len(view), written
+
+
+def _decompress_mapped(view, dst, progress):
+    out = GatherWriter(dst)
+    written = 0
+    for end, block in _mapped_blocks(view):
+        written += out.write(block)
+        if progress:
+            progress(end, len(view))
+    out.close()
+    return len(view), written
+
+
+class CompressedWriter(io.RawIOBase):
+    """
+    Write-only file object that compresses into `fileobj` as data is written.
+    close() writes the end frame; the underlying file is left open.
+    """
+
+    def __init__(self, fileobj, algorithm, block_size=BLOCK_SIZE):
+        self._fileobj = fileobj
+        self._compressor = Compressor(algorithm, block_size)
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._fileobj.write(self._compressor.feed(b))
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            self._fileobj.write(self._compressor.flush())
+        super().close()
+
+
+class CompressedReader(io.RawIOBase):
+    """
+    Read-only file object that decompresses from `fileobj` one block at a time.
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._decompressor = Decompressor()
+        self._pending = b""
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._offset >= len(self._pending):
+            if self._decompressor.finished:
+                return 0
+            chunk = self._fileobj.read(READ_SIZE)
+            if not chunk:
+                self._decompressor.flush()
+            self._pending = self._decompressor.feed(chunk)
+            self._offset = 0
+        n = min(len(b), len(self._pending) - self._offset)
+        b[:n] = self._pending[self._offset:self._offset + n]
+        self._offset += n
+        return n
+
+
+class IndexedReader:
+    """
+    Random access into an indexed block stream: read(offset, length) finds the
+    blocks covering the range in the block index and decodes only those. The
+    last decoded block is kept, so consecutive small reads decode it once.
+    `fileobj` must be binary and seekable; it is left open.
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.index = read_index(fileobj)
+        self._starts = [raw for raw, _ in self.index]
+        self.size = self._starts[-1]
+        self._cached = (None, b"")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._cached = (None, b"")
+
+    def _decode(self, start, end):
+        self._fileobj.seek(start)
+        return decode_frame_bytes(self._fileobj.read(end - start))
+
+    def block(self, i):
+        """
+        Decoded contents of block i.
+        """
+        if self._cached[0] != i:
+            self._cached = (i, self._decode(self.index[i][1], self.index[i + 1][1]))
+        return self._cached[1]
+
+    def read(self, offset, length):
+        """
+        Returns up to `length` bytes of the original data starting at `offset`
+        (fewer at the end of the data).
+        """
+        if offset < 0 or length < 0:
+            raise ValueError("offset and length must be non-negative")
+        end = min(offset + length, self.size)
+        out = []
+        i = bisect_right(self._starts, offset) - 1
+        while offset < end:
+            start = offset - self._starts[i]
+            piece = self.block(i)[start:start + end - offset]
+            out.append(piece)
+            offset += len(piece)
+            i += 1
+        return b"".join(out)
+
+
+class MappedReader(IndexedReader):
+    """
+    IndexedReader over a memory-mapped file: frames are sliced out of the
+    mapping instead of read into new buffers, and only the pages of the blocks
+    actually read are touched.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            super().__init__(self._map)
+        except ValueError:
+            self._map.close()
+            raise
+
+    def close(self):
+        super().close()
+        self._map.close()
+
+    def _decode(self, start, end):
+        with memoryview(self._map) as view, view[start:end] as frame:
+            return decode_frame_bytes(frame)
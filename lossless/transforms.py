@@ -0,0 +1,318 @@
+"""
+Reversible byte transforms, chained in front of an entropy coder.
+
+A pipeline is a list of stages followed by a final coder, e.g. the default
+bwt -> mtf -> zrle -> rans, the bzip2 recipe: the Burrows-Wheeler transform
+groups bytes by context, move-to-front turns that into runs of small
+numbers, and zero-run coding shrinks the runs before the entropy coder.
+
+Stages:
+    bwt   -- Burrows-Wheeler transform per BWT_BLOCK bytes; the suffix array
+             is built by prefix doubling with NumPy sorts
+    mtf   -- move-to-front
+    zrle  -- runs of zeros as bijective base-2 digits (bzip2's RUNA/RUNB),
+             other values shifted up by one
+    delta -- differences of consecutive bytes, mod 256
+    rle   -- lossless.rle packets
+
+Params: coder id, stage count, the size before every stage and of the coder
+input, then the stage ids. decompress_bytes replays the stages in reverse and
+checks every intermediate size.
+"""
+import struct
+
+import numpy as np
+
+from lossless import huffman, instrument, rans, rle
+
+STAGES = {"bwt": 1, "mtf": 2, "zrle": 3, "delta": 4, "rle": 5}
+STAGE_NAMES = {value: key for key, value in STAGES.items()}
+CODERS = {"stored": 0, "huffman": 1, "rans": 2}
+CODER_NAMES = {value: key for key, value in CODERS.items()}
+DEFAULT_STAGES = ("bwt", "mtf", "zrle")
+DEFAULT_CODER = "rans"
+
+BWT_BLOCK = 1 << 20
+# coder id, stage count
+PARAMS = struct.Struct(">BB")
+SIZE = struct.Struct(">I")
+
+
+def _suffix_array(arr):
+    """
+    Suffix array of a uint8 array by prefix doubling: every round sorts the
+    suffixes by (rank of the first k bytes, rank of the next k bytes) until
+    all ranks differ. The first round keys on 4 bytes at once. A suffix sorts
+    before its own extensions, as if the data ended with a unique smallest byte.
+    """
+    n = arr.shape[0]
+    key = np.zeros(n, dtype=np.int64)
+    shifted = arr.astype(np.int64) + 1
+    for j in range(4):
+        # 9 bits per byte; 0 stands for "past the end"
+        key <<= 9
+        key[:max(n - j, 0)] |= shifted[j:]
+    k = 4
+    while True:
+        # ranks only need equal keys grouped, so the sort need not be stable
+        sa = np.argsort(key)
+        sorted_key = key[sa]
+        rank = np.empty(n, dtype=np.int64)
+        rank[sa] = np.cumsum(np.concatenate(([1], sorted_key[1:] != sorted_key[:-1])))
+        if rank[sa[-1]] == n or k >= n:
+            return sa
+        key = rank * (n + 1)
+        key[:n - k] += rank[k:]
+        k *= 2
+
+
+def _bwt_block(arr):
+    """
+    Returns (primary, last column without the end marker). `primary` is the
+    row of the end marker in the last column of the sorted rotations of
+    data + marker.
+    """
+    sa = _suffix_array(arr)
+    primary = int(np.flatnonzero(sa == 0)[0]) + 1
+    # row 0 is the rotation starting at the marker, whose last byte is the data's last byte
+    last = np.concatenate((arr[-1:], arr[sa - 1]))
+    return primary, np.delete(last, primary)
+
+
+def _unbwt_block(primary, last):
+    n = last.shape[0]
+    if not 1 <= primary <= n:
+        raise ValueError("Invalid BWT primary index")
+    index = np.int32 if n < 1 << 29 else np.int64
+    full = np.insert(last.astype(np.int32), primary, -1)
+    # LF mapping: row i's rotation shifted right by one byte is row lf[i]
+    lf = np.empty(n + 1, dtype=index)
+    lf[np.argsort(full, kind="stable")] = np.arange(n + 1, dtype=index)
+    # distance of every row from the marker row along lf, by pointer jumping;
+    # the row at distance d ends with data[d - 1]
+    dist = np.ones(n + 1, dtype=index)
+    dist[primary] = 0
+    lf[primary] = primary
+    steps = 1
+    while steps <= n:
+        dist += dist[lf]
+        lf = lf[lf]
+        steps *= 2
+    if dist.max() > n:
+        # rows on a cycle that misses the marker: not the output of _bwt_block
+        raise ValueError("BWT data is corrupt")
+    out = np.empty(n, dtype=np.uint8)
+    rows = np.arange(n + 1) != primary
+    out[dist[rows] - 1] = full[rows]
+    return out
+
+
+def bwt(data, block_size=None):
+    """
+    Burrows-Wheeler transform, `block_size` (default BWT_BLOCK) bytes at a
+    time. Output: the block size, then per block its primary index and last
+    column, all sizes 4 bytes.
+    """
+    block_size = block_size or BWT_BLOCK
+    arr = np.frombuffer(data, dtype=np.uint8)
+    out = [SIZE.pack(block_size)]
+    for start in range(0, arr.shape[0], block_size):
+        primary, last = _bwt_block(arr[start:start + block_size])
+        out.append(SIZE.pack(primary))
+        out.append(last.tobytes())
+    return b"".join(out)
+
+
+def unbwt(data, size):
+    arr = np.frombuffer(data, dtype=np.uint8)
+    if arr.shape[0] < SIZE.size:
+        raise ValueError("BWT data is truncated")
+    (block_size,) = SIZE.unpack_from(data)
+    if block_size == 0:
+        raise ValueError("Invalid BWT block size")
+    out = []
+    pos = SIZE.size
+    for start in range(0, size, block_size):
+        n = min(block_size, size - start)
+        if pos + SIZE.size + n > arr.shape[0]:
+            raise ValueError("BWT data is truncated")
+        (primary,) = SIZE.unpack_from(data, pos)
+        out.append(_unbwt_block(primary, arr[pos + SIZE.size:pos + SIZE.size + n]).tobytes())
+        pos += SIZE.size + n
+    if pos != arr.shape[0]:
+        raise ValueError("BWT data does not match its recorded size")
+    return b"".join(out)
+
+
+def mtf(data):
+    """
+    Move-to-front: each byte becomes its position in a recency list.
+    """
+    order = bytearray(range(256))
+    find = order.index
+    out = bytearray(len(data))
+    for i, symbol in enumerate(bytes(data)):
+        k = find(symbol)
+        if k:
+            del order[k]
+            order.insert(0, symbol)
+        out[i] = k
+    return bytes(out)
+
+
+def unmtf(data, size):
+    order = bytearray(range(256))
+    out = bytearray(len(data))
+    for i, k in enumerate(bytes(data)):
+        symbol = order[k]
+        if k:
+            del order[k]
+            order.insert(0, symbol)
+        out[i] = symbol
+    return bytes(out)
+
+
+def zrle(data):
+    """
+    Zero-run coding: a run of r zeros becomes the digits of r + 1 below its
+    leading 1 bit, least significant first, as bytes 0 and 1. Other values
+    v become v + 1, and 254/255 become 255 followed by v - 254.
+    """
+    a = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    zero = a == 0
+    edges = np.diff(np.concatenate(([0], zero.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    runs = np.flatnonzero(edges == -1) - starts
+    # bit length of runs + 1, minus the leading 1
+    digits = np.frexp((runs + 1).astype(np.float64))[1].astype(np.int64) - 1
+
+    widths = np.where(zero, 0, np.where(a >= 254, 2, 1))
+    widths[starts] = digits
+    pos = np.concatenate(([0], np.cumsum(widths)))
+    out = np.empty(pos[-1], dtype=np.uint8)
+    small = np.flatnonzero(~zero & (a < 254))
+    big = np.flatnonzero(a >= 254)
+    out[pos[small]] = a[small] + 1
+    out[pos[big]] = 255
+    out[pos[big] + 1] = a[big] - 254
+    run = np.repeat(np.arange(runs.shape[0]), digits)
+    digit = np.arange(run.shape[0]) - np.repeat(np.cumsum(digits) - digits, digits)
+    out[pos[starts][run] + digit] = ((runs + 1)[run] >> digit) & 1
+    return out.tobytes()
+
+
+def unzrle(data, size):
+    b = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    if b.shape[0] and b[-1] == 255:
+        raise ValueError("Zero-run data is truncated")
+    extra = np.zeros(b.shape[0], dtype=bool)
+    extra[1:] = b[:-1] == 255
+    digit_mask = (b <= 1) & ~extra
+    edges = np.diff(np.concatenate(([0], digit_mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    digits = np.flatnonzero(edges == -1) - starts
+    if digits.shape[0] and digits.max() > 40:
+        raise ValueError("Zero-run data is corrupt")
+    positions = np.flatnonzero(digit_mask)
+    run = np.repeat(np.arange(starts.shape[0]), digits)
+    runs = np.bincount(run, weights=(b[positions] + 1) << (positions - starts[run]), minlength=starts.shape[0])
+    widths = np.where(digit_mask | extra, 0, 1)
+    widths[starts] = runs.astype(np.int64)
+    if int(widths.sum()) != size:
+        raise ValueError("Zero-run data does not match its recorded size")
+    values = np.where(b == 255, 254 + np.concatenate((b[1:], [0])), b - 1)
+    values[digit_mask] = 0
+    return np.repeat(values, widths).astype(np.uint8).tobytes()
+
+
+def delta(data):
+    """
+    First byte, then differences of consecutive bytes mod 256.
+    """
+    a = np.frombuffer(data, dtype=np.uint8)
+    return np.diff(a, prepend=np.uint8(0)).tobytes()
+
+
+def undelta(data, size):
+    return np.cumsum(np.frombuffer(data, dtype=np.uint8), dtype=np.uint8).tobytes()
+
+
+def _unrle(data, size):
+    return rle.decompress_bytes(data)
+
+
+_STAGES = {
+    "bwt": (bwt, unbwt),
+    "mtf": (mtf, unmtf),
+    "zrle": (zrle, unzrle),
+    "delta": (delta, undelta),
+    "rle": (rle.compress_bytes, _unrle),
+}
+
+
+def _encode(coder, data):
+    if coder == "huffman":
+        payload, lengths = huffman.compress_bytes(data)
+        return bytes(lengths) + payload
+    if coder == "rans":
+        return rans.compress_bytes(data)
+    return bytes(data)
+
+
+def _decode(coder, payload, size):
+    if coder == "huffman":
+        if len(payload) < 256:
+            raise ValueError("Huffman payload is truncated")
+        return huffman.decompress_bytes(payload[256:], list(payload[:256]), size)
+    if coder == "rans":
+        return rans.decompress_bytes(payload, size)
+    return bytes(payload)
+
+
+def compress_bytes(data, stages=DEFAULT_STAGES, coder=DEFAULT_CODER):
+    """
+    Runs data through `stages` in order, then through `coder`.
+    Returns (params, payload); params describe the whole pipeline.
+    """
+    if coder not in CODERS:
+        raise ValueError("Unknown coder: %s" % coder)
+    for stage in stages:
+        if stage not in STAGES:
+            raise ValueError("Unknown transform: %s" % stage)
+    sizes = [len(data)]
+    for stage in stages:
+        with instrument.stage(stage + ".forward"):
+            data = _STAGES[stage][0](data)
+        sizes.append(len(data))
+    params = PARAMS.pack(CODERS[coder], len(stages))
+    params += b"".join(SIZE.pack(size) for size in sizes)
+    params += bytes(STAGES[stage] for stage in stages)
+    return params, _encode(coder, data)
+
+
+def decompress_bytes(params, payload):
+    """
+    Inverse of compress_bytes.
+    """
+    if len(params) < PARAMS.size:
+        raise ValueError("Transform params are truncated")
+    coder_id, count = PARAMS.unpack_from(params)
+    if len(params) != PARAMS.size + (count + 1) * SIZE.size + count:
+        raise ValueError("Transform params are truncated")
+    if coder_id not in CODER_NAMES:
+        raise ValueError("Unknown coder id: %d" % coder_id)
+    sizes = [SIZE.unpack_from(params, PARAMS.size + i * SIZE.size)[0] for i in range(count + 1)]
+    stage_ids = params[PARAMS.size + (count + 1) * SIZE.size:]
+    for stage_id in stage_ids:
+        if stage_id not in STAGE_NAMES:
+            raise ValueError("Unknown transform id: %d" % stage_id)
+    data = _decode(CODER_NAMES[coder_id], payload, sizes[-1])
+    if len(data) != sizes[-1]:
+        raise ValueError("Transform payload does not match its recorded size")
+    for i in range(count - 1, -1, -1):
+        stage = STAGE_NAMES[stage_ids[i]]
+        with instrument.stage(stage + ".inverse"):
+            data = _STAGES[stage][1](data, sizes[i])
+        if len(data) != sizes[i]:
+            raise ValueError("Transform output does not match its recorded size")
+    return data
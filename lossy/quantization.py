@@ -1,6 +1,13 @@
+from collections import OrderedDict
+from numpy.lib import format as npy_format
 from PIL import Image
 import numpy as np
+import hashlib
 import os
+import zipfile
+import zlib
+
+from lossless import instrument, rans
 
 
 def _extract_blocks(pixels, block_size):
@@ -47,58 +54,357 @@ def _reconstruct_image(codebook, assignments, trimmed_shape, block_size, origina
     return canvas
 
 
-def _kmeans(data, k, max_iter=20):
-    # Simple k-means for small images; not optimized for very large inputs.
-    rng = np.random.default_rng()
-    # initialize centers by sampling without replacement
-    if data.shape[0] < k:
-        k = data.shape[0]
-    idx = rng.choice(data.shape[0], size=k, replace=False)
-    centers = data[idx].astype(np.float32)
-
-    for _ in range(max_iter):
-        # assign
-        dists = np.linalg.norm(data[:, None, :] - centers[None, :, :], axis=2)
-        assignments = np.argmin(dists, axis=1)
-        # recompute
-        new_centers = np.stack(
-            [data[assignments == i].mean(axis=0) if np.any(assignments == i) else centers[i] for i in range(k)]
-        )
-        if np.allclose(new_centers, centers):
+# Rows processed per distance chunk; bounds the temporary (chunk, k) matrix.
+ASSIGN_CHUNK = 1 << 16
+# Above this many blocks, quantize_image trains on mini-batches by default.
+MINI_BATCH_THRESHOLD = 1 << 18
+MINI_BATCH_SIZE = 1 << 14
+# k-means++ seeding looks at a sample of at most this many rows.
+INIT_SAMPLE = 1 << 16
+# Blocks per strip in the tiled mode; bounds its working memory like ASSIGN_CHUNK.
+TILE_BLOCKS = 1 << 16
+# How quantize_image stores assignments; "auto" keeps whichever is smallest
+# after the deflate pass of the .npz.
+#   int       -- one unsigned integer per block, 8/16/32 bits (readable as plain "assignments")
+#   packed    -- ceil(log2(levels)) bits per block
+#   neighbour -- per block: 0 = same as left, 1 = same as above, else index + 2; rANS-coded
+ASSIGNMENT_CODINGS = ("int", "packed", "neighbour")
+# zip headers plus .npy header, per array in the .npz
+NPZ_MEMBER_OVERHEAD = 250
+# Trained codebooks kept in memory, keyed by hash, least recently used evicted first.
+CODEBOOK_CACHE_SIZE = 8
+
+_CODEBOOK_CACHE = OrderedDict()
+
+
+def _assign(data, centers, with_sums=False):
+    """
+    Index of the nearest center for each row.
+    Uses ||x||^2 - 2x.c + ||c||^2 (the ||x||^2 term does not change the argmin),
+    one chunk of rows at a time, so memory is O(chunk * k) rather than O(n * k * d).
+    With with_sums=True also returns per-cluster counts (np.bincount) and row sums,
+    accumulated in the same pass so the data is only converted to float once.
+    """
+    centers = centers.astype(np.float32)
+    k = centers.shape[0]
+    c_sq = np.einsum("ij,ij->i", centers, centers)
+    assignments = np.empty(data.shape[0], dtype=np.intp)
+    sums = np.zeros(centers.shape, dtype=np.float64)
+    with instrument.stage("vq.assign"):
+        for start in range(0, data.shape[0], ASSIGN_CHUNK):
+            x = data[start:start + ASSIGN_CHUNK].astype(np.float32)
+            labels = np.argmin(c_sq - 2 * (x @ centers.T), axis=1)
+            assignments[start:start + ASSIGN_CHUNK] = labels
+            if with_sums:
+                # one-hot (chunk, k) matrix turns the scatter-add into a single matmul
+                sums += (labels[:, None] == np.arange(k)).astype(np.float32).T @ x
+    if not with_sums:
+        return assignments
+    return assignments, np.bincount(assignments, minlength=k).astype(np.float64), sums
+
+
+def _index_dtype(k):
+    return np.uint8 if k <= 1 << 8 else np.uint16 if k <= 1 << 16 else np.uint32
+
+
+def _pack_indices(values, bits):
+    planes = (values[:, None] >> np.arange(bits - 1, -1, -1, dtype=values.dtype)) & 1
+    return np.packbits(planes.astype(np.uint8))
+
+
+def _unpack_indices(packed, bits, count):
+    planes = np.unpackbits(packed, count=count * bits).reshape(count, bits)
+    return planes.astype(np.uint32) @ (np.uint32(1) << np.arange(bits - 1, -1, -1, dtype=np.uint32))
+
+
+def _neighbour_symbols(grid):
+    above = np.zeros_like(grid)
+    above[1:] = grid[:-1]
+    left = np.zeros_like(grid)
+    left[:, 1:] = grid[:, :-1]
+    return np.where(grid == left, 0, np.where(grid == above, 1, grid + 2)).astype(np.uint8)
+
+
+def _neighbour_values(symbols):
+    """
+    Inverse of _neighbour_symbols, one row at a time (each row refers to the one above).
+    """
+    grid = np.zeros(symbols.shape, dtype=np.int64)
+    above = np.zeros(symbols.shape[1] + 1, dtype=np.int64)
+    positions = np.arange(symbols.shape[1] + 1)
+    for r, row in enumerate(symbols):
+        # a virtual column of zeros on the left, as the encoder assumed
+        values = np.concatenate(([0], np.where(row == 1, above[1:], row.astype(np.int64) - 2)))
+        known = np.concatenate(([True], row != 0))
+        # "same as left" copies the nearest known value to its left
+        values = values[np.maximum.accumulate(np.where(known, positions, 0))]
+        grid[r] = values[1:]
+        above = values
+    return grid
+
+
+def _encode_assignments(assignments, k, columns, coding="auto"):
+    """
+    Returns the .npz fields storing `assignments` (row-major, `columns` blocks
+    per row) for a codebook of k entries with the given coding.
+    """
+    if coding != "auto" and coding not in ASSIGNMENT_CODINGS:
+        raise ValueError(f"Unknown assignment coding: {coding}")
+    candidates = {}
+    if coding in ("auto", "int"):
+        candidates["int"] = {"assignments": assignments.astype(_index_dtype(k))}
+    if coding in ("auto", "packed"):
+        bits = max(1, int(k - 1).bit_length())
+        candidates["packed"] = {
+            "assignments_coded": _pack_indices(assignments.astype(np.uint32), bits),
+            "assignments_coding": np.array("packed"),
+            "assignments_bits": np.array(bits),
+        }
+    if coding in ("auto", "neighbour"):
+        if k > 254:
+            if coding == "neighbour":
+                raise ValueError("neighbour coding needs at most 254 levels")
+        else:
+            symbols = _neighbour_symbols(assignments.reshape(-1, columns))
+            candidates["neighbour"] = {
+                "assignments_coded": np.frombuffer(rans.compress_bytes(symbols.tobytes()), dtype=np.uint8),
+                "assignments_coding": np.array("neighbour"),
+            }
+    if len(candidates) == 1:
+        return next(iter(candidates.values()))
+    sizes = {name: sum(NPZ_MEMBER_OVERHEAD + len(zlib.compress(np.ascontiguousarray(v).tobytes())) for v in fields.values())
+             for name, fields in candidates.items()}
+    return candidates[min(sizes, key=sizes.get)]
+
+
+def _decode_assignments(data, count, columns):
+    """
+    Reads the assignments back from a loaded .npz, whatever the coding.
+    """
+    if "assignments" in data:
+        return data["assignments"]
+    coding = str(data["assignments_coding"])
+    coded = data["assignments_coded"]
+    if coding == "packed":
+        bits = int(data["assignments_bits"])
+        if coded.shape[0] * 8 < count * bits:
+            raise ValueError("Packed assignments are truncated")
+        values = _unpack_indices(coded, bits, count)
+    elif coding == "neighbour":
+        symbols = np.frombuffer(rans.decompress_bytes(coded.tobytes()), dtype=np.uint8)
+        if symbols.shape[0] != count:
+            raise ValueError("Assignment count does not match the image size")
+        values = _neighbour_values(symbols.reshape(-1, columns)).ravel()
+    else:
+        raise ValueError(f"Unknown assignment coding: {coding}")
+    return values
+
+
+def _kmeans_plus_plus(data, k, rng):
+    """
+    k-means++ seeding: each new center is drawn with probability proportional
+    to its squared distance from the nearest center chosen so far.
+    """
+    if data.shape[0] > INIT_SAMPLE:
+        data = data[rng.choice(data.shape[0], size=INIT_SAMPLE, replace=False)]
+    data = data.astype(np.float32)
+    centers = np.empty((k, data.shape[1]), dtype=np.float32)
+    centers[0] = data[rng.integers(data.shape[0])]
+    closest = np.sum((data - centers[0]) ** 2, axis=1)
+    for i in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            # fewer distinct rows than k; duplicates are harmless
+            centers[i:] = centers[0]
             break
-        centers = new_centers
-    return centers.astype(np.uint8), assignments
+        centers[i] = data[rng.choice(data.shape[0], p=closest / total)]
+        np.minimum(closest, np.sum((data - centers[i]) ** 2, axis=1), out=closest)
+    return centers
 
 
-def quantize_image(image_path, levels=16, save_path="compressed_image.npz", block_size=(4, 4)):
+def _kmeans(data, k, max_iter=20, mini_batch=False, batch_size=MINI_BATCH_SIZE, rng=None, progress=None):
     """
-    Vector quantization using k-means over image blocks.
-    Saves compressed codebook + assignments to an .npz file.
-    Returns (compression_percentage, mse) vs original file.
+    k-means with k-means++ seeding and chunked distance computation.
+    With mini_batch=True each iteration updates the centers from a random
+    batch of rows (Sculley's mini-batch k-means), which keeps the cost per
+    iteration independent of the input size; a final full pass assigns every row.
+    progress(done, total) is called after each iteration (total = max_iter + 1
+    for the final assignment); raising from it aborts training.
     """
-    if not save_path.endswith(".npz"):
-        base, _ = os.path.splitext(save_path)
-        save_path = base + ".npz"
+    rng = rng or np.random.default_rng()
+    if data.shape[0] < k:
+        k = data.shape[0]
+    with instrument.stage("vq.seed"):
+        centers = _kmeans_plus_plus(data, k, rng)
+
+    if mini_batch:
+        seen = np.zeros(k, dtype=np.float64)
+        for i in range(max_iter):
+            with instrument.stage("vq.kmeans_iteration"):
+                batch = data[rng.integers(data.shape[0], size=min(batch_size, data.shape[0]))].astype(np.float32)
+                _, counts, sums = _assign(batch, centers, with_sums=True)
+                seen += counts
+                hit = counts > 0
+                # per-center learning rate = batch count / all rows seen so far
+                eta = (counts[hit] / seen[hit])[:, None]
+                new_centers = centers.copy()
+                new_centers[hit] = (1 - eta) * centers[hit] + eta * (sums[hit] / counts[hit][:, None])
+            instrument.count("vq.iterations")
+            if progress:
+                progress(i + 1, max_iter + 1)
+            if np.allclose(new_centers, centers):
+                break
+            centers = new_centers
+    else:
+        for i in range(max_iter):
+            with instrument.stage("vq.kmeans_iteration"):
+                _, counts, sums = _assign(data, centers, with_sums=True)
+                new_centers = centers.copy()
+                hit = counts > 0
+                new_centers[hit] = sums[hit] / counts[hit][:, None]
+            instrument.count("vq.iterations")
+            if progress:
+                progress(i + 1, max_iter + 1)
+            if np.allclose(new_centers, centers):
+                break
+            centers = new_centers.astype(np.float32)
+
+    assignments = _assign(data, centers)
+    if progress:
+        progress(max_iter + 1, max_iter + 1)
+    return centers.astype(np.uint8), assignments
 
+
+def _load_pixels(image_path):
     # Preserve color; convert paletted/alpha images to RGB
     pic = Image.open(image_path)
     if pic.mode not in ("RGB", "L"):
         pic = pic.convert("RGB")
-    pixels = np.array(pic, dtype=np.uint8)
+    return np.array(pic, dtype=np.uint8), pic.mode
+
+
+def codebook_hash(codebook, block_size, channels):
+    """
+    Content hash identifying a codebook together with the block layout it was trained for.
+    """
+    h = hashlib.sha256()
+    h.update(np.array([*block_size, channels, *codebook.shape], dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(codebook, dtype=np.uint8).tobytes())
+    return h.hexdigest()
 
-    blocks, trimmed_shape, channels = _extract_blocks(pixels, block_size)
-    codebook, assignments = _kmeans(blocks, levels)
 
+def train_codebook(image_paths, levels=16, save_path="codebook.npz", block_size=(4, 4), blocks_per_image=MINI_BATCH_THRESHOLD):
+    """
+    Trains one codebook over a corpus of images and saves it for reuse with
+    quantize_image(..., codebook=path). At most `blocks_per_image` randomly
+    sampled blocks are kept from each image to bound memory.
+    Returns the codebook hash.
+    """
+    rng = np.random.default_rng()
+    samples = []
+    channels = None
+    for path in image_paths:
+        pixels, _ = _load_pixels(path)
+        blocks, _, image_channels = _extract_blocks(pixels, block_size)
+        if channels is None:
+            channels = image_channels
+        elif image_channels != channels:
+            raise ValueError(f"{path} has {image_channels} channel(s), expected {channels}")
+        if blocks.shape[0] > blocks_per_image:
+            blocks = blocks[rng.choice(blocks.shape[0], size=blocks_per_image, replace=False)]
+        samples.append(blocks)
+    if not samples:
+        raise ValueError("No images to train on")
+    data = np.concatenate(samples)
+    codebook, _ = _kmeans(data, levels, mini_batch=data.shape[0] > MINI_BATCH_THRESHOLD, rng=rng)
+
+    digest = codebook_hash(codebook, block_size, channels)
     np.savez_compressed(
         save_path,
         codebook=codebook,
-        assignments=assignments,
-        trimmed_shape=np.array(trimmed_shape),
-        original_shape=np.array(pixels.shape),
         block_size=np.array(block_size),
         channels=np.array(channels),
-        mode=np.array(pic.mode),
+        codebook_hash=np.array(digest),
     )
+    _cache_codebook(digest, (codebook, tuple(block_size), channels))
+    return digest
+
+
+def _cache_codebook(digest, codebook):
+    _CODEBOOK_CACHE[digest] = codebook
+    _CODEBOOK_CACHE.move_to_end(digest)
+    while len(_CODEBOOK_CACHE) > CODEBOOK_CACHE_SIZE:
+        _CODEBOOK_CACHE.popitem(last=False)
+
+
+def load_codebook(path, expected_hash=None):
+    """
+    Loads a trained codebook. Returns (codebook, block_size, channels, hash).
+    If `expected_hash` is already cached the file is not read at all.
+    """
+    if expected_hash is not None and expected_hash in _CODEBOOK_CACHE:
+        _CODEBOOK_CACHE.move_to_end(expected_hash)
+        codebook, block_size, channels = _CODEBOOK_CACHE[expected_hash]
+        return codebook, block_size, channels, expected_hash
+    with np.load(path) as data:
+        codebook = data["codebook"]
+        block_size = tuple(int(x) for x in data["block_size"])
+        channels = int(data["channels"])
+    digest = codebook_hash(codebook, block_size, channels)
+    if expected_hash is not None and digest != expected_hash:
+        raise ValueError(f"Codebook {path} does not match the hash stored in the compressed file")
+    _cache_codebook(digest, (codebook, block_size, channels))
+    return codebook, block_size, channels, digest
+
+
+def quantize_image(image_path, levels=16, save_path="compressed_image.npz", block_size=(4, 4), mini_batch=None, codebook=None, progress=None, coding="auto"):
+    """
+    Vector quantization using k-means over image blocks.
+    Saves compressed codebook + assignments to an .npz file.
+    mini_batch=None picks mini-batch k-means automatically for large images.
+    `coding` is one of ASSIGNMENT_CODINGS or "auto".
+    With codebook=<path from train_codebook> no training happens: blocks are
+    assigned to the nearest codeword and only the codebook's hash and path
+    are stored (levels and block_size come from the codebook).
+    progress(done, total) is forwarded to k-means.
+    Returns (compression_percentage, mse) vs original file.
+    """
+    if not save_path.endswith(".npz"):
+        base, _ = os.path.splitext(save_path)
+        save_path = base + ".npz"
+
+    with instrument.stage("vq.load"):
+        pixels, mode = _load_pixels(image_path)
+
+    if codebook is not None:
+        codebook_path = os.path.abspath(codebook)
+        codebook, block_size, expected_channels, digest = load_codebook(codebook_path)
+        blocks, trimmed_shape, channels = _extract_blocks(pixels, block_size)
+        if channels != expected_channels:
+            raise ValueError(f"Codebook expects {expected_channels} channel(s), image has {channels}")
+        assignments = _assign(blocks, codebook)
+        codebook_fields = {"codebook_hash": np.array(digest), "codebook_path": np.array(codebook_path)}
+    else:
+        blocks, trimmed_shape, channels = _extract_blocks(pixels, block_size)
+        if mini_batch is None:
+            mini_batch = blocks.shape[0] > MINI_BATCH_THRESHOLD
+        codebook, assignments = _kmeans(blocks, levels, mini_batch=mini_batch, progress=progress)
+        codebook_fields = {"codebook": codebook}
+
+    instrument.count("vq.blocks", blocks.shape[0])
+    with instrument.stage("vq.encode_assignments"):
+        assignment_fields = _encode_assignments(assignments, codebook.shape[0], trimmed_shape[1] // block_size[1], coding)
+    with instrument.stage("vq.save"):
+        np.savez_compressed(
+            save_path,
+            **assignment_fields,
+            trimmed_shape=np.array(trimmed_shape),
+            original_shape=np.array(pixels.shape),
+            block_size=np.array(block_size),
+            channels=np.array(channels),
+            mode=np.array(mode),
+            **codebook_fields,
+        )
 
     # compute estimated compression percentage using file sizes
     original_size = os.path.getsize(image_path)
@@ -113,23 +419,237 @@ def quantize_image(image_path, levels=16, save_path="compressed_image.npz", bloc
     return percent, mse
 
 
-def dequantize_image(compressed_path, save_path="decompressed_image.png"):
-    data = np.load(compressed_path)
-    codebook = data["codebook"]
-    assignments = data["assignments"]
-    # ensure shapes are plain Python ints
-    trimmed_shape = tuple(int(x) for x in data["trimmed_shape"])
-    original_shape = tuple(int(x) for x in data["original_shape"])
-    block_size = tuple(int(x) for x in data["block_size"])
-    channels = int(data.get("channels", 1))
-    mode = str(data.get("mode", "RGB"))
+def dequantize_image(compressed_path, save_path="decompressed_image.png", codebook=None):
+    """
+    Reconstructs an image from an .npz written by quantize_image.
+    Files that reference a trained codebook resolve it through the in-process
+    cache by hash; `codebook` overrides the stored codebook path on a miss.
+    """
+    with np.load(compressed_path) as data:
+        if "codebook" in data:
+            codebook_array = data["codebook"]
+        else:
+            digest = str(data["codebook_hash"])
+            path = codebook or str(data["codebook_path"])
+            codebook_array = load_codebook(path, expected_hash=digest)[0]
+        # ensure shapes are plain Python ints
+        trimmed_shape = tuple(int(x) for x in data["trimmed_shape"])
+        original_shape = tuple(int(x) for x in data["original_shape"])
+        block_size = tuple(int(x) for x in data["block_size"])
+        columns = trimmed_shape[1] // block_size[1]
+        with instrument.stage("vq.decode_assignments"):
+            assignments = _decode_assignments(data, trimmed_shape[0] // block_size[0] * columns, columns)
+        channels = int(data.get("channels", 1))
+        mode = str(data.get("mode", "RGB"))
 
-    reconstructed = _reconstruct_image(codebook, assignments, trimmed_shape, block_size, original_shape, channels)
+    with instrument.stage("vq.reconstruct"):
+        reconstructed = _reconstruct_image(codebook_array, assignments, trimmed_shape, block_size, original_shape, channels)
     image_out = Image.fromarray(reconstructed.astype(np.uint8))
     if channels == 1 and mode == "RGB":
         # fallback to L if data is single-channel
         image_out = image_out.convert("RGB")
-    image_out.save(save_path)
+    with instrument.stage("vq.save"):
+        image_out.save(save_path)
+    print(f"Decompressed image saved as {save_path}")
+
+
+def _open_strips(image_path):
+    """
+    Opens an image for reading in horizontal strips without building a full
+    NumPy copy. .npy files (uint8, (H, W) or (H, W, 3)) are memory-mapped, so
+    they never need to fit in memory. Other formats are decoded whole by
+    Pillow on the first read and cropped per strip, so the decoded image is
+    resident. Returns (read(y0, y1) -> array, shape, mode).
+    """
+    if image_path.lower().endswith(".npy"):
+        pixels = np.load(image_path, mmap_mode="r")
+        if pixels.dtype != np.uint8 or not (pixels.ndim == 2 or (pixels.ndim == 3 and pixels.shape[2] == 3)):
+            raise ValueError(f"{image_path} must hold a uint8 (H, W) or (H, W, 3) array")
+        return (lambda y0, y1: np.asarray(pixels[y0:y1])), pixels.shape, "L" if pixels.ndim == 2 else "RGB"
+    pic = Image.open(image_path)
+    if pic.mode not in ("RGB", "L"):
+        pic = pic.convert("RGB")
+    w, h = pic.size
+    shape = (h, w) if pic.mode == "L" else (h, w, 3)
+    return (lambda y0, y1: np.asarray(pic.crop((0, y0, w, y1)))), shape, pic.mode
+
+
+def _strip_rows(shape, block_size):
+    # pixel rows per strip: a whole number of block rows, about TILE_BLOCKS blocks
+    bh, bw = block_size
+    per_row = max(1, shape[1] // bw)
+    return bh * max(1, TILE_BLOCKS // per_row)
+
+
+def _write_npz_member(archive, name, array):
+    with archive.open(name + ".npy", "w", force_zip64=True) as f:
+        npy_format.write_array(f, np.asanyarray(array), allow_pickle=False)
+
+
+def _iter_npz_member(path, name, count):
+    """
+    Yields a 1-D array stored in an .npz `count` items at a time, without
+    loading all of it.
+    """
+    with zipfile.ZipFile(path) as archive, archive.open(name + ".npy") as f:
+        version = npy_format.read_magic(f)
+        read_header = npy_format.read_array_header_1_0 if version == (1, 0) else npy_format.read_array_header_2_0
+        shape, _, dtype = read_header(f)
+        remaining = int(np.prod(shape))
+        while remaining:
+            n = min(count, remaining)
+            chunk = f.read(n * dtype.itemsize)
+            if len(chunk) != n * dtype.itemsize:
+                raise ValueError(f"{path}: {name} is truncated")
+            yield np.frombuffer(chunk, dtype=dtype)
+            remaining -= n
+
+
+def quantize_image_tiled(image_path, levels=16, save_path="compressed_image.npz", block_size=(4, 4), sample_blocks=MINI_BATCH_THRESHOLD, codebook=None, progress=None):
+    """
+    quantize_image for images too large for memory. The image is read in
+    strips of about TILE_BLOCKS blocks: one pass draws a random sample of
+    `sample_blocks` blocks to train the codebook on (skipped with a trained
+    `codebook`), a second assigns each strip and streams its assignments
+    into the .npz. The file has the same layout as quantize_image's, with
+    the "int" assignment coding (streamed; the other codings need the whole
+    array).
+    Only .npy input is read out of core. Pillow formats (PNG, TIFF, ...) are
+    decoded whole, so such an image must fit in memory once, as 8-bit
+    samples; convert huge images to .npy first.
+    progress(done, total) is forwarded to k-means, then reports strips assigned.
+    Returns (compression_percentage, mse) like quantize_image.
+    """
+    if not save_path.endswith(".npz"):
+        base, _ = os.path.splitext(save_path)
+        save_path = base + ".npz"
+
+    read, shape, mode = _open_strips(image_path)
+    channels = 1 if len(shape) == 2 else shape[2]
+    if codebook is not None:
+        codebook_path = os.path.abspath(codebook)
+        codebook, block_size, expected_channels, digest = load_codebook(codebook_path)
+        if channels != expected_channels:
+            raise ValueError(f"Codebook expects {expected_channels} channel(s), image has {channels}")
+        codebook_fields = {"codebook_hash": digest, "codebook_path": codebook_path}
+
+    bh, bw = block_size
+    h, w = shape[0], shape[1]
+    h_trim, w_trim = h - h % bh, w - w % bw
+    total = (h_trim // bh) * (w_trim // bw)
+    if total == 0:
+        raise ValueError(f"Image is smaller than one {bh}x{bw} block")
+    rows = _strip_rows(shape, block_size)
+    strips = range(0, h_trim, rows)
+
+    if codebook is None:
+        rng = np.random.default_rng()
+        samples = []
+        for y in strips:
+            blocks, _, _ = _extract_blocks(read(y, min(y + rows, h_trim)), block_size)
+            take = min(blocks.shape[0], -(-sample_blocks * blocks.shape[0] // total))
+            samples.append(blocks[rng.choice(blocks.shape[0], size=take, replace=False)])
+        sample = np.concatenate(samples)
+        codebook, _ = _kmeans(sample, levels, mini_batch=sample.shape[0] > MINI_BATCH_THRESHOLD, rng=rng, progress=progress)
+        codebook_fields = {"codebook": codebook}
+
+    dtype = _index_dtype(codebook.shape[0])
+    squared_error = 0.0
+    with zipfile.ZipFile(save_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("assignments.npy", "w", force_zip64=True) as f:
+            npy_format.write_array_header_1_0(f, {"descr": npy_format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": (total,)})
+            for i, y in enumerate(strips):
+                with instrument.stage("vq.load"):
+                    strip = read(y, min(y + rows, h_trim))
+                blocks, trimmed, _ = _extract_blocks(strip, block_size)
+                assignments = _assign(blocks, codebook).astype(dtype)
+                instrument.count("vq.blocks", blocks.shape[0])
+                with instrument.stage("vq.save"):
+                    f.write(assignments.tobytes())
+                # the right-hand margin is reconstructed as zeros, as in quantize_image
+                quantized = _reconstruct_image(codebook, assignments, trimmed, block_size, strip.shape, channels)
+                squared_error += float(np.sum((strip.astype(np.float32) - quantized) ** 2, dtype=np.float64))
+                if progress:
+                    progress(i + 1, len(strips))
+        for y in range(h_trim, h, rows):
+            squared_error += float(np.sum(read(y, min(y + rows, h)).astype(np.float32) ** 2, dtype=np.float64))
+        fields = {
+            "trimmed_shape": (h_trim, w_trim),
+            "original_shape": shape,
+            "block_size": block_size,
+            "channels": channels,
+            "mode": mode,
+            **codebook_fields,
+        }
+        for name, value in fields.items():
+            _write_npz_member(archive, name, value)
+
+    original_size = os.path.getsize(image_path)
+    compressed_size = os.path.getsize(save_path)
+    percent = 0.0 if original_size == 0 else round((1 - (compressed_size / original_size)) * 100, 2)
+    mse = squared_error / (h * w * channels)
+    print(f"Vector-quantized image saved as {save_path} ({percent}% reduction), MSE={mse:.2f}")
+    return percent, mse
+
+
+def dequantize_image_tiled(compressed_path, save_path="decompressed_image.png", codebook=None):
+    """
+    dequantize_image one strip at a time; works on the output of either
+    quantize function. With a .npy save_path the pixels go to a memory-mapped
+    array, so the image never has to fit in memory; other formats are
+    assembled in a Pillow image (one byte per sample) and saved from there.
+    """
+    with np.load(compressed_path) as data:
+        if "codebook" in data:
+            codebook_array = data["codebook"]
+        else:
+            digest = str(data["codebook_hash"])
+            path = codebook or str(data["codebook_path"])
+            codebook_array = load_codebook(path, expected_hash=digest)[0]
+        h_trim, w_trim = (int(x) for x in data["trimmed_shape"])
+        original_shape = tuple(int(x) for x in data["original_shape"])
+        block_size = tuple(int(x) for x in data["block_size"])
+        channels = int(data.get("channels", 1))
+        mode = str(data.get("mode", "RGB"))
+        h, w = original_shape[0], original_shape[1]
+        bh, bw = block_size
+        rows = _strip_rows(original_shape, block_size)
+        per_strip = (rows // bh) * (w_trim // bw)
+        if "assignments" in data:
+            chunks = _iter_npz_member(compressed_path, "assignments", per_strip)
+        else:
+            # coded assignments are small (a few bits per block); decode them whole
+            coded = _decode_assignments(data, (h_trim // bh) * (w_trim // bw), w_trim // bw)
+            chunks = (coded[i:i + per_strip] for i in range(0, coded.shape[0], per_strip))
+
+    if save_path.lower().endswith(".npy"):
+        out = npy_format.open_memmap(save_path, mode="w+", dtype=np.uint8, shape=original_shape)
+        paste = out.__setitem__
+        image_out = None
+    else:
+        image_out = Image.new("L" if channels == 1 else "RGB", (w, h))
+
+        def paste(rows_slice, strip):
+            image_out.paste(Image.fromarray(strip), (0, rows_slice.start))
+
+    y = 0
+    if per_strip:
+        for assignments in chunks:
+            strip_rows = assignments.shape[0] // (w_trim // bw) * bh
+            strip_shape = (strip_rows, w) + original_shape[2:]
+            strip = _reconstruct_image(codebook_array, assignments, (strip_rows, w_trim), block_size, strip_shape, channels)
+            paste(slice(y, y + strip_rows), strip)
+            y += strip_rows
+    if y != h_trim:
+        raise ValueError(f"{compressed_path}: assignments do not cover the image")
+
+    if image_out is None:
+        out.flush()
+        del out
+    else:
+        if channels == 1 and mode == "RGB":
+            image_out = image_out.convert("RGB")
+        image_out.save(save_path)
     print(f"Decompressed image saved as {save_path}")
 
 
@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+import pytest
+
+from lossless import auto, container, stream
+
+RANDOM = random.Random(0).randbytes(100000)
+SKEWED = np.random.default_rng(0).geometric(0.3, 100000).clip(0, 255).astype(np.uint8).tobytes()
+TEXT = b"".join(b"the quick brown fox %d jumps " % i for i in range(3000))
+
+
+@pytest.mark.parametrize("data, codec", [(RANDOM, "stored"), (SKEWED, "rans"), (TEXT, "bwt"), (b"", "stored")])
+def test_choice(data, codec):
+    assert auto.choose(data) == codec
+
+
+def test_exact_estimates():
+    for data in (RANDOM[:5000], SKEWED, TEXT):
+        estimates = auto.estimate_sizes(data)
+        for codec in ("stored", "rle", "golomb", "huffman"):
+            params, payload = container.encode_block(codec, data)
+            assert estimates[codec] == len(params) + len(payload)
+        params, payload = container.encode_block("rans", data)
+        assert abs(estimates["rans"] - len(payload)) <= len(payload) // 100 + 16
+
+
+def test_slow_codecs_are_only_sampled_for_repetitive_data():
+    assert "bwt" not in auto.estimate_sizes(RANDOM)
+    assert "lz77" not in auto.estimate_sizes(SKEWED)
+    assert {"bwt", "lz77"} <= set(auto.estimate_sizes(TEXT))
+
+
+def test_slower_codecs_need_to_beat_the_tolerance(monkeypatch):
+    estimates = {"stored": 1000, "rle": 990, "rans": 900, "golomb": 880, "huffman": 600, "lzw": 590}
+    monkeypatch.setattr(auto, "estimate_sizes", lambda data: estimates)
+    assert auto.choose(b"") == "huffman"
+    estimates["lzw"] = 500
+    assert auto.choose(b"") == "lzw"
+
+
+def test_frames_record_the_codec_of_each_block():
+    data = RANDOM[:50000] + TEXT[:50000] + SKEWED[:50000]
+    blob = b"".join(stream.compress_iter([data], "auto", 50000))
+    pos = stream.STREAM_HEADER.size
+    chosen = []
+    while True:
+        algo_id, _, _, params_len, payload_len = stream.FRAME_HEADER.unpack_from(blob, pos)
+        if not algo_id:
+            break
+        chosen.append(container.ALGORITHM_NAMES[algo_id])
+        pos += stream.FRAME_HEADER.size + params_len + payload_len
+    assert chosen == ["stored", "bwt", "rans"]
+    assert b"".join(stream.decompress_iter([blob])) == data
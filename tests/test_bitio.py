@@ -0,0 +1,67 @@
+import io
+import random
+
+import numpy as np
+import pytest
+
+from lossless import lzw
+from lossless.bitio import BitReader, BitWriter
+
+
+def test_write_bits_matches_write():
+    rng = np.random.default_rng(0)
+    widths = rng.integers(0, 65, 5000)
+    values = rng.integers(0, 1 << 63, 5000, dtype=np.uint64)
+    bulk = BitWriter()
+    bulk.write_bits(values, widths)
+    single = BitWriter()
+    for value, width in zip(values.tolist(), widths.tolist()):
+        single.write(value & ((1 << width) - 1), width)
+    assert bulk.getvalue() == single.getvalue()
+
+
+def test_reader_round_trip():
+    writer = BitWriter()
+    codes = [(i * 7919) % (1 << (i % 20 + 1)) for i in range(2000)]
+    for i, code in enumerate(codes):
+        writer.write(code, i % 20 + 1)
+    reader = BitReader(writer.getvalue())
+    assert [reader.read(i % 20 + 1) for i in range(len(codes))] == codes
+    assert reader.position == writer.bit_count
+
+
+def test_read_array_after_extend_past_compaction():
+    # enough chunks that extend() compacts while bits are prefetched
+    writer = BitWriter()
+    writer.write_bits(np.arange(100000) % 4096, 12)
+    data = writer.getvalue()
+    reader = BitReader()
+    codes = []
+    for start in range(0, len(data), 4096):
+        reader.extend(data[start:start + 4096])
+        # a scalar read leaves prefetched bits in the accumulator
+        codes.append(reader.read(12))
+        codes.extend(reader.read_array(12, reader.available // 12).tolist())
+    assert codes[:100000] == (np.arange(100000) % 4096).tolist()
+
+
+def test_seek_before_buffered_data_fails():
+    reader = BitReader(bytes(1 << 17))
+    reader.read_array(8, 1 << 17)
+    reader.extend(b"\x00")
+    with pytest.raises(ValueError):
+        reader.seek(0)
+
+
+def test_lzw_chunked_decode_over_compaction_threshold():
+    data = random.Random(1).randbytes(50000) * 4
+    payload = lzw.compress_packed(data)
+    assert len(payload) > 1 << 16
+    decoder = lzw.PackedDecoder()
+    out = b"".join(decoder.feed(payload[i:i + 4096]) for i in range(0, len(payload), 4096))
+    decoder.flush()
+    assert out == data
+
+    dst = io.BytesIO()
+    lzw.decompress_file(io.BytesIO(payload), dst, chunk_size=4096)
+    assert dst.getvalue() == data
@@ -0,0 +1,86 @@
+import io
+import json
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from algopress import cli
+
+TEXT = b"batch compression line\n" * 2000
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "in"
+    (root / "sub").mkdir(parents=True)
+    (root / "a.txt").write_bytes(TEXT)
+    (root / "sub" / "b.log").write_bytes(TEXT[:5000])
+    (root / "empty").write_bytes(b"")
+    Image.fromarray(np.tile(np.arange(32, dtype=np.uint8), (32, 1))).save(root / "sub" / "c.png")
+    return root
+
+
+def run(*args, **kwargs):
+    out = io.StringIO()
+    failed = cli.run(*args, jobs=2, out=out, **kwargs)
+    return failed, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_plan_jobs(tree, tmp_path):
+    jobs = cli.plan_jobs("compress", "lzw", [str(tree)], str(tmp_path / "out"))
+    assert sorted(job[3] for job in jobs) == sorted(str(tmp_path / "out" / name) + ".apz" for name in ("a.txt", "empty", "sub/b.log", "sub/c.png"))
+    images = cli.plan_jobs("compress", "quantization", [str(tree)])
+    assert [job[3] for job in images] == [str(tree / "sub" / "c.png.npz")]
+    (tree / "a.txt.apz").write_bytes(b"")
+    (tree / "x.npz").write_bytes(b"")
+    restore = cli.plan_jobs("decompress", None, [str(tree)])
+    assert sorted(job[3] for job in restore) == [str(tree / "a.txt"), str(tree / "x.png")]
+
+
+def test_compress_and_decompress_a_tree(tree, tmp_path):
+    packed, restored = tmp_path / "packed", tmp_path / "restored"
+    failed, records = run("compress", "huffman", [str(tree)], output_dir=str(packed))
+    assert failed == 0
+    files = {record["path"]: record for record in records if record["event"] == "file"}
+    assert len(files) == 4
+    assert files[str(tree / "a.txt")]["ratio"] > 1
+    assert files[str(tree / "empty")]["ratio"] is None
+    summary = records[-1]
+    assert (summary["event"], summary["files"], summary["failed"]) == ("summary", 4, 0)
+    assert summary["input_bytes"] == sum(record["input_bytes"] for record in files.values())
+
+    failed, records = run("decompress", None, [str(packed)], output_dir=str(restored))
+    assert failed == 0
+    assert {record["algo"] for record in records if record["event"] == "file"} == {"huffman"}
+    for name in ("a.txt", "empty", "sub/b.log", "sub/c.png"):
+        assert (restored / name).read_bytes() == (tree / name).read_bytes()
+
+
+def test_quantization_jobs(tree, tmp_path):
+    failed, records = run("compress", "quantization", [str(tree)], output_dir=str(tmp_path / "vq"))
+    assert failed == 0 and records[0]["path"] == str(tree / "sub" / "c.png")
+    failed, _ = run("decompress", None, [str(tmp_path / "vq")])
+    assert failed == 0
+    assert np.asarray(Image.open(tmp_path / "vq" / "sub" / "c.png")).shape == (32, 32)
+
+
+def test_existing_outputs_need_force(tree):
+    assert run("compress", "rle", [str(tree / "a.txt")])[0] == 0
+    failed, records = run("compress", "rle", [str(tree / "a.txt")])
+    assert failed == 1 and records[0]["event"] == "error" and "--force" in records[0]["error"]
+    assert run("compress", "rle", [str(tree / "a.txt")], force=True)[0] == 0
+
+
+def test_corrupt_input_is_reported(tree):
+    (tree / "bad.apz").write_bytes(b"not a stream")
+    failed, records = run("decompress", None, [str(tree / "bad.apz")])
+    assert failed == 1
+    assert records[0]["event"] == "error"
+
+
+def test_main_exit_status(tree):
+    assert cli.main(["compress", "--algo", "rle", "-j", "1", "-o", str(tree / "out"), str(tree / "a.txt")]) == 0
+    assert cli.main(["compress", "--algo", "rle", "-j", "1", "-o", str(tree / "out"), str(tree / "a.txt")]) == 1
+    with pytest.raises(SystemExit):
+        cli.main(["compress", "--algo", "zip", str(tree)])
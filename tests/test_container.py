@@ -0,0 +1,53 @@
+import pytest
+
+from lossless import container
+
+DATA = b"AlgoPress container test line, with some repeats. " * 300 + bytes(range(256))
+CODECS = [name for name in container.ALGORITHM_IDS if name != "auto"]
+
+
+@pytest.mark.parametrize("algorithm", CODECS + ["auto"])
+@pytest.mark.parametrize("data", [b"", b"x", DATA])
+def test_round_trip(algorithm, data):
+    name, out = container.loads(container.dumps(algorithm, data))
+    assert out == data
+    assert name in CODECS
+
+
+def test_header_fields():
+    blob = container.dumps("huffman", DATA)
+    magic, version, algo_id, size, _, _ = container.HEADER.unpack_from(blob)
+    assert (magic, version, algo_id, size) == (container.MAGIC, container.VERSION, container.ALGORITHM_IDS["huffman"], len(DATA))
+
+
+def test_file_round_trip(tmp_path):
+    path = tmp_path / "data.apz"
+    written = container.write_file(str(path), "lzw", DATA)
+    assert written == path.stat().st_size
+    assert container.read_file(str(path))[1] == DATA
+
+
+def test_unknown_algorithm_is_rejected():
+    with pytest.raises(ValueError):
+        container.dumps("zip", DATA)
+
+
+@pytest.mark.parametrize("offset, value", [(0, ord("X")), (4, 99), (5, 250)])
+def test_bad_header_is_rejected(offset, value):
+    blob = bytearray(container.dumps("rle", DATA))
+    blob[offset] = value
+    with pytest.raises(ValueError):
+        container.loads(bytes(blob))
+
+
+def test_short_blob_is_rejected():
+    with pytest.raises(ValueError):
+        container.loads(container.dumps("rle", DATA)[:10])
+
+
+@pytest.mark.parametrize("algorithm", CODECS)
+def test_corrupt_payload_is_rejected(algorithm):
+    blob = bytearray(container.dumps(algorithm, DATA))
+    blob[-20] ^= 0x5A
+    with pytest.raises(ValueError):
+        container.loads(bytes(blob))
@@ -0,0 +1,113 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+from lossless import dictionary
+
+
+def message(rng, i):
+    record = {"id": i, "user": "user%d" % rng.randrange(50), "action": rng.choice(["login", "logout", "view", "edit"]),
+              "path": "/api/v1/items/%d" % rng.randrange(1000), "ok": rng.random() < 0.9}
+    return json.dumps(record).encode()
+
+
+rng = random.Random(0)
+SAMPLES = [message(rng, i) for i in range(2000)]
+MESSAGES = [message(rng, i) for i in range(2000, 2100)]
+
+
+@pytest.fixture
+def trained():
+    dictionary._DICTIONARY_CACHE.clear()
+    return dictionary.train_dictionary(SAMPLES, max_bits=12)
+
+
+@pytest.mark.parametrize("method", ["auto"] + list(dictionary.METHODS))
+def test_round_trip(trained, method):
+    for data in MESSAGES + [b"", b"x", random.Random(1).randbytes(300)]:
+        blob = trained.compress(data, method)
+        assert blob[:dictionary.ID_SIZE] == trained.id
+        assert trained.decompress(blob) == data
+
+
+def test_small_messages_compress(trained):
+    plain = sum(len(data) for data in MESSAGES)
+    packed = sum(len(trained.compress(data)) for data in MESSAGES)
+    assert packed < plain // 2
+    assert len(trained.compress(random.Random(2).randbytes(100))) == dictionary.ID_SIZE + 1 + 100
+
+
+def test_lzw_resets_when_full(trained):
+    # thousands of codes: packed with NumPy, and the added entries run out
+    long_message = b"".join(MESSAGES) + random.Random(3).randbytes(20000)
+    assert trained.decompress(trained.compress(long_message, "lzw")) == long_message
+
+
+def test_entries_are_closed_under_prefixes(trained):
+    entries = set(trained.entries)
+    assert len(trained.entries) <= (1 << 12) * 3 // 4 - dictionary.FIRST_CODE
+    assert all(len(entry) == 2 or entry[:-1] in entries for entry in entries)
+
+
+def test_save_and_load(tmp_path, trained):
+    path = str(tmp_path / "dict.npz")
+    trained.save(path)
+    dictionary._DICTIONARY_CACHE.clear()
+    loaded = dictionary.load_dictionary(path)
+    assert (loaded.hash, loaded.entries, loaded.lengths) == (trained.hash, trained.entries, trained.lengths)
+    assert loaded.decompress(trained.compress(MESSAGES[0])) == MESSAGES[0]
+    # a cached hash needs no file
+    (tmp_path / "dict.npz").unlink()
+    assert dictionary.load_dictionary(path, expected_hash=trained.hash) is loaded
+
+
+def test_mismatched_dictionaries_are_rejected(tmp_path, trained):
+    other = dictionary.train_dictionary(SAMPLES[:100], save_path=str(tmp_path / "other.npz"), max_bits=10)
+    with pytest.raises(ValueError, match="different dictionary"):
+        other.decompress(trained.compress(MESSAGES[0]))
+    dictionary._DICTIONARY_CACHE.clear()
+    with pytest.raises(ValueError, match="expected hash"):
+        dictionary.load_dictionary(str(tmp_path / "other.npz"), expected_hash=trained.hash)
+
+
+def test_cache_evicts_least_recently_used(trained):
+    kept = [dictionary.train_dictionary(SAMPLES[:50 + i], max_bits=10) for i in range(dictionary.DICTIONARY_CACHE_SIZE + 1)]
+    assert trained.hash not in dictionary._DICTIONARY_CACHE
+    assert list(dictionary._DICTIONARY_CACHE) == [d.hash for d in kept[1:]]
+
+
+def test_corrupt_file_is_rejected(tmp_path, trained):
+    path = tmp_path / "dict.npz"
+    trained.save(str(path))
+    with np.load(path) as data:
+        fields = dict(data)
+    fields["entry_lengths"] = fields["entry_lengths"] + 1
+    np.savez(path, **fields)
+    with pytest.raises(ValueError, match="corrupt"):
+        dictionary.load_dictionary(str(path))
+
+
+def test_corrupt_messages_are_rejected(trained):
+    blob = trained.compress(MESSAGES[0], "lzw")
+    for bad in (blob[:dictionary.ID_SIZE], blob[:-2], trained.id + b"\x09" + blob[5:]):
+        with pytest.raises(ValueError):
+            trained.decompress(bad)
+    blob = trained.compress(MESSAGES[0], "huffman")
+    with pytest.raises(ValueError):
+        trained.decompress(blob[:dictionary.ID_SIZE + 1] + b"\xff\xff\x7f")
+
+
+def test_bad_dictionaries_are_rejected():
+    lengths = [8] * 256
+    with pytest.raises(ValueError):
+        dictionary.Dictionary([b"abc"], lengths)
+    with pytest.raises(ValueError):
+        dictionary.Dictionary([b"ab", b"ab"], lengths)
+    with pytest.raises(ValueError):
+        dictionary.Dictionary([], [8] * 255 + [0])
+    with pytest.raises(ValueError):
+        dictionary.Dictionary([b"ab"], lengths, max_bits=8)
+    with pytest.raises(ValueError):
+        dictionary.train_dictionary([])
@@ -0,0 +1,82 @@
+import io
+import os
+
+import pytest
+
+from lossless import fileio
+
+DATA = bytes(range(256)) * 100
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(DATA)
+    return path
+
+
+def test_map_input_from_the_current_position(source):
+    with open(source, "rb") as f:
+        f.seek(1000)
+        with fileio.map_input(f) as view:
+            assert view.readonly and view == DATA[1000:]
+        assert f.tell() == len(DATA)
+        with fileio.map_input(f) as view:
+            assert view is None
+
+
+def test_map_input_needs_a_regular_file(tmp_path):
+    with fileio.map_input(io.BytesIO(DATA)) as view:
+        assert view is None
+    read, write = os.pipe()
+    with os.fdopen(read, "rb") as r, os.fdopen(write, "wb"):
+        with fileio.map_input(r) as view:
+            assert view is None
+
+
+def test_slices_must_not_outlive_the_map(source):
+    with open(source, "rb") as f:
+        with pytest.raises(BufferError):
+            with fileio.map_input(f) as view:
+                kept = view[10:20]
+    kept.release()
+
+
+def test_errors_inside_the_block_propagate(source):
+    with open(source, "rb") as f:
+        with pytest.raises(KeyError):
+            with fileio.map_input(f) as view:
+                piece = view[:10]
+                raise KeyError(bytes(piece))
+
+
+def test_writev_all_retries_partial_writes(tmp_path, monkeypatch):
+    calls = []
+
+    def short_writev(fd, buffers):
+        calls.append(len(buffers))
+        return os.write(fd, bytes(buffers[0][:7]))
+
+    monkeypatch.setattr(os, "writev", short_writev)
+    buffers = [b"header", b"", bytearray(b"params"), memoryview(DATA[:50])]
+    with open(tmp_path / "out", "wb") as f:
+        assert fileio.writev_all(f.fileno(), buffers) == 62
+    assert (tmp_path / "out").read_bytes() == b"headerparams" + DATA[:50]
+    assert len(calls) > len(buffers)
+
+
+@pytest.mark.parametrize("limit", [1, 100, fileio.WRITE_BUFFER])
+def test_gather_writer(tmp_path, limit):
+    pieces = [DATA[i:i + 300] for i in range(0, len(DATA), 300)]
+    memory = io.BytesIO(b"xx")
+    memory.seek(2)
+    with open(tmp_path / "out", "wb") as f:
+        f.write(b"xx")
+        for fileobj in (memory, f):
+            writer = fileio.GatherWriter(fileobj, limit)
+            for i in range(0, len(pieces), 3):
+                writer.write(*pieces[i:i + 3])
+            writer.close()
+            assert writer.written == len(DATA)
+            assert fileobj.tell() == len(DATA) + 2
+    assert memory.getvalue() == (tmp_path / "out").read_bytes() == b"xx" + DATA
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+
+from lossless import golomb
+
+rng = np.random.default_rng(0)
+SAMPLES = [
+    b"",
+    b"\x00",
+    bytes(1000),
+    bytes(range(256)) * 4,
+    rng.geometric(0.3, 50000).clip(0, 255).astype(np.uint8).tobytes(),
+    np.cumsum(rng.integers(-2, 3, 70000)).astype(np.uint8).tobytes(),
+    random.Random(0).randbytes(3000),
+    b"the quick brown fox jumps over the lazy dog " * 300,
+]
+
+
+@pytest.mark.parametrize("data", SAMPLES)
+def test_round_trip(data):
+    payload = golomb.compress_bytes(data)
+    assert golomb.decompress_bytes(payload) == data
+    assert golomb.estimate_size(data) == len(payload)
+
+
+@pytest.mark.parametrize("transform", list(golomb.TRANSFORMS))
+@pytest.mark.parametrize("m", [1, 2, 3, 7, 64, 255, 256])
+def test_every_transform_and_divisor(transform, m):
+    data = SAMPLES[5][:3000] + SAMPLES[6][:500]
+    payload = golomb.compress_bytes(data, block_size=1000, transform=transform, m=m)
+    assert golomb.decompress_bytes(payload) == data
+
+
+def test_block_choices_follow_the_data():
+    smooth, noisy = SAMPLES[5][:golomb.BLOCK_SIZE], SAMPLES[6]
+    payload = golomb.compress_bytes(smooth + noisy)
+    transform, m, count, size = golomb.BLOCK_HEADER.unpack_from(payload)
+    assert (transform, count) == (golomb.TRANSFORMS["delta"], golomb.BLOCK_SIZE)
+    _, m2, count2, _ = golomb.BLOCK_HEADER.unpack_from(payload, golomb.BLOCK_HEADER.size + size)
+    assert count2 == len(noisy) and m2 > m
+
+
+def test_truncated_payload_is_rejected():
+    payload = golomb.compress_bytes(SAMPLES[4])
+    for cut in (3, golomb.BLOCK_HEADER.size + 10, len(payload) - 1):
+        with pytest.raises(ValueError):
+            golomb.decompress_bytes(payload[:cut])
+
+
+@pytest.mark.parametrize("transform, m", [(9, 4), (0, 0), (0, 300)])
+def test_bad_block_header_is_rejected(transform, m):
+    payload = bytearray(golomb.compress_bytes(SAMPLES[3]))
+    payload[:3] = golomb.BLOCK_HEADER.pack(transform, m, 0, 0)[:3]
+    with pytest.raises(ValueError):
+        golomb.decompress_bytes(bytes(payload))
+
+
+def test_string_codec():
+    text = "golomb"
+    assert golomb.decompress(golomb.compress(text, 8), 8) == text
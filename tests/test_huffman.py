@@ -0,0 +1,114 @@
+import random
+
+import numpy as np
+import pytest
+
+from lossless import huffman
+
+SAMPLES = [
+    b"",
+    b"a",
+    b"aaaaaaaa",
+    b"ab" * 100,
+    bytes(range(256)) * 4,
+    b"the quick brown fox jumps over the lazy dog " * 500,
+    random.Random(0).randbytes(70000),
+    bytes(random.Random(1).choices(range(8), weights=[100, 50, 20, 10, 5, 2, 1, 1], k=50000)),
+]
+
+
+@pytest.mark.parametrize("data", SAMPLES)
+def test_round_trip(data):
+    payload, lengths = huffman.compress_bytes(data)
+    assert len(lengths) == 256
+    assert huffman.decompress_bytes(payload, lengths, len(data)) == data
+
+
+def test_memoryview_input():
+    data = SAMPLES[5]
+    payload, lengths = huffman.compress_bytes(memoryview(data)[10:])
+    assert huffman.decompress_bytes(payload, lengths, len(data) - 10) == data[10:]
+
+
+def test_canonical_codes_are_prefix_free():
+    _, lengths = huffman.compress_bytes(SAMPLES[7] + SAMPLES[5])
+    codes = huffman.canonical_codes(dict(enumerate(lengths)))
+    words = sorted(format(code, "0%db" % length) for code, length in codes.values())
+    assert all(not b.startswith(a) for a, b in zip(words, words[1:]))
+
+
+def test_estimate_size_matches_payload():
+    for data in SAMPLES:
+        assert huffman.estimate_size(data) == len(huffman.compress_bytes(data)[0])
+
+
+def test_truncated_payload_is_rejected():
+    data = SAMPLES[5]
+    payload, lengths = huffman.compress_bytes(data)
+    with pytest.raises(ValueError):
+        huffman.decompress_bytes(payload[:len(payload) // 2], lengths, len(data))
+
+
+def test_missing_code_table_is_rejected():
+    with pytest.raises(ValueError):
+        huffman.decompress_bytes(b"\x00", [0] * 256, 4)
+
+
+def test_string_codec():
+    text = "AAAABBBCCDAA"
+    bits, root = huffman.compress(text)
+    assert set(bits) <= {"0", "1"}
+    assert huffman.decompress(bits, root) == text
+
+
+def kraft_sum(lengths):
+    return sum(2.0 ** -length for length in lengths if length)
+
+
+def test_lengths_are_limited():
+    fibonacci = [1, 1]
+    while len(fibonacci) < 40:
+        fibonacci.append(fibonacci[-1] + fibonacci[-2])
+    unlimited = huffman.code_lengths(huffman.build_tree(dict(enumerate(fibonacci))))
+    assert max(unlimited.values()) > huffman.MAX_CODE_LENGTH
+    lengths = huffman.limited_code_lengths(fibonacci)
+    assert max(lengths) == huffman.MAX_CODE_LENGTH
+    assert kraft_sum(lengths) == 1
+    data = bytes(symbol for symbol, count in enumerate(fibonacci) for _ in range(min(count, 5000)))
+    payload, lengths = huffman.compress_bytes(data)
+    assert huffman.decompress_bytes(payload, lengths, len(data)) == data
+
+
+@pytest.mark.parametrize("data", SAMPLES[3:])
+def test_limit_costs_nothing_when_huffman_fits(data):
+    counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+    limited = huffman.limited_code_lengths(counts)
+    unlimited = huffman.code_lengths(huffman.build_tree(huffman.frequency_dict(data)))
+    assert int(counts @ limited) == sum(counts[symbol] * length for symbol, length in unlimited.items())
+    assert kraft_sum(limited) == 1
+
+
+def test_small_limits():
+    assert list(huffman.limited_code_lengths([5, 0, 1, 1, 1], max_length=2)) == [2, 0, 2, 2, 2]
+    assert list(huffman.limited_code_lengths([0, 7, 0])) == [0, 1, 0]
+    with pytest.raises(ValueError):
+        huffman.limited_code_lengths([1] * 5, max_length=2)
+
+
+def test_encoder_paths_agree(monkeypatch):
+    data = SAMPLES[7][:5003]
+    _, lengths = huffman.compress_bytes(data)
+    encoder = huffman.Encoder(lengths)
+    expected = encoder.encode(data)
+    monkeypatch.setattr(huffman, "SMALL_INPUT", len(data))
+    assert encoder.encode(data) == expected
+    monkeypatch.setattr(huffman, "SMALL_INPUT", 0)
+    monkeypatch.setattr(huffman, "ENCODE_CHUNK", 1001)
+    assert encoder.encode(data) == expected
+
+
+def test_encoder_and_decoder_are_reusable():
+    _, lengths = huffman.compress_bytes(bytes(range(256)) + SAMPLES[5])
+    encoder, decoder = huffman.Encoder(lengths), huffman.Decoder(lengths)
+    for data in (SAMPLES[5][:10], SAMPLES[5], bytes(range(256))):
+        assert decoder.decode(encoder.encode(data), len(data)) == data
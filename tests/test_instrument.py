@@ -0,0 +1,91 @@
+import io
+import json
+import re
+
+import pytest
+
+from algopress import cli
+from lossless import instrument, stream
+
+DATA = b"instrumented block of text\n" * 5000
+
+
+@pytest.fixture(autouse=True)
+def disabled():
+    instrument.disable()
+    yield
+    instrument.disable()
+
+
+def test_hooks_are_free_when_disabled():
+    assert not instrument.enabled()
+    assert instrument.stage("a") is instrument.stage("b")
+    with instrument.stage("a"):
+        instrument.count("bytes", 10)
+    assert instrument.disable() is None
+
+
+def test_collect_records_stages_and_counters():
+    with instrument.collect() as stats:
+        assert instrument.enabled()
+        stream.compress_file(io.BytesIO(DATA), io.BytesIO(), "huffman", 16384)
+    assert not instrument.enabled()
+    blocks = -(-len(DATA) // 16384)
+    assert stats.counters["blocks"] == blocks and stats.counters["raw_bytes"] == len(DATA)
+    calls, seconds, longest = stats.timers["huffman.tree"]
+    assert calls == blocks and 0 <= longest <= seconds <= stats.seconds
+    assert stats.peak_memory is None
+
+
+def test_memory_tracing():
+    with instrument.collect(memory=True) as stats:
+        buffers = [bytearray(1 << 20) for _ in range(4)]
+    del buffers
+    assert stats.peak_memory >= 4 << 20
+
+
+def test_merge():
+    first, second = instrument.Stats(), instrument.Stats()
+    first.add_time("a", 1.0)
+    first.add_count("n", 2)
+    second.add_time("a", 3.0)
+    second.add_time("b", 0.5)
+    second.add_count("n", 5)
+    second.peak_memory = 100
+    first.merge(second)
+    first.merge(second.to_dict())
+    assert first.timers == {"a": [3, 7.0, 3.0], "b": [2, 1.0, 0.5]}
+    assert first.counters == {"n": 12} and first.peak_memory == 100
+    assert json.loads(first.to_json())["timers"]["a"] == {"calls": 3, "seconds": 7.0, "max_seconds": 3.0}
+
+
+def test_prometheus_format():
+    stats = instrument.Stats()
+    stats.add_time("huffman.tree", 0.25)
+    stats.add_count("raw_bytes", 100)
+    text = stats.to_prometheus()
+    assert 'algopress_stage_seconds_total{stage="huffman.tree"} 0.25\n' in text
+    assert 'algopress_events_total{name="raw_bytes"} 100\n' in text
+    assert "# TYPE algopress_stage_calls_total counter\n" in text
+    assert "peak_traced_bytes" not in text
+    sample = re.compile(r'^[a-z_]+(\{[a-z]+="[^"]*"\})? [0-9.e+-]+$')
+    assert all(line.startswith("# ") or sample.match(line) for line in text.splitlines())
+
+
+def test_label_values_are_escaped():
+    assert instrument.format_labels(stage='a"b\\c\nd', n=1) == '{stage="a\\"b\\\\c\\nd",n="1"}'
+
+
+@pytest.mark.parametrize("name", ["stats.json", "stats.prom"])
+def test_cli_writes_merged_stats(tmp_path, name):
+    for i in range(3):
+        (tmp_path / f"{i}.txt").write_bytes(DATA)
+    path = tmp_path / name
+    failed = cli.run("compress", "huffman", [str(tmp_path / f"{i}.txt") for i in range(3)], jobs=2,
+                     out=io.StringIO(), stats_path=str(path))
+    assert failed == 0
+    text = path.read_text()
+    if name.endswith(".json"):
+        assert json.loads(text)["counters"]["raw_bytes"] == 3 * len(DATA)
+    else:
+        assert f'algopress_events_total{{name="raw_bytes"}} {3 * len(DATA)}' in text
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from lossless import lz77
+
+SAMPLES = [
+    b"",
+    b"a",
+    b"abc",
+    b"a" * 1000,
+    b"abcabcabcabcab",
+    bytes(range(256)) * 4,
+    random.Random(0).randbytes(5000),
+    b"".join(b"the quick brown fox %d jumps over the lazy dog " % i for i in range(2000)),
+]
+
+
+@pytest.mark.parametrize("level", sorted(lz77.LEVELS))
+@pytest.mark.parametrize("data", SAMPLES)
+def test_round_trip(data, level):
+    assert lz77.decompress_bytes(lz77.compress_bytes(data, level)) == data
+
+
+@pytest.mark.parametrize("window", [1, 3, 1000, lz77.DEFAULT_WINDOW, lz77.MAX_WINDOW])
+def test_windows(window):
+    block = random.Random(1).randbytes(20000)
+    data = block + b"x" * 20000 + block
+    payload = lz77.compress_bytes(data, window=window)
+    assert lz77.decompress_bytes(payload) == data
+    lengths, values = lz77.tokenize(data, window=window)
+    assert max(value for length, value in zip(lengths, values) if length) <= window
+    if window == lz77.MAX_WINDOW:
+        # the repeat is 40000 bytes back, out of reach of the default window
+        assert len(payload) < len(lz77.compress_bytes(data)) - 15000
+
+
+def test_tokens_rebuild_the_data():
+    data = SAMPLES[7]
+    lengths, values = lz77.tokenize(data)
+    out = bytearray()
+    for length, value in zip(lengths, values):
+        if length:
+            assert lz77.MIN_MATCH <= length <= lz77.MAX_MATCH
+            for _ in range(length):
+                out.append(out[-value])
+        else:
+            out.append(value)
+    assert bytes(out) == data
+
+
+def test_higher_levels_do_not_compress_worse():
+    data = SAMPLES[7]
+    assert len(lz77.compress_bytes(data, 9)) <= len(lz77.compress_bytes(data, 1))
+
+
+@pytest.mark.parametrize("options", [{"level": 0}, {"level": 10}, {"window": 0}, {"window": lz77.MAX_WINDOW + 1}])
+def test_bad_options_are_rejected(options):
+    with pytest.raises(ValueError):
+        lz77.compress_bytes(b"abc", **options)
+
+
+def test_truncated_payload_is_rejected():
+    payload = lz77.compress_bytes(SAMPLES[7])
+    for cut in (10, lz77.LITLEN_SYMBOLS + lz77.DIST_SYMBOLS, len(payload) // 2, len(payload) - 1):
+        with pytest.raises(ValueError):
+            lz77.decompress_bytes(payload[:cut])
+
+
+def test_missing_end_of_block_code_is_rejected():
+    with pytest.raises(ValueError, match="end-of-block"):
+        lz77.decompress_bytes(bytes(lz77.LITLEN_SYMBOLS + lz77.DIST_SYMBOLS + 4))
+
+
+def test_distance_before_the_start_is_rejected(monkeypatch):
+    monkeypatch.setattr(lz77, "tokenize", lambda data, level, window: ([0, 3], [ord("a"), 5]))
+    payload = lz77.compress_bytes(b"")
+    with pytest.raises(ValueError, match="before the start"):
+        lz77.decompress_bytes(payload)
@@ -0,0 +1,80 @@
+import io
+import random
+
+import pytest
+
+from lossless import lzw
+
+TEXT = b"TOBEORNOTTOBEORTOBEORNOT " * 4000
+RANDOM = random.Random(3).randbytes(120000)
+
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("data", [b"", b"a", b"aaaa", b"abababab", TEXT, RANDOM])
+def test_packed_round_trip(data):
+    assert lzw.decompress_packed(lzw.compress_packed(data)) == data
+
+
+@pytest.mark.parametrize("max_bits", [9, 10, 12, 16])
+def test_dictionary_resets(max_bits):
+    data = TEXT + RANDOM
+    payload = lzw.compress_packed(data, max_bits)
+    assert lzw.decompress_packed(payload, max_bits) == data
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096, 1 << 16])
+def test_chunked_feed(chunk_size):
+    data = RANDOM * 2 if chunk_size > 1 else TEXT[:5000]
+    payload = lzw.compress_packed(data, 10)
+    decoder = lzw.PackedDecoder(10)
+    out = b"".join(decoder.feed(chunk) for chunk in chunks(payload, chunk_size))
+    decoder.flush()
+    assert out == data
+
+
+def test_encoder_chunks_match_one_shot():
+    encoder = lzw.PackedEncoder()
+    payload = b"".join(encoder.feed(chunk) for chunk in chunks(TEXT + RANDOM, 1000)) + encoder.flush()
+    assert payload == lzw.compress_packed(TEXT + RANDOM)
+
+
+@pytest.mark.parametrize("max_bits", [9, 12])
+def test_file_round_trip_over_compaction_threshold(max_bits):
+    data = RANDOM * 3
+    compressed = io.BytesIO()
+    read, written = lzw.compress_file(io.BytesIO(data), compressed, max_bits, chunk_size=5000)
+    assert (read, written) == (len(data), len(compressed.getvalue()))
+    assert written > 1 << 16
+    restored = io.BytesIO()
+    lzw.decompress_file(io.BytesIO(compressed.getvalue()), restored, max_bits, chunk_size=3000)
+    assert restored.getvalue() == data
+
+
+def test_input_after_end_code_is_ignored():
+    payload = lzw.compress_packed(TEXT)
+    decoder = lzw.PackedDecoder()
+    assert decoder.feed(payload + b"trailing") == TEXT
+    assert decoder.finished
+
+
+def test_truncated_stream_is_rejected():
+    payload = lzw.compress_packed(TEXT)
+    with pytest.raises(ValueError):
+        lzw.decompress_packed(payload[:len(payload) // 2])
+
+
+def test_bad_code_is_rejected():
+    # a 9-bit code of 300 before any entry was added
+    with pytest.raises(ValueError):
+        lzw.decompress_packed(bytes([300 >> 1, (300 & 1) << 7, 0, 0]))
+
+
+@pytest.mark.parametrize("max_bits", [8, 25])
+def test_max_bits_is_checked(max_bits):
+    with pytest.raises(ValueError):
+        lzw.PackedEncoder(max_bits)
+    with pytest.raises(ValueError):
+        lzw.PackedDecoder(max_bits)
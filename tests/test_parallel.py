@@ -0,0 +1,60 @@
+import io
+import random
+
+import pytest
+
+from lossless import parallel, stream
+
+BLOCK = 1 << 14
+DATA = b"".join(b"record %06d %s\n" % (i, b"xyz" * (i % 11)) for i in range(8000)) + random.Random(0).randbytes(30000)
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(DATA)
+    return path
+
+
+@pytest.mark.parametrize("algorithm", ["huffman", "lzw", "auto"])
+def test_output_matches_serial_stream(tmp_path, src, algorithm):
+    dst = tmp_path / "data.apz"
+    read, written = parallel.compress_file(str(src), str(dst), algorithm, BLOCK, workers=2)
+    serial = io.BytesIO()
+    stream.compress_file(io.BytesIO(DATA), serial, algorithm, BLOCK)
+    assert dst.read_bytes() == serial.getvalue()
+    assert (read, written) == (len(DATA), dst.stat().st_size)
+
+
+def test_round_trip(tmp_path, src):
+    dst = tmp_path / "data.apz"
+    out = tmp_path / "out"
+    parallel.compress_file(str(src), str(dst), "rans", BLOCK, workers=2)
+    assert parallel.decompress_file(str(dst), str(out), workers=2) == (dst.stat().st_size, len(DATA))
+    assert out.read_bytes() == DATA
+
+
+def test_empty_file(tmp_path):
+    src = tmp_path / "empty"
+    src.write_bytes(b"")
+    parallel.compress_file(str(src), str(tmp_path / "empty.apz"), "rle", BLOCK, workers=1)
+    parallel.decompress_file(str(tmp_path / "empty.apz"), str(tmp_path / "out"), workers=1)
+    assert (tmp_path / "out").read_bytes() == b""
+
+
+def test_stream_without_index_is_rejected(tmp_path):
+    dst = tmp_path / "data.apz"
+    blob = b"".join(stream.compress_iter([DATA], "rle", BLOCK))
+    dst.write_bytes(blob[:-stream.INDEX_FOOTER.size])
+    with pytest.raises(ValueError):
+        parallel.decompress_file(str(dst), str(tmp_path / "out"), workers=1)
+
+
+def test_corrupt_block_is_rejected(tmp_path, src):
+    dst = tmp_path / "data.apz"
+    parallel.compress_file(str(src), str(dst), "stored", BLOCK, workers=2)
+    blob = bytearray(dst.read_bytes())
+    blob[stream.STREAM_HEADER.size + stream.FRAME_HEADER.size + 5] ^= 1
+    dst.write_bytes(bytes(blob))
+    with pytest.raises(ValueError):
+        parallel.decompress_file(str(dst), str(tmp_path / "out"), workers=2)
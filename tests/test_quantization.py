@@ -0,0 +1,262 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from lossy import quantization
+
+PALETTE = np.array([[0, 0, 0], [255, 255, 255], [200, 30, 30], [30, 200, 30], [30, 30, 200], [120, 120, 0]], dtype=np.uint8)
+
+
+def blocky_image(height, width, seed=0, gray=False):
+    """
+    An image of uniform 4x4 blocks in a few colours, so k-means with enough
+    levels reproduces it exactly; the size need not be a multiple of 4.
+    """
+    rng = np.random.default_rng(seed)
+    colours = rng.integers(0, len(PALETTE), ((height + 3) // 4, (width + 3) // 4))
+    pixels = PALETTE[colours].repeat(4, axis=0).repeat(4, axis=1)[:height, :width]
+    return pixels[..., 0].copy() if gray else pixels
+
+
+@pytest.fixture
+def png(tmp_path):
+    path = tmp_path / "image.png"
+    Image.fromarray(blocky_image(64, 96)).save(path)
+    return path
+
+
+def quantize(tmp_path, source, name="image.npz", **kwargs):
+    path = str(tmp_path / name)
+    percent, mse = quantization.quantize_image(str(source), save_path=path, **kwargs)
+    return path, mse
+
+
+def dequantize(tmp_path, compressed, name="out.png", **kwargs):
+    path = str(tmp_path / name)
+    quantization.dequantize_image(compressed, path, **kwargs)
+    return np.asarray(Image.open(path))
+
+
+@pytest.mark.parametrize("gray", [False, True])
+def test_round_trip_is_exact_with_enough_levels(tmp_path, gray):
+    pixels = blocky_image(64, 96, gray=gray)
+    source = tmp_path / "image.png"
+    Image.fromarray(pixels).save(source)
+    compressed, mse = quantize(tmp_path, source, levels=8)
+    assert mse == 0
+    assert np.array_equal(dequantize(tmp_path, compressed), pixels)
+
+
+def test_edges_outside_whole_blocks_are_zero(tmp_path):
+    pixels = blocky_image(30, 45)
+    source = tmp_path / "odd.png"
+    Image.fromarray(pixels).save(source)
+    compressed, _ = quantize(tmp_path, source, levels=8)
+    out = dequantize(tmp_path, compressed)
+    assert out.shape == pixels.shape
+    assert np.array_equal(out[:28, :44], pixels[:28, :44])
+    assert not out[28:].any() and not out[:, 44:].any()
+
+
+def test_fewer_levels_than_colours_loses_detail(tmp_path, png):
+    _, mse = quantize(tmp_path, png, levels=2)
+    assert mse > 0
+
+
+def test_kmeans_recovers_separated_clusters():
+    rng = np.random.default_rng(0)
+    centres = np.array([[10] * 4, [120] * 4, [240] * 4], dtype=np.float64)
+    data = (centres[rng.integers(0, 3, 30000)] + rng.normal(0, 2, (30000, 4))).clip(0, 255).astype(np.uint8)
+    for mini_batch in (False, True):
+        codebook, assignments = quantization._kmeans(data, 3, mini_batch=mini_batch, batch_size=2048, rng=np.random.default_rng(1))
+        assert np.allclose(np.sort(codebook[:, 0].astype(int)), [10, 120, 240], atol=3)
+        assert np.abs(codebook[assignments].astype(int) - data).mean() < 3
+
+
+def test_kmeans_with_fewer_rows_than_levels():
+    data = np.array([[1, 2], [3, 4]], dtype=np.uint8)
+    codebook, assignments = quantization._kmeans(data, 16)
+    assert np.array_equal(codebook[assignments], data)
+
+
+def test_progress_is_reported_and_can_abort(tmp_path, png):
+    calls = []
+    quantize(tmp_path, png, levels=4, progress=lambda done, total: calls.append((done, total)))
+    assert calls[-1][0] == calls[-1][1]
+
+    def cancel(done, total):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        quantize(tmp_path, png, name="cancelled.npz", levels=4, progress=cancel)
+
+
+@pytest.fixture
+def codebook(tmp_path, png):
+    quantization._CODEBOOK_CACHE.clear()
+    path = tmp_path / "codebook.npz"
+    digest = quantization.train_codebook([str(png)], levels=8, save_path=str(path))
+    return path, digest
+
+
+def test_trained_codebook_is_referenced_by_hash(tmp_path, png, codebook):
+    path, digest = codebook
+    compressed, mse = quantize(tmp_path, png, codebook=str(path))
+    assert mse == 0
+    with np.load(compressed) as data:
+        assert "codebook" not in data
+        assert str(data["codebook_hash"]) == digest
+    assert quantization.load_codebook(str(path))[3] == digest
+
+
+def test_cached_codebook_needs_no_file(tmp_path, png, codebook):
+    path, _ = codebook
+    compressed, _ = quantize(tmp_path, png, codebook=str(path))
+    path.unlink()
+    assert np.array_equal(dequantize(tmp_path, compressed), np.asarray(Image.open(png)))
+
+
+def test_moved_codebook_is_found_through_override(tmp_path, png, codebook):
+    path, _ = codebook
+    compressed, _ = quantize(tmp_path, png, codebook=str(path))
+    moved = tmp_path / "moved.npz"
+    path.rename(moved)
+    quantization._CODEBOOK_CACHE.clear()
+    with pytest.raises(FileNotFoundError):
+        dequantize(tmp_path, compressed)
+    assert np.array_equal(dequantize(tmp_path, compressed, codebook=str(moved)), np.asarray(Image.open(png)))
+
+
+def test_replaced_codebook_is_rejected(tmp_path, png, codebook):
+    path, _ = codebook
+    compressed, _ = quantize(tmp_path, png, codebook=str(path))
+    quantization.train_codebook([str(png)], levels=2, save_path=str(path))
+    quantization._CODEBOOK_CACHE.clear()
+    with pytest.raises(ValueError, match="hash"):
+        dequantize(tmp_path, compressed)
+
+
+def test_codebook_channels_must_match(tmp_path, codebook):
+    path, _ = codebook
+    gray = tmp_path / "gray.png"
+    Image.fromarray(blocky_image(32, 32, gray=True)).save(gray)
+    with pytest.raises(ValueError, match="channel"):
+        quantize(tmp_path, gray, codebook=str(path))
+
+
+def test_codebook_cache_evicts_least_recently_used(tmp_path, png):
+    quantization._CODEBOOK_CACHE.clear()
+    digests = [quantization.train_codebook([str(png)], levels=2 + i % 7, block_size=(2, 2 + i), save_path=str(tmp_path / f"cb{i}.npz"))
+               for i in range(quantization.CODEBOOK_CACHE_SIZE + 2)]
+    assert list(quantization._CODEBOOK_CACHE) == digests[2:]
+
+
+def test_training_needs_images():
+    with pytest.raises(ValueError):
+        quantization.train_codebook([])
+
+
+@pytest.fixture
+def strips(monkeypatch):
+    # a few block rows per strip, so small images still take several strips
+    monkeypatch.setattr(quantization, "TILE_BLOCKS", 40)
+
+
+def quantize_tiled(tmp_path, source, name="tiled.npz", **kwargs):
+    path = str(tmp_path / name)
+    quantization.quantize_image_tiled(str(source), save_path=path, **kwargs)
+    return path
+
+
+@pytest.mark.parametrize("gray", [False, True])
+def test_tiled_round_trip_from_npy(tmp_path, strips, gray):
+    pixels = blocky_image(70, 90, gray=gray)
+    source = tmp_path / "image.npy"
+    np.save(source, pixels)
+    compressed = quantize_tiled(tmp_path, source, levels=8)
+    quantization.dequantize_image_tiled(compressed, str(tmp_path / "out.npy"))
+    out = np.load(tmp_path / "out.npy")
+    assert out.shape == pixels.shape
+    assert np.array_equal(out[:68, :88], pixels[:68, :88])
+    assert not out[68:].any() and not out[:, 88:].any()
+
+
+def test_tiled_and_whole_image_files_are_interchangeable(tmp_path, strips, png):
+    expected = np.asarray(Image.open(png))
+    tiled = quantize_tiled(tmp_path, png, levels=8)
+    whole, _ = quantize(tmp_path, png, levels=8, coding="neighbour")
+    for compressed in (tiled, whole):
+        assert np.array_equal(dequantize(tmp_path, compressed), expected)
+        quantization.dequantize_image_tiled(compressed, str(tmp_path / "tiled.png"))
+        assert np.array_equal(np.asarray(Image.open(tmp_path / "tiled.png")), expected)
+
+
+def test_tiled_with_a_trained_codebook(tmp_path, strips, png, codebook):
+    path, digest = codebook
+    compressed = quantize_tiled(tmp_path, png, codebook=str(path))
+    with np.load(compressed) as data:
+        assert str(data["codebook_hash"]) == digest and "codebook" not in data
+    quantization.dequantize_image_tiled(compressed, str(tmp_path / "out.npy"))
+    assert np.array_equal(np.load(tmp_path / "out.npy"), np.asarray(Image.open(png)))
+
+
+@pytest.mark.parametrize("pixels", [np.zeros((8, 8), dtype=np.float32), np.zeros((8, 8, 4), dtype=np.uint8), np.zeros((2, 8), dtype=np.uint8)])
+def test_tiled_input_is_validated(tmp_path, pixels):
+    source = tmp_path / "bad.npy"
+    np.save(source, pixels)
+    with pytest.raises(ValueError):
+        quantize_tiled(tmp_path, source)
+
+
+@pytest.mark.parametrize("coding", quantization.ASSIGNMENT_CODINGS)
+def test_assignment_codings_round_trip(tmp_path, png, coding):
+    compressed, _ = quantize(tmp_path, png, levels=8, coding=coding)
+    with np.load(compressed) as data:
+        assert ("assignments" in data) == (coding == "int")
+    assert np.array_equal(dequantize(tmp_path, compressed), np.asarray(Image.open(png)))
+
+
+@pytest.mark.parametrize("k", [2, 16, 200, 300, 70000])
+def test_assignment_coding_helpers(k):
+    rng = np.random.default_rng(k)
+    assignments = rng.integers(0, k, (12, 20)).repeat(2, axis=1).ravel()
+    encoded = {coding: quantization._encode_assignments(assignments, k, 40, coding)
+               for coding in quantization.ASSIGNMENT_CODINGS if coding != "neighbour" or k <= 254}
+    encoded["auto"] = quantization._encode_assignments(assignments, k, 40)
+    for fields in encoded.values():
+        assert np.array_equal(quantization._decode_assignments(fields, assignments.shape[0], 40), assignments)
+    assert any(all(np.array_equal(encoded["auto"][name], value) for name, value in fields.items())
+               for coding, fields in encoded.items() if coding != "auto")
+
+
+def test_auto_coding_picks_the_smallest_file(tmp_path, png):
+    sizes = {coding: os.path.getsize(quantize(tmp_path, png, name=f"{coding}.npz", levels=8, coding=coding)[0])
+             for coding in ("auto",) + quantization.ASSIGNMENT_CODINGS}
+    assert sizes["auto"] <= min(sizes.values()) + 64
+
+
+def test_bad_assignment_codings_are_rejected():
+    assignments = np.zeros(10, dtype=np.int64)
+    with pytest.raises(ValueError, match="Unknown"):
+        quantization._encode_assignments(assignments, 4, 10, "huffman")
+    with pytest.raises(ValueError, match="254"):
+        quantization._encode_assignments(assignments, 255, 10, "neighbour")
+    packed = quantization._encode_assignments(np.arange(100) % 16, 16, 10, "packed")
+    with pytest.raises(ValueError, match="truncated"):
+        quantization._decode_assignments({**packed, "assignments_coded": packed["assignments_coded"][:-1]}, 100, 10)
+    neighbour = quantization._encode_assignments(np.arange(100) % 16, 16, 10, "neighbour")
+    with pytest.raises(ValueError):
+        quantization._decode_assignments(neighbour, 90, 10)
+    with pytest.raises(ValueError, match="Unknown"):
+        quantization._decode_assignments({**packed, "assignments_coding": np.array("zip")}, 100, 10)
+
+
+def test_legacy_int64_assignments_load(tmp_path, png):
+    compressed, _ = quantize(tmp_path, png, levels=8, coding="int")
+    with np.load(compressed) as data:
+        fields = dict(data)
+    fields["assignments"] = fields["assignments"].astype(np.int64)
+    np.savez(tmp_path / "legacy.npz", **fields)
+    assert np.array_equal(dequantize(tmp_path, str(tmp_path / "legacy.npz")), np.asarray(Image.open(png)))
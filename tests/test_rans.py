@@ -0,0 +1,78 @@
+import random
+
+import numpy as np
+import pytest
+
+from lossless import huffman, rans
+
+rng = np.random.default_rng(0)
+SAMPLES = [
+    b"",
+    b"\x00",
+    b"a" * 5000,
+    bytes(range(256)) * 4,
+    rng.geometric(0.3, 100000).clip(0, 255).astype(np.uint8).tobytes(),
+    random.Random(0).randbytes(3000),
+    b"the quick brown fox jumps over the lazy dog " * 3000,
+]
+
+
+@pytest.mark.parametrize("model", list(rans.MODELS))
+@pytest.mark.parametrize("data", SAMPLES)
+def test_round_trip(data, model):
+    payload = rans.compress_bytes(data, model)
+    assert rans.decompress_bytes(payload) == data
+    assert rans.decompress_bytes(payload, size=len(data)) == data
+
+
+@pytest.mark.parametrize("data", SAMPLES)
+def test_estimate_size(data):
+    actual = len(rans.compress_bytes(data))
+    assert abs(rans.estimate_size(data) - actual) <= actual // 100 + 16
+
+
+def test_adaptive_model_follows_drifting_statistics():
+    data = bytes(200000) + b"\xff" * 200000
+    assert len(rans.compress_bytes(data, "adaptive")) < len(rans.compress_bytes(data))
+
+
+def test_normalize():
+    freq = rans.normalize({0: 1, 1: 10 ** 9, 7: 3})
+    assert freq.sum() == rans.M and freq[0] >= 1 and freq[7] >= 1 and freq[2] == 0
+    with pytest.raises(ValueError):
+        rans.normalize(np.zeros(256))
+
+
+def test_supplied_statistics():
+    data = SAMPLES[6]
+    payload = rans.compress_bytes(data, freq=huffman.frequency_dict(data))
+    assert rans.decompress_bytes(payload) == data
+    with pytest.raises(ValueError, match="no count"):
+        rans.compress_bytes(data, freq={ord("t"): 1})
+
+
+def test_unknown_model_is_rejected():
+    with pytest.raises(ValueError):
+        rans.compress_bytes(b"abc", "dynamic")
+
+
+@pytest.mark.parametrize("model", list(rans.MODELS))
+def test_truncated_payload_is_rejected(model):
+    payload = rans.compress_bytes(SAMPLES[4], model)
+    for cut in (3, rans.HEADER.size + 1, rans.HEADER.size + 40, len(payload) - 2, len(payload) - 1):
+        with pytest.raises(ValueError):
+            rans.decompress_bytes(payload[:cut])
+
+
+def test_corrupt_payload_is_rejected():
+    payload = rans.compress_bytes(SAMPLES[6])
+    with pytest.raises(ValueError, match="header"):
+        rans.decompress_bytes(b"\x07" + payload[1:])
+    with pytest.raises(ValueError, match="expected size"):
+        rans.decompress_bytes(payload, size=5)
+    table = bytearray(payload)
+    table[rans.HEADER.size + 2 + 1] ^= 0x10
+    with pytest.raises(ValueError, match="frequency table"):
+        rans.decompress_bytes(bytes(table))
+    with pytest.raises(ValueError):
+        rans.decompress_bytes(payload + b"\x00\x00")
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from lossless import rle
+
+
+def runs(*lengths):
+    return b"".join(bytes([i % 256]) * n for i, n in enumerate(lengths))
+
+
+SAMPLES = [
+    b"",
+    b"a",
+    b"ab",
+    b"aab",
+    b"aaab",
+    runs(2, 3, 127, 128, 129, 130, 255, 256, 257, 1000),
+    bytes(range(256)) * 3,
+    random.Random(0).randbytes(5000),
+    bytes(random.Random(1).choices(b"aab", k=20000)),
+]
+
+
+@pytest.mark.parametrize("data", SAMPLES)
+def test_round_trip(data):
+    packed = rle.compress_bytes(data)
+    assert rle.decompress_bytes(packed) == data
+    assert rle.estimate_size(data) == len(packed)
+
+
+def test_output_is_bounded():
+    data = random.Random(2).randbytes(10000)
+    assert len(rle.compress_bytes(data)) <= len(data) + (len(data) + rle.MAX_PACKET - 1) // rle.MAX_PACKET
+
+
+def test_runs_are_packed():
+    assert rle.compress_bytes(b"x" * 128) == bytes([257 - 128]) + b"x"
+    assert len(rle.compress_bytes(b"x" * 1000)) == 2 * 8
+
+
+def test_chunk_boundaries(monkeypatch):
+    monkeypatch.setattr(rle, "CHUNK_SIZE", 100)
+    data = runs(50, 70, 3, 200, 1) + random.Random(3).randbytes(300)
+    assert rle.decompress_bytes(rle.compress_bytes(data)) == data
+
+
+def test_decodes_packbits():
+    packed = bytes.fromhex("FEAA0280002AFDAA0380002A22F7AA")
+    expected = bytes.fromhex("AAAAAA80002AAAAAAAAA80002A22AAAAAAAAAAAAAAAAAAAA")
+    assert rle.decompress_bytes(packed) == expected
+    assert rle.decompress_bytes(b"\x80" + packed + b"\x80") == expected
+
+
+def test_small_groups():
+    data = SAMPLES[5] + SAMPLES[7]
+    assert rle.decompress_bytes(rle.compress_bytes(data), group=3) == data
+
+
+@pytest.mark.parametrize("packed", [b"\x05abc", b"\xfe", b"\x00"])
+def test_truncated_packets_are_rejected(packed):
+    with pytest.raises(ValueError):
+        rle.decompress_bytes(packed)
+
+
+def test_string_codec():
+    assert rle.compress("aaabccdddd") == "3a1b2c4d"
+    assert rle.decompress("3a1b2c4d") == "aaabccdddd"
@@ -0,0 +1,125 @@
+import asyncio
+import http.client
+import io
+import json
+import random
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from algopress.server import CompressionServer
+from lossless import stream
+
+DATA = b"".join(b"request %d: %s\n" % (i, b"xyz" * (i % 11)) for i in range(20000)) + random.Random(0).randbytes(20000)
+MAX_BODY = 1 << 20
+
+
+@pytest.fixture(scope="module")
+def server():
+    # asyncio.start_server accepts connections as soon as start() returns
+    loop = asyncio.new_event_loop()
+    instance = CompressionServer(port=0, workers=2, max_body=MAX_BODY, window=2, instrumented=True)
+    loop.run_until_complete(instance.start())
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    yield instance
+
+    async def shutdown():
+        await instance.close()
+        # connections still open are not waited for by close()
+        handlers = asyncio.all_tasks() - {asyncio.current_task()}
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def request(server, method, path, body=None, **kwargs):
+    connection = http.client.HTTPConnection(server.host, server.port, timeout=30)
+    try:
+        connection.request(method, path, body, **kwargs)
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def test_health_and_algorithms(server):
+    assert request(server, "GET", "/health")[::2] == (200, b"ok\n")
+    status, _, body = request(server, "GET", "/algorithms")
+    assert status == 200 and "huffman" in json.loads(body)["lossless"]
+
+
+@pytest.mark.parametrize("algorithm", ["huffman", "lzw", "rans", "bwt", "auto"])
+def test_round_trip(server, algorithm):
+    status, headers, packed = request(server, "POST", "/compress?algo=" + algorithm, DATA)
+    assert status == 200 and headers["X-Algorithm"] == algorithm
+    assert b"".join(stream.decompress_iter([packed])) == DATA
+    assert stream.read_index(io.BytesIO(packed))[-1][0] == len(DATA)
+    status, _, restored = request(server, "POST", "/decompress", packed)
+    assert status == 200 and restored == DATA
+
+
+def test_chunked_and_empty_bodies(server):
+    chunks = (DATA[i:i + 10000] for i in range(0, len(DATA), 10000))
+    status, _, packed = request(server, "POST", "/compress?algo=golomb", chunks, encode_chunked=True)
+    assert status == 200
+    assert request(server, "POST", "/decompress", iter([packed[:100], packed[100:]]), encode_chunked=True)[2] == DATA
+    status, _, packed = request(server, "POST", "/compress?algo=rle", b"")
+    assert request(server, "POST", "/decompress", packed)[::2] == (200, b"")
+
+
+def test_quantization(server):
+    pixels = np.tile(np.array([[0, 255], [255, 0]], dtype=np.uint8).repeat(4, 0).repeat(4, 1), (4, 4))
+    png = io.BytesIO()
+    Image.fromarray(pixels).save(png, format="PNG")
+    status, headers, archive = request(server, "POST", "/compress?algo=quantization&levels=2", png.getvalue())
+    assert status == 200 and archive.startswith(b"PK")
+    status, headers, restored = request(server, "POST", "/decompress", archive)
+    assert status == 200 and headers["Content-Type"] == "image/png"
+    assert np.array_equal(np.asarray(Image.open(io.BytesIO(restored)).convert("L")), pixels)
+
+
+@pytest.mark.parametrize("method, path, body, expected", [
+    ("GET", "/nowhere", None, 404),
+    ("GET", "/compress", None, 405),
+    ("POST", "/compress?algo=zip", b"data", 400),
+    ("POST", "/compress?algo=quantization&levels=x", b"data", 400),
+    ("POST", "/compress?algo=quantization&levels=0", b"data", 400),
+    ("POST", "/compress?algo=quantization", bytes(MAX_BODY + 1), 413),
+    ("POST", "/compress?algo=quantization", b"not an image", 422),
+    ("POST", "/decompress", b"not a stream", 422),
+    ("POST", "/decompress", b"PK\x03\x04 broken archive", 422),
+])
+def test_errors(server, method, path, body, expected):
+    status, headers, payload = request(server, method, path, body)
+    assert status == expected and headers["Content-Type"] == "application/json"
+    assert json.loads(payload)["error"]
+
+
+def test_corrupt_first_frame_is_rejected(server):
+    packed = bytearray(b"".join(stream.compress_iter([DATA[:1000]], "stored", 4096)))
+    packed[stream.STREAM_HEADER.size + stream.FRAME_HEADER.size + 10] ^= 1
+    status, _, payload = request(server, "POST", "/decompress", bytes(packed))
+    assert status == 422 and "checksum" in json.loads(payload)["error"]
+
+
+def test_malformed_requests_are_rejected(server):
+    status, _, _ = request(server, "POST", "/compress?algo=rle", b"", headers={"Content-Length": "-1"})
+    assert status == 400
+
+
+def test_metrics(server):
+    request(server, "GET", "/health")
+    status, _, body = request(server, "GET", "/metrics?format=json")
+    routes = json.loads(body)["routes"]
+    assert status == 200 and routes["health"]["statuses"]["200"] >= 1
+    status, headers, text = request(server, "GET", "/metrics")
+    assert status == 200 and headers["Content-Type"].startswith("text/plain")
+    assert b'algopress_server_requests_total{route="health",status="200"}' in text
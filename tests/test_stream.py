@@ -0,0 +1,164 @@
+import io
+import random
+
+import pytest
+
+from lossless import stream
+
+BLOCK = 4096
+DATA = b"".join(b"line %d: %s\n" % (i, b"abc" * (i % 17)) for i in range(3000)) + random.Random(0).randbytes(5000)
+
+
+def compressed(algorithm="lzw", data=DATA, block_size=BLOCK):
+    return b"".join(stream.compress_iter([data], algorithm, block_size))
+
+
+@pytest.mark.parametrize("algorithm", ["rle", "huffman", "golomb", "lzw", "stored", "auto", "rans", "lz77", "bwt"])
+def test_round_trip(algorithm):
+    blob = compressed(algorithm)
+    assert b"".join(stream.decompress_iter([blob])) == DATA
+
+
+def test_empty_input():
+    blob = b"".join(stream.compress_iter([], "huffman", BLOCK))
+    assert b"".join(stream.decompress_iter([blob])) == b""
+
+
+def test_output_does_not_depend_on_chunking():
+    rng = random.Random(1)
+    cuts = sorted(rng.sample(range(1, len(DATA)), 50))
+    chunks = [DATA[a:b] for a, b in zip([0] + cuts, cuts + [len(DATA)])]
+    assert b"".join(stream.compress_iter(chunks, "huffman", BLOCK)) == compressed("huffman")
+
+
+def test_decompressor_accepts_any_slicing():
+    blob = compressed("rans")
+    decompressor = stream.Decompressor()
+    out = b"".join(decompressor.feed(blob[i:i + 7]) for i in range(0, len(blob), 7))
+    decompressor.flush()
+    assert out == DATA
+    assert (decompressor.algorithm, decompressor.block_size) == ("rans", BLOCK)
+
+
+def test_file_functions_match_the_incremental_api(tmp_path):
+    # BytesIO goes through the buffered path, real files are memory-mapped
+    buffered = io.BytesIO()
+    assert stream.compress_file(io.BytesIO(DATA), buffered, "golomb", BLOCK) == (len(DATA), len(buffered.getvalue()))
+    assert buffered.getvalue() == compressed("golomb")
+
+    src = tmp_path / "data"
+    src.write_bytes(DATA)
+    with open(src, "rb") as f, open(tmp_path / "data.apz", "wb") as dst:
+        stream.compress_file(f, dst, "golomb", BLOCK)
+    assert (tmp_path / "data.apz").read_bytes() == buffered.getvalue()
+
+    with open(tmp_path / "data.apz", "rb") as f, open(tmp_path / "out", "wb") as dst:
+        stream.decompress_file(f, dst)
+    assert (tmp_path / "out").read_bytes() == DATA
+    restored = io.BytesIO()
+    stream.decompress_file(io.BytesIO(buffered.getvalue()), restored)
+    assert restored.getvalue() == DATA
+
+
+def test_progress_reports_every_block():
+    calls = []
+    stream.compress_file(io.BytesIO(DATA), io.BytesIO(), "rle", BLOCK, progress=lambda done, total: calls.append(done))
+    assert calls[-1] == len(DATA)
+    assert len(calls) >= len(DATA) // stream.READ_SIZE
+
+
+def test_file_objects():
+    dst = io.BytesIO()
+    with stream.CompressedWriter(dst, "lzw", BLOCK) as writer:
+        for i in range(0, len(DATA), 1000):
+            writer.write(DATA[i:i + 1000])
+    assert dst.getvalue() == compressed("lzw")
+    reader = io.BufferedReader(stream.CompressedReader(io.BytesIO(dst.getvalue())))
+    assert reader.read() == DATA
+
+
+def test_read_algorithm():
+    assert stream.read_algorithm(io.BytesIO(compressed("lz77"))) == "lz77"
+    with pytest.raises(ValueError):
+        stream.read_algorithm(io.BytesIO(b"not a stream"))
+
+
+def test_unknown_algorithm_and_block_size_are_rejected():
+    with pytest.raises(ValueError):
+        stream.Compressor("zip")
+    with pytest.raises(ValueError):
+        stream.Compressor("rle", 0)
+
+
+def test_truncated_stream_is_rejected():
+    blob = compressed()
+    end = blob.index(stream.END_FRAME, stream.STREAM_HEADER.size)
+    with pytest.raises(ValueError):
+        b"".join(stream.decompress_iter([blob[:end - 10]]))
+    with pytest.raises(ValueError):
+        stream.decompress_file(io.BytesIO(blob[:end]), io.BytesIO())
+
+
+def test_corrupt_block_is_rejected():
+    blob = bytearray(compressed("stored"))
+    blob[stream.STREAM_HEADER.size + stream.FRAME_HEADER.size + 100] ^= 1
+    with pytest.raises(ValueError, match="checksum"):
+        b"".join(stream.decompress_iter([bytes(blob)]))
+
+
+@pytest.mark.parametrize("offset, value", [(0, ord("X")), (4, 99), (5, 250)])
+def test_bad_stream_header_is_rejected(offset, value):
+    blob = bytearray(compressed())
+    blob[offset] = value
+    with pytest.raises(ValueError):
+        b"".join(stream.decompress_iter([bytes(blob)]))
+
+
+def test_block_index():
+    index = stream.read_index(io.BytesIO(compressed()))
+    assert [raw for raw, _ in index] == list(range(0, len(DATA), BLOCK)) + [len(DATA)]
+    assert index[0][1] == stream.STREAM_HEADER.size
+
+
+@pytest.mark.parametrize("algorithm", ["huffman", "stored", "bwt"])
+def test_random_access_reads(tmp_path, algorithm):
+    path = tmp_path / "data.apz"
+    path.write_bytes(compressed(algorithm))
+    rng = random.Random(2)
+    ranges = [(rng.randrange(len(DATA)), rng.randrange(3 * BLOCK)) for _ in range(30)]
+    ranges += [(0, 0), (0, len(DATA)), (BLOCK - 1, 2), (len(DATA) - 5, 100), (len(DATA), 10), (len(DATA) + 100, 10)]
+    with open(path, "rb") as f, stream.IndexedReader(f) as indexed, stream.MappedReader(str(path)) as mapped:
+        assert indexed.size == mapped.size == len(DATA)
+        for offset, length in ranges:
+            assert indexed.read(offset, length) == mapped.read(offset, length) == DATA[offset:offset + length]
+        with pytest.raises(ValueError):
+            mapped.read(-1, 10)
+
+
+def test_read_range(tmp_path):
+    from algopress import cli
+
+    path = tmp_path / "data.apz"
+    path.write_bytes(compressed())
+    out = io.BytesIO()
+    cli.read_range(str(path), 5000, 3000, out=out)
+    cli.read_range(str(path), len(DATA) - 10, out=out)
+    assert out.getvalue() == DATA[5000:8000] + DATA[-10:]
+
+
+def test_missing_or_corrupt_index_is_rejected(tmp_path):
+    blob = compressed()
+    end = blob.index(stream.END_FRAME, stream.STREAM_HEADER.size) + len(stream.END_FRAME)
+    with pytest.raises(ValueError, match="no block index"):
+        stream.read_index(io.BytesIO(blob[:end]))
+    with pytest.raises(ValueError, match="no block index"):
+        stream.read_index(io.BytesIO(blob[:-1]))
+    swapped = bytearray(blob)
+    first = end + stream.INDEX_ENTRY.size
+    swapped[end:first + stream.INDEX_ENTRY.size] = blob[first:first + stream.INDEX_ENTRY.size] + blob[end:first]
+    with pytest.raises(ValueError, match="corrupt"):
+        stream.read_index(io.BytesIO(bytes(swapped)))
+    path = tmp_path / "bad.apz"
+    path.write_bytes(blob[:end])
+    with pytest.raises(ValueError):
+        stream.MappedReader(str(path))
@@ -0,0 +1,135 @@
+import random
+
+import numpy as np
+import pytest
+
+from lossless import transforms
+
+SAMPLES = [
+    b"",
+    b"a",
+    b"banana",
+    b"a" * 1000,
+    b"abababababab",
+    bytes(range(256)) * 3,
+    random.Random(0).randbytes(5000),
+    b"".join(b"the quick brown fox %d jumps over the lazy dog " % i for i in range(1000)),
+]
+
+
+def naive_bwt(data):
+    # rotations of data + a marker that sorts before every byte
+    symbols = list(data) + [-1]
+    rows = sorted(symbols[i:] + symbols[:i] for i in range(len(symbols)))
+    last = [row[-1] for row in rows]
+    primary = last.index(-1)
+    return primary, bytes(last[:primary] + last[primary + 1:])
+
+
+@pytest.mark.parametrize("data", [b"banana", b"mississippi", b"aaaa", b"abcabcab", bytes(random.Random(1).choices(b"ab", k=200))])
+def test_bwt_matches_sorted_rotations(data):
+    primary, last = naive_bwt(data)
+    assert transforms.bwt(data) == transforms.SIZE.pack(transforms.BWT_BLOCK) + transforms.SIZE.pack(primary) + last
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 1000, None])
+@pytest.mark.parametrize("data", SAMPLES)
+def test_bwt_round_trip(data, block_size):
+    assert transforms.unbwt(transforms.bwt(data, block_size), len(data)) == data
+
+
+@pytest.mark.parametrize("data", SAMPLES)
+def test_stage_round_trips(data):
+    for forward, inverse in transforms._STAGES.values():
+        assert inverse(forward(data), len(data)) == data
+
+
+def test_mtf():
+    assert transforms.mtf(b"aaab") == b"\x61\x00\x00\x62"
+    assert transforms.mtf(b"\x00\x01\x01\x00") == b"\x00\x01\x00\x01"
+
+
+@pytest.mark.parametrize("run", [1, 2, 3, 4, 7, 8, 255, 256, 1 << 16, 100001])
+def test_zrle_runs(run):
+    data = b"\x05" + bytes(run) + b"\xfe\xff\xfd" + bytes(run)
+    coded = transforms.zrle(data)
+    assert transforms.unzrle(coded, len(data)) == data
+    assert len(coded) <= 2 * (run + 1).bit_length() + 5
+
+
+def test_zrle_values():
+    assert transforms.zrle(b"\x01\xfd\xfe\xff") == b"\x02\xfe\xff\x00\xff\x01"
+    assert transforms.zrle(bytes(3)) == b"\x00\x00"
+
+
+def test_delta():
+    assert transforms.delta(b"\x05\x07\x06") == b"\x05\x02\xff"
+    assert transforms.undelta(b"\x05\x02\xff", 3) == b"\x05\x07\x06"
+
+
+@pytest.mark.parametrize("coder", list(transforms.CODERS))
+@pytest.mark.parametrize("stages", [(), ("bwt",), transforms.DEFAULT_STAGES, ("delta", "rle"), ("rle", "bwt", "mtf", "zrle")])
+def test_pipeline_round_trip(stages, coder):
+    for data in (SAMPLES[0], SAMPLES[2], SAMPLES[7]):
+        params, payload = transforms.compress_bytes(data, stages, coder)
+        assert transforms.decompress_bytes(params, payload) == data
+
+
+def test_default_pipeline_compresses_text():
+    params, payload = transforms.compress_bytes(SAMPLES[7])
+    assert len(params) + len(payload) < len(SAMPLES[7]) // 5
+
+
+def test_unknown_names_are_rejected():
+    with pytest.raises(ValueError, match="coder"):
+        transforms.compress_bytes(b"abc", coder="zip")
+    with pytest.raises(ValueError, match="transform"):
+        transforms.compress_bytes(b"abc", stages=("bwt", "lzw"))
+
+
+def test_corrupt_params_are_rejected():
+    params, payload = transforms.compress_bytes(SAMPLES[7])
+    sizes = transforms.PARAMS.size
+    for bad in (params[:1], params[:-1], params + b"\x01", b"\x09" + params[1:], params[:-1] + b"\x09"):
+        with pytest.raises(ValueError):
+            transforms.decompress_bytes(bad, payload)
+    # a wrong intermediate size
+    wrong = bytearray(params)
+    wrong[sizes + 3] ^= 1
+    with pytest.raises(ValueError):
+        transforms.decompress_bytes(bytes(wrong), payload)
+    with pytest.raises(ValueError):
+        transforms.decompress_bytes(params, payload[:-1])
+
+
+def test_corrupt_bwt_is_rejected():
+    data = SAMPLES[7][:3000]
+    coded = transforms.bwt(data)
+    for primary in (0, len(data) + 1):
+        bad = coded[:4] + transforms.SIZE.pack(primary) + coded[8:]
+        with pytest.raises(ValueError, match="primary"):
+            transforms.unbwt(bad, len(data))
+    with pytest.raises(ValueError, match="block size"):
+        transforms.unbwt(transforms.SIZE.pack(0) + coded[4:], len(data))
+    with pytest.raises(ValueError, match="truncated"):
+        transforms.unbwt(coded[:-1], len(data))
+    with pytest.raises(ValueError, match="recorded size"):
+        transforms.unbwt(coded + b"x", len(data))
+    # a last column that is not a permutation of one cycle
+    with pytest.raises(ValueError, match="corrupt"):
+        transforms.unbwt(transforms.SIZE.pack(100) + transforms.SIZE.pack(1) + b"aa", 2)
+
+
+def test_corrupt_zero_runs_are_rejected():
+    with pytest.raises(ValueError, match="truncated"):
+        transforms.unzrle(b"\x02\xff", 2)
+    with pytest.raises(ValueError, match="corrupt"):
+        transforms.unzrle(bytes(41), 1)
+    with pytest.raises(ValueError, match="recorded size"):
+        transforms.unzrle(transforms.zrle(bytes(10)), 11)
+
+
+def test_suffix_array():
+    arr = np.frombuffer(SAMPLES[7][:2000], dtype=np.uint8)
+    expected = sorted(range(arr.shape[0]), key=lambda i: arr[i:].tobytes())
+    assert transforms._suffix_array(arr).tolist() == expected